@@ -6,15 +6,31 @@ Powered by Botpresso
 """
 
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 from urllib.parse import urlparse
 import time
 from typing import Set, List, Tuple, Optional, Dict
 from collections import Counter
 import io
-from firebase_auth import verify_token, get_user_by_uid, is_development, is_production
+import os
+import threading
+import tempfile
+from firebase_auth import verify_token, get_user_by_uid, is_development, is_production, is_admin
+from profiling import run_profiled, format_report
+from discovery import discover_sitemaps, normalize_start_url, looks_like_sitemap_url, get_origin
+from url_normalize import UrlCanonicalizer, RULES_STANDARD
+from fetcher import FetchStats, FetchTimeouts
+from budget import CrawlBudget
+from retry import RetryPolicy, RetryBudget
+from circuit_breaker import HostCircuitBreakers
+from sitemap_engine import crawl, CrawlEvent, EVENT_INDEX, EVENT_URLSET, EVENT_ERROR, EVENT_RETRY
+from content_cache import ContentCache
+from url_filter import UrlFilter, build_filter
+from liveness import CheckResult, check_urls, format_progress, results_frame, add_status_columns
+from url_results import (ResultsCollector, UrlResults, DETAIL_COLUMNS, DEFAULT_ORDER, ORDERS,
+                         ORDER_URL, ORDER_HOST, ORDER_LASTMOD, ORDER_DISCOVERY)
+from snapshots import (SNAPSHOT_DIR, SNAPSHOT_KEEP, site_key, scoped_site, list_snapshots, save_snapshot, incomplete_reasons,
+                       snapshot_label, write_diff)
 
 
 # Page configuration
@@ -1962,146 +1978,507 @@ def inject_botpresso_css():
     """, unsafe_allow_html=True)
 
 # Configuration
-REQUEST_TIMEOUT = 10  # seconds
-REQUEST_DELAY = 0.5   # seconds between requests to be respectful
-MAX_RETRIES = 3
+# Fetching, parsing and crawling live in sitemap_engine.py (shared with the CLI)
+REQUEST_TIMEOUT = 10  # seconds per socket read
+MAX_RETRIES = 3       # total attempts per sitemap for transient errors
+PREWARM_DNS = True    # resolve the hosts of an index's children while the index is processed
 
+# Default connect / read / total-transfer / minimum-throughput limits (adjustable in the UI)
+FETCH_TIMEOUTS = FetchTimeouts(read=REQUEST_TIMEOUT)
 
-def is_html_url(url: str) -> bool:
+# Live results preview while crawling
+LIVE_UPDATE_INTERVAL = 0.75  # minimum seconds between preview refreshes
+LIVE_PREVIEW_ROWS = 100
+LIVE_STRUCTURE_ROWS = 15
+
+# Versioned snapshots of complete extractions (shared by all users, see snapshots.py)
+SAVE_SNAPSHOTS = True
+SNAPSHOTS_PER_SITE = SNAPSHOT_KEEP  # older snapshots of a site are deleted when a new one is saved
+DIFF_PREVIEW_ROWS = 100
+
+# URL status checks (HEAD requests; concurrency and per-host rate limits live in liveness.py)
+CHECK_PREVIEW_ROWS = 100  # non-2xx results shown live while checking
+
+# Orders offered for the URL table and export (sorted lazily, on first use; see url_results.py)
+ORDER_LABELS = {
+    ORDER_URL: "URL (A-Z)",
+    ORDER_HOST: "Host, then path",
+    ORDER_LASTMOD: "Last modified (newest first)",
+    ORDER_DISCOVERY: "Discovery order (no sorting)",
+}
+
+# Shared URL normalizer for page URL results
+result_canonicalizer = UrlCanonicalizer(RULES_STANDARD)
+
+# Backoff and retry classification for sitemap fetches
+retry_policy = RetryPolicy(max_attempts=MAX_RETRIES)
+
+
+@st.cache_resource
+def get_content_cache() -> ContentCache:
+    """
+    Parsed sitemaps by content hash, shared by all sessions and reruns:
+    identical sitemaps (aliases, or re-extractions of an unchanged site)
+    are parsed only once.
     """
-    Check if a URL points to an HTML page.
-    Filters out images, PDFs, videos, XML, and other non-HTML resources.
+    return ContentCache()
+
+
+def get_structure_segment(url: str) -> str:
+    """Return the first path segment of a URL as /segment/, or "Other" for root paths."""
+    path = (urlparse(url).path or "").strip("/")
+    if not path:
+        return "Other"
+    return "/" + path.split("/")[0] + "/"
+
+
+def structure_from_counts(path_counts: Counter, total: int) -> List[Tuple[str, int, float]]:
+    """Turn segment counts into (path, page_count, percentage) rows, largest first."""
+    if total == 0:
+        return []
+    return [
+        (path, count, round(100.0 * count / total, 1))
+        for path, count in path_counts.most_common()
+    ]
+
+
+class LiveResultsView:
     """
-    parsed = urlparse(url)
-    path = parsed.path.lower()
+    Live preview of the URLs found while an extraction is running.
     
-    non_html_extensions = {
-        '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico',
-        '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
-        '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm',
-        '.mp3', '.wav', '.ogg', '.flac',
-        '.xml', '.rss', '.atom',
-        '.zip', '.rar', '.tar', '.gz',
-        '.css', '.js', '.json',
-        '.txt', '.csv',
-    }
+    New URLs are added after every parsed URL set; the count, the preview
+    table and the site structure are re-rendered at most once per
+    LIVE_UPDATE_INTERVAL so large crawls do not cause rerender storms.
+    The structure counts are kept incrementally, so each refresh costs the
+    size of the preview, not the size of the result.
+    """
     
-    for ext in non_html_extensions:
-        if path.endswith(ext):
-            return False
+    def __init__(self, placeholder, min_interval: Optional[float] = None):
+        self.placeholder = placeholder
+        self.min_interval = LIVE_UPDATE_INTERVAL if min_interval is None else min_interval
+        self.path_counts: Counter = Counter()
+        self.preview: List[str] = []
+        self.total = 0
+        self.sitemaps = 0
+        self.started_at = time.time()
+        self.last_render = 0.0
     
-    if not path or path.endswith('/') or path.endswith('.html') or path.endswith('.htm'):
-        return True
+    def add(self, new_urls, sitemaps_processed: int) -> None:
+        """Record newly found (deduplicated) URLs and refresh if the throttle allows."""
+        for url in new_urls:
+            self.path_counts[get_structure_segment(url)] += 1
+            if len(self.preview) < LIVE_PREVIEW_ROWS:
+                self.preview.append(url)
+        self.total += len(new_urls)
+        self.sitemaps = sitemaps_processed
+        self.render()
     
-    if '.' not in path.split('/')[-1]:
-        return True
+    def render(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - self.last_render < self.min_interval:
+            return
+        self.last_render = now
+        
+        with self.placeholder.container():
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("HTML URLs Found So Far", f"{self.total:,}")
+            with col2:
+                st.metric("Sitemaps Processed", self.sitemaps)
+            with col3:
+                st.metric("Elapsed", f"{now - self.started_at:.1f}s")
+            
+            preview_col, structure_col = st.columns([2, 1])
+            with preview_col:
+                st.caption(f"First {len(self.preview)} URLs (live preview)")
+                st.dataframe(pd.DataFrame({'URL': self.preview}), use_container_width=True, height=300)
+            with structure_col:
+                st.caption("Site Structure (live)")
+                structure = structure_from_counts(self.path_counts, self.total)[:LIVE_STRUCTURE_ROWS]
+                st.dataframe(
+                    pd.DataFrame(
+                        [{"Site Structure": "▸ " + path, "Pages": count, "Percentage": f"{pct}%"}
+                         for path, count, pct in structure],
+                        columns=["Site Structure", "Pages", "Percentage"],
+                    ),
+                    use_container_width=True, hide_index=True, height=300,
+                )
     
-    return True
+    def clear(self) -> None:
+        self.placeholder.empty()
+
+
+def make_event_handler(status_container, progress_bar, live: Optional[LiveResultsView] = None):
+    """
+    Build the crawl event callback that drives the extraction UI: the status
+    line, the progress bar (share of the sitemaps discovered so far that were
+    fetched) and the live results preview.
+    """
+    def on_event(event: CrawlEvent) -> None:
+        if event.kind == EVENT_INDEX:
+            status_container.text(f"Processing sitemap index: {event.url} ({event.count} child sitemaps)")
+        elif event.kind == EVENT_URLSET:
+            status_container.text(f"Extracting URLs from: {event.url} ({event.count} HTML URLs found)")
+            if live is not None:
+                live.add(event.new_urls, event.sitemaps_fetched)
+        elif event.kind == EVENT_ERROR:
+            status_container.warning(f"Error processing {event.url}: {event.error}")
+        elif event.kind == EVENT_RETRY:
+            status_container.text(f"Retrying {event.url} in {event.delay:.1f}s ({event.detail})")
+        if progress_bar is not None and event.kind in (EVENT_INDEX, EVENT_URLSET, EVENT_ERROR):
+            progress_bar.progress(event.progress)
 
+    return on_event
 
-def fetch_sitemap(url: str) -> BeautifulSoup:
-    """Fetch and parse an XML sitemap from a URL."""
-    for attempt in range(MAX_RETRIES):
+
+def process_sitemaps(root_urls: List, visited: Set[str], all_urls: Set[str], status_container, progress_bar,
+                     stats: Optional[FetchStats] = None, budget: Optional[CrawlBudget] = None,
+                     live: Optional[LiveResultsView] = None,
+                     retry_budget: Optional[RetryBudget] = None,
+                     breakers: Optional[HostCircuitBreakers] = None,
+                     timeouts: Optional[FetchTimeouts] = None,
+                     lastmods: Optional[Dict[str, str]] = None,
+                     url_filter: Optional[UrlFilter] = None,
+                     results: Optional[ResultsCollector] = None) -> Dict:
+    """
+    Crawl root sitemaps with the shared extraction engine, reporting progress
+    in the given Streamlit containers (pass None for either to run silently).
+
+    Returns:
+        Crawl summary dictionary, see sitemap_engine.crawl()
+    """
+    on_event = make_event_handler(status_container, progress_bar, live) if status_container is not None else None
+    return crawl(root_urls, visited, all_urls,
+                 budget=budget,
+                 canonicalize_url=result_canonicalizer,
+                 stats=stats,
+                 retry_policy=retry_policy,
+                 retry_budget=retry_budget,
+                 breakers=breakers,
+                 prewarm_dns=PREWARM_DNS,
+                 timeouts=timeouts or FETCH_TIMEOUTS,
+                 lastmods=lastmods,
+                 content_cache=get_content_cache(),
+                 url_filter=url_filter,
+                 results=results,
+                 on_event=on_event)
+
+
+def start_background_crawl() -> None:
+    """
+    Continue a budget-limited extraction on a background thread.
+    Used as the on_click callback of the "Continue in background" button;
+    progress is picked up by display_background_crawl on later reruns.
+    """
+    remaining = st.session_state.get('crawl_remaining') or []
+    if not remaining or st.session_state.get('background_job'):
+        return
+    
+    job = {
+        'urls': set(),
+        'results': ResultsCollector(),
+        'visited': set(st.session_state.get('crawl_visited', set())),
+        'stats': FetchStats(),
+        'breakers': HostCircuitBreakers(),
+        'lastmods': st.session_state.get('crawl_lastmods', {}),
+        # Session state is only readable on the script thread, not in run()
+        'url_filter': st.session_state.get('url_filter'),
+        'timeouts': st.session_state.get('fetch_timeouts'),
+        'done': False,
+        'error': None,
+        'summary': None,
+        'started_at': time.time(),
+    }
+    
+    def run() -> None:
         try:
-            response = requests.get(url, timeout=REQUEST_TIMEOUT)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'xml')
-            return soup
-        except requests.exceptions.RequestException as e:
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(REQUEST_DELAY * (attempt + 1))
-            else:
-                raise Exception(f"Failed to fetch {url} after {MAX_RETRIES} attempts: {str(e)}")
+            job['summary'] = process_sitemaps(remaining, job['visited'], job['urls'], None, None, job['stats'],
+                             breakers=job['breakers'], timeouts=job['timeouts'],
+                             lastmods=job['lastmods'], url_filter=job['url_filter'],
+                             results=job['results'])
+        except Exception as e:
+            job['error'] = str(e)
+        finally:
+            job['done'] = True
     
-    raise Exception(f"Failed to fetch sitemap: {url}")
+    threading.Thread(target=run, daemon=True).start()
+    st.session_state.background_job = job
+    st.session_state.crawl_remaining = []
 
 
-def is_sitemap_index(soup: BeautifulSoup) -> bool:
-    """Check if the parsed XML is a sitemap index or a URL set."""
-    if soup.find('sitemap'):
-        return True
-    if soup.find('url'):
-        return False
-    return False
+def display_background_crawl() -> None:
+    """Show the progress of a background extraction and merge its results when done."""
+    job = st.session_state.get('background_job')
+    if not job:
+        return
+    
+    if not job['done']:
+        elapsed = time.time() - job['started_at']
+        st.info(f"⏳ Background extraction running for {elapsed:.0f}s: {len(job['urls'])} more URLs found so far. "
+                "Click Refresh to update the results.")
+        st.button("Refresh", key="refresh_background_crawl")
+        return
+    
+    previous = st.session_state.get('results') or UrlResults.from_urls([])
+    merged = previous.merge(job['results'].build())
+    added = len(merged) - len(previous)
+    st.session_state.results = merged
+    st.session_state.visited_sitemaps_count = len(job['visited'])
+    st.session_state.truncated_reason = None
+    st.session_state.extraction_complete = True
+    del st.session_state['background_job']
+    if st.session_state.get('crawl_target'):
+        gaps = st.session_state.get('crawl_gaps', []) + incomplete_reasons(job['summary'], len(job['stats'].truncated))
+        record_snapshot(st.session_state.crawl_target, merged.ordered(ORDER_URL).urls(), job['lastmods'], gaps,
+                        job['url_filter'])
+    
+    if job['error']:
+        st.warning(f"Background extraction stopped with an error: {job['error']}")
+    if job['breakers'].skipped:
+        st.warning(f"{len(job['breakers'].skipped)} sitemap(s) were skipped because their host kept failing: "
+                   + ", ".join(job['breakers'].skipped_by_host()))
+    st.success(f"Background extraction finished: {added} new URLs added.")
 
 
-def extract_sitemap_urls(soup: BeautifulSoup) -> List[str]:
-    """Extract sitemap URLs from a sitemap index."""
-    sitemap_urls = []
-    sitemap_tags = soup.find_all('sitemap')
+def record_snapshot(target: str, sorted_urls: List[str], lastmods: Optional[Dict[str, str]],
+                    gaps: List[str], url_filter: Optional[UrlFilter] = None) -> None:
+    """
+    Archive a complete extraction as a new snapshot of its site for the change view.
+    Incomplete extractions (`gaps` lists why, see incomplete_reasons()) are not archived,
+    and filtered ones only sit next to extractions with the same filters.
+    """
+    if not SAVE_SNAPSHOTS:
+        return
+    if gaps:
+        st.caption(f"Not saved as a snapshot for the change view, the results are incomplete: {'; '.join(gaps)}")
+        return
+    name = site_key(target)
+    site = scoped_site(name, {
+        'include': sorted(url_filter.include) if url_filter is not None else None,
+        'exclude': sorted(url_filter.exclude) if url_filter is not None else None,
+    })
+    try:
+        path = save_snapshot(sorted_urls, lastmods, site, SNAPSHOT_DIR, keep=SNAPSHOTS_PER_SITE)
+    except OSError as e:
+        st.warning(f"Could not save a snapshot of this extraction: {e}")
+        return
+    st.session_state.snapshot = {'site': site, 'path': path,
+                                 'name': name + (" with these URL filters" if site != name else "")}
+    st.session_state.snapshot_diffs = {}
+
+
+def display_snapshot_diff(key: str) -> None:
+    """
+    Compare the current extraction with an earlier snapshot of the same site:
+    counts of added, removed and re-dated URLs, a preview and the diff CSV.
+    """
+    snapshot = st.session_state.get('snapshot')
+    if not snapshot:
+        return
+    
+    st.subheader("Changes Since an Earlier Extraction")
+    if not os.path.exists(snapshot['path']):
+        st.caption(f"The snapshot of this extraction was replaced by {SNAPSHOTS_PER_SITE} newer ones of {snapshot['name']}.")
+        return
+    # Snapshot file names sort chronologically
+    earlier = [path for path in list_snapshots(snapshot['site'], SNAPSHOT_DIR) if path < snapshot['path']]
+    if not earlier:
+        st.caption(f"This is the first saved extraction of {snapshot['name']}; "
+                   "extract it again later to see which URLs were added or removed.")
+        return
     
-    for sitemap_tag in sitemap_tags:
-        loc_tag = sitemap_tag.find('loc')
-        if loc_tag and loc_tag.text:
-            sitemap_urls.append(loc_tag.text.strip())
+    previous = st.selectbox("Compare with", list(reversed(earlier)), format_func=snapshot_label, key=key)
+    diffs = st.session_state.setdefault('snapshot_diffs', {})
+    if previous not in diffs:
+        out = io.StringIO()
+        try:
+            summary = write_diff(previous, snapshot['path'], out)
+        except FileNotFoundError:
+            # Deleted by another session's snapshot retention since the list was read
+            st.caption("That snapshot was just deleted to make room for newer ones.")
+            return
+        diffs[previous] = (summary, out.getvalue())
+    summary, diff_csv = diffs[previous]
     
-    return sitemap_urls
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Added", f"{summary.added:,}")
+    with col2:
+        st.metric("Removed", f"{summary.removed:,}")
+    with col3:
+        st.metric("New Lastmod", f"{summary.lastmod_changed:,}")
+    with col4:
+        st.metric("Unchanged", f"{summary.unchanged:,}")
+    
+    if summary.changed:
+        st.dataframe(pd.read_csv(io.StringIO(diff_csv), nrows=DIFF_PREVIEW_ROWS, keep_default_na=False),
+                     use_container_width=True, hide_index=True, height=300)
+        st.download_button(
+            label="📥 Download Changes",
+            data=diff_csv,
+            file_name=f"sitemap_diff_{snapshot['site']}.csv",
+            mime="text/csv",
+            key=f"{key}_download",
+            use_container_width=True
+        )
+    else:
+        st.caption("No URLs were added, removed or re-dated.")
 
 
-def extract_page_urls(soup: BeautifulSoup) -> List[str]:
-    """Extract page URLs from a URL set sitemap."""
-    page_urls = []
-    url_tags = soup.find_all('url')
-    
-    for url_tag in url_tags:
-        loc_tag = url_tag.find('loc')
-        if loc_tag and loc_tag.text:
-            url = loc_tag.text.strip()
-            if is_html_url(url):
-                page_urls.append(url)
+def display_partial_results_notice(key: str) -> None:
+    """Explain that results are partial and offer to continue in the background."""
+    reason = st.session_state.get('truncated_reason')
+    remaining = st.session_state.get('crawl_remaining') or []
+    if not reason or not remaining or st.session_state.get('background_job'):
+        return
     
-    return page_urls
+    st.warning(f"⚠️ Partial results ({reason}): {len(remaining)} sitemap(s) were not fetched yet.")
+    st.button(
+        "Continue in background",
+        key=key,
+        on_click=start_background_crawl,
+        help="Fetch the remaining sitemaps without limits while you explore the partial results",
+    )
 
 
-def get_site_structure(urls: List[str]) -> List[Tuple[str, int, float]]:
+def url_table(results: UrlResults, start: int, stop: int, columns=('url',)) -> pd.DataFrame:
     """
-    Group URLs by top-level path and return (path, page_count, percentage).
-    Path is the first path segment as /segment/. Root or empty paths go to "Other".
+    Rows [start, stop) for display or export; only these rows are converted.
+    The status columns are added once the URLs were checked.
     """
-    path_counts: Counter = Counter()
-    for url in urls:
-        parsed = urlparse(url)
-        path = (parsed.path or "").strip("/")
-        if not path:
-            segment = "Other"
-        else:
-            segment = "/" + path.split("/")[0] + "/"
-        path_counts[segment] += 1
-    total = len(urls)
-    if total == 0:
-        return []
-    return [
-        (path, count, round(100.0 * count / total, 1))
-        for path, count in path_counts.most_common()
-    ]
+    table = results.page_frame(start, stop, columns)
+    statuses = st.session_state.get('url_status')
+    return add_status_columns(table, statuses) if statuses else table
+
+
+def change_order(key: str) -> None:
+    """Order selector callback: keep the choice for whichever results view renders next."""
+    st.session_state.url_order = st.session_state[key]
+    st.session_state.current_page = 1
+
+
+def select_order(results: UrlResults, key: str) -> UrlResults:
+    """Order selector for the URL table and export; returns the results viewed in the chosen order."""
+    order = st.session_state.get('url_order', DEFAULT_ORDER)
+    st.selectbox(
+        "Order",
+        ORDERS,
+        index=ORDERS.index(order),
+        format_func=ORDER_LABELS.get,
+        key=key,
+        on_change=change_order,
+        args=(key,),
+        help="Sorting happens the first time an order is shown; discovery order needs no sorting at all",
+    )
+    return results.ordered(order)
+
+
+def change_search(key: str) -> None:
+    """Search box callback: keep the query for whichever results view renders next."""
+    st.session_state.url_search = st.session_state[key]
+    st.session_state.current_page = 1
+
+
+def search_results(results: UrlResults, key: str) -> UrlResults:
+    """
+    Search box for the URL table and export; returns the rows matching the
+    query. The index is built on the first search of a result (see url_search.py).
+    """
+    query = st.session_state.get('url_search', '')
+    st.text_input(
+        "Search URLs",
+        value=query,
+        key=key,
+        on_change=change_search,
+        args=(key,),
+        placeholder="blog, ^https://example.com/en/, .pdf$",
+        help="Case-insensitive text anywhere in the URL; start with ^ to match the beginning, end with $ to match the end",
+    )
+    start = time.perf_counter()
+    matches = results.search(query)
+    if matches.query:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.caption(f"{len(matches):,} of {matches.total:,} URLs match ({elapsed_ms:.0f} ms)")
+    return matches
 
 
-def process_sitemap(url: str, visited: Set[str], all_urls: Set[str], status_container, progress_bar) -> None:
-    """Recursively process a sitemap URL with UI updates."""
-    if url in visited:
+def results_csv(results: UrlResults, details: bool = False) -> bytes:
+    """CSV export of all results, written straight from the columns unless status columns must be joined."""
+    columns = ['url'] + (DETAIL_COLUMNS if details else [])
+    if not st.session_state.get('url_status'):
+        return results.to_csv_bytes(columns)
+    return url_table(results, 0, len(results), columns).to_csv(index=False).encode('utf-8')
+
+
+def display_structure(results: UrlResults) -> None:
+    """Site structure table (pages per first path segment), grouped on the segment column."""
+    structure = results.structure()
+    if structure:
+        st.subheader("Site Structure")
+        structure_df = pd.DataFrame(
+            [
+                {"Site Structure": "▸ " + path, "Pages": count, "Percentage": f"{pct}%"}
+                for path, count, pct in structure
+            ]
+        )
+        st.dataframe(structure_df, use_container_width=True, hide_index=True)
+
+
+def request_url_checks() -> None:
+    """Button callback: check the URLs on the next run (whichever results view renders it)."""
+    st.session_state.url_check_requested = True
+
+
+def display_url_checks(results: UrlResults, key: str) -> None:
+    """
+    Optional status check of every URL (HEAD requests with per-host rate
+    limits). Progress and the URLs that did not answer 2xx are shown live;
+    the results are kept for the URL table and the CSV export.
+    """
+    st.subheader("URL Status")
+    checked: Dict[str, CheckResult] = st.session_state.get('url_status') or {}
+    if checked:
+        counts = Counter(result.status_class for result in checked.values())
+        st.caption(format_progress({'checked': len(checked), 'statuses': counts}, len(results)))
+    st.button("Check URL status" if not checked else "Check again", key=key, on_click=request_url_checks,
+              help="Send a HEAD request to every URL and add its status code, redirect target "
+                   "and response time to the table and the download")
+    if not st.session_state.pop('url_check_requested', False):
         return
     
-    visited.add(url)
+    sorted_urls = results.urls()
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    problems_view = st.empty()
+    checks: Dict[str, CheckResult] = {}
+    problems: List[str] = []
+    progress = {'checked': 0, 'statuses': Counter()}
+    last_render = 0.0
     
-    try:
-        soup = fetch_sitemap(url)
-        time.sleep(REQUEST_DELAY)
-        
-        if is_sitemap_index(soup):
-            child_sitemaps = extract_sitemap_urls(soup)
-            status_container.text(f"Processing sitemap index: {url} ({len(child_sitemaps)} child sitemaps)")
-            
-            for i, child_url in enumerate(child_sitemaps):
-                if progress_bar:
-                    progress_bar.progress((i + 1) / len(child_sitemaps))
-                process_sitemap(child_url, visited, all_urls, status_container, None)
-        else:
-            page_urls = extract_page_urls(soup)
-            status_container.text(f"Extracting URLs from: {url} ({len(page_urls)} HTML URLs found)")
-            all_urls.update(page_urls)
-            
-    except Exception as e:
-        status_container.warning(f"Error processing {url}: {str(e)}")
+    def on_result(result: CheckResult) -> None:
+        nonlocal last_render
+        checks[result.url] = result
+        progress['checked'] += 1
+        progress['statuses'][result.status_class] += 1
+        if result.status_class != '2xx':
+            problems.append(result.url)
+        now = time.time()
+        if now - last_render < LIVE_UPDATE_INTERVAL:
+            return
+        last_render = now
+        progress_bar.progress(progress['checked'] / len(sorted_urls))
+        status_text.text(format_progress(progress, len(sorted_urls)))
+        if problems:
+            with problems_view.container():
+                st.caption(f"Latest non-2xx URLs (live, {len(problems):,} so far)")
+                st.dataframe(results_frame(problems[-CHECK_PREVIEW_ROWS:], checks), use_container_width=True,
+                             hide_index=True, height=300)
+    
+    summary = check_urls(sorted_urls, on_result=on_result)
+    st.session_state.url_status = checks
+    progress_bar.progress(1.0)
+    problems_view.empty()
+    status_text.success(f"{format_progress(summary, len(sorted_urls))} in {summary['elapsed']:.1f}s")
 
 
 def verify_user_authentication() -> Optional[Dict]:
@@ -2129,6 +2506,37 @@ def verify_user_authentication() -> Optional[Dict]:
     return user_info
 
 
+def get_admin_profile_mode(user_info: Optional[Dict]) -> Optional[str]:
+    """
+    Read the hidden admin profiling toggle from the query parameters.
+    Adding ?profile=cpu, ?profile=memory or ?profile=all to the URL profiles
+    the next extraction. Ignored for non-admin users.
+    
+    Returns:
+        'cpu', 'memory', 'all' or None
+    """
+    mode = st.query_params.get("profile", None)
+    if mode not in ("cpu", "memory", "all"):
+        return None
+    if not is_admin(user_info):
+        return None
+    return mode
+
+
+def display_profile_report(report: Dict, profile_bytes: Optional[bytes]) -> None:
+    """Show a profiling report from the hidden admin toggle."""
+    with st.expander("Profiling Report (admin)", expanded=False):
+        st.code(format_report(report), language=None)
+        if profile_bytes:
+            st.download_button(
+                label="Download .prof",
+                data=profile_bytes,
+                file_name="sitemap_extractor.prof",
+                mime="application/octet-stream",
+                key="download_profile",
+            )
+
+
 def display_user_info_compact(user_info: Dict) -> None:
     """
     Display authenticated user information in a compact card for top-right corner.
@@ -2246,13 +2654,54 @@ def main():
     with col1:
         sitemap_url = st.text_input(
             "Sitemap URL",
-            placeholder="https://example.com/sitemap.xml"
+            placeholder="https://example.com/sitemap.xml or example.com"
         )
     
     with col2:
         st.write("")  # Spacing
         extract_button = st.button("Extract URLs", type="primary", use_container_width=True)
     
+    with st.expander("Extraction limits (get the first results faster)"):
+        limit_col1, limit_col2, limit_col3 = st.columns(3)
+        with limit_col1:
+            time_limit = st.number_input("Time limit (seconds)", min_value=0, value=0, step=10,
+                                         help="Stop fetching after this many seconds. 0 = no limit")
+        with limit_col2:
+            max_urls_limit = st.number_input("Max URLs", min_value=0, value=0, step=1000,
+                                             help="Stop fetching once this many URLs were found. 0 = no limit")
+        with limit_col3:
+            max_sitemaps_limit = st.number_input("Max sitemaps", min_value=0, value=0, step=10,
+                                                 help="Stop after fetching this many sitemaps. 0 = no limit")
+    
+    with st.expander("Network timeouts"):
+        timeout_col1, timeout_col2, timeout_col3, timeout_col4 = st.columns(4)
+        with timeout_col1:
+            connect_timeout = st.number_input("Connect timeout (s)", min_value=1.0, value=float(FETCH_TIMEOUTS.connect), step=1.0,
+                                              help="Seconds to establish a connection")
+        with timeout_col2:
+            read_timeout = st.number_input("Read timeout (s)", min_value=1.0, value=float(FETCH_TIMEOUTS.read), step=1.0,
+                                           help="Seconds to wait for each read from the server")
+        with timeout_col3:
+            transfer_timeout = st.number_input("Transfer timeout (s)", min_value=0, value=int(FETCH_TIMEOUTS.total), step=30,
+                                               help="Seconds allowed for one whole sitemap download. 0 = no limit")
+        with timeout_col4:
+            min_throughput_kb = st.number_input("Min throughput (KB/s)", min_value=0.0,
+                                                value=FETCH_TIMEOUTS.min_throughput / 1024, step=1.0,
+                                                help="Abandon downloads slower than this. 0 = disabled")
+    fetch_timeouts = FetchTimeouts(connect=connect_timeout, read=read_timeout,
+                                   total=transfer_timeout or None,
+                                   min_throughput=min_throughput_kb * 1024 or None)
+    
+    with st.expander("URL filters (keep only part of the site)"):
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            include_rules = st.text_area("Include", placeholder="/blog/\nhost:shop.example.com",
+                                         help="One rule per line; keep only URLs matching at least one. "
+                                              "A path prefix (/blog/), path:/glob/*, re:regex, host:name or query:key")
+        with filter_col2:
+            exclude_rules = st.text_area("Exclude", placeholder="query:page\nre:\\.amp$",
+                                         help="One rule per line; drop URLs matching any of them (same syntax)")
+    
     # Processing area
     if extract_button:
         # Strip whitespace from the URL
@@ -2262,8 +2711,15 @@ def main():
             st.error("Please enter a sitemap URL")
             return
         
-        if not sitemap_url.startswith(('http://', 'https://')):
-            st.error("Please enter a valid sitemap URL starting with http:// or https://")
+        sitemap_url = normalize_start_url(sitemap_url)
+        if urlparse(sitemap_url).scheme not in ('http', 'https') or not urlparse(sitemap_url).netloc:
+            st.error("Please enter a valid sitemap URL or domain (e.g. https://example.com/sitemap.xml or example.com)")
+            return
+        
+        try:
+            url_filter = build_filter(include_rules.splitlines(), exclude_rules.splitlines())
+        except ValueError as e:
+            st.error(str(e))
             return
         
         # Initialize session state
@@ -2273,36 +2729,96 @@ def main():
         # Create containers for status updates
         status_container = st.empty()
         progress_container = st.empty()
+        live_results = LiveResultsView(st.empty())
         results_container = st.container()
         
         # Initialize progress
         status_container.info("Starting extraction...")
         progress_bar = progress_container.progress(0)
         
+        # Resolve domains and site URLs into root sitemaps (robots.txt + common locations)
+        if not looks_like_sitemap_url(sitemap_url):
+            status_container.info(f"Looking for sitemaps on {get_origin(sitemap_url)} (robots.txt and common locations)...")
+        root_sitemaps = discover_sitemaps(sitemap_url)
+        if not root_sitemaps:
+            status_container.error(f"No sitemaps found for {sitemap_url}. Please enter the sitemap URL directly.")
+            return
+        if root_sitemaps != [sitemap_url]:
+            st.caption("Discovered sitemaps: " + ", ".join(root_sitemaps))
+        
         # Track visited sitemaps and collected URLs
         visited_sitemaps: Set[str] = set()
         html_urls: Set[str] = set()
+        collector = ResultsCollector()
+        lastmods: Dict[str, str] = {}
+        fetch_stats = FetchStats()
+        breakers = HostCircuitBreakers()
+        crawl_budget = CrawlBudget(deadline=time_limit, max_urls=max_urls_limit, max_sitemaps=max_sitemaps_limit)
+        st.session_state.pop('background_job', None)
+        st.session_state.pop('snapshot', None)
+        st.session_state.pop('url_status', None)
+        
+        # Hidden admin toggle: profile this extraction
+        profile_mode = get_admin_profile_mode(user_info)
+        profile_report = None
+        profile_bytes = None
         
         try:
             # Process the sitemap
             start_time = time.time()
-            process_sitemap(sitemap_url, visited_sitemaps, html_urls, status_container, progress_bar)
+            if profile_mode:
+                fd, profile_path = tempfile.mkstemp(suffix=".prof")
+                os.close(fd)
+                try:
+                    crawl_summary, profile_report = run_profiled(
+                        process_sitemaps, root_sitemaps, visited_sitemaps, html_urls, status_container, progress_bar, fetch_stats, crawl_budget, live_results,
+                        breakers=breakers, timeouts=fetch_timeouts, lastmods=lastmods, url_filter=url_filter,
+                        results=collector,
+                        profile_path=profile_path if profile_mode in ("cpu", "all") else None,
+                        cpu=profile_mode in ("cpu", "all"),
+                        trace_memory=profile_mode in ("memory", "all"),
+                    )
+                    if profile_report.get("profile_path"):
+                        with open(profile_path, "rb") as f:
+                            profile_bytes = f.read()
+                finally:
+                    os.remove(profile_path)
+            else:
+                crawl_summary = process_sitemaps(root_sitemaps, visited_sitemaps, html_urls, status_container, progress_bar, fetch_stats, crawl_budget, live_results,
+                                 breakers=breakers, timeouts=fetch_timeouts, lastmods=lastmods, url_filter=url_filter,
+                                 results=collector)
+            live_results.clear()
             
             # Update progress bar
             if progress_bar:
                 progress_bar.progress(1.0)
             
-            # Convert to sorted list
-            sorted_urls = sorted(html_urls)
+            # Columnar results; the chosen order is only sorted when a page is shown
+            results = collector.build(st.session_state.get('url_order', DEFAULT_ORDER))
             elapsed_time = time.time() - start_time
             
-            # Store URLs in session state for pagination
+            # Store the results in session state for pagination
             st.session_state.extraction_complete = True
-            st.session_state.urls = sorted_urls
+            st.session_state.results = results
             st.session_state.visited_sitemaps_count = len(visited_sitemaps)
+            st.session_state.truncated_reason = crawl_budget.describe() if crawl_budget.truncated else None
+            st.session_state.crawl_remaining = list(crawl_budget.remaining)
+            st.session_state.crawl_visited = visited_sitemaps
+            st.session_state.crawl_lastmods = lastmods
+            st.session_state.crawl_target = sitemap_url
+            st.session_state.url_filter = url_filter
+            st.session_state.fetch_timeouts = fetch_timeouts
+            # Failures a background continuation of the remaining sitemaps cannot make up for
+            st.session_state.crawl_gaps = incomplete_reasons(dict(crawl_summary, truncated=None), len(fetch_stats.truncated))
+            record_snapshot(sitemap_url, results.ordered(ORDER_URL).urls(), lastmods,
+                            incomplete_reasons(crawl_summary, len(fetch_stats.truncated)), url_filter)
             
             # Display results
-            status_container.success(f"Extraction complete! Found {len(html_urls)} HTML URLs in {elapsed_time:.2f} seconds")
+            if crawl_budget.truncated:
+                status_container.warning(f"Partial results ({crawl_budget.describe()}): found {len(html_urls)} HTML URLs "
+                                         f"in {elapsed_time:.2f} seconds")
+            else:
+                status_container.success(f"Extraction complete! Found {len(html_urls)} HTML URLs in {elapsed_time:.2f} seconds")
             
             with results_container:
                 st.header("Results")
@@ -2315,24 +2831,45 @@ def main():
                     st.metric("Sitemaps Processed", len(visited_sitemaps))
                 with col3:
                     st.metric("Processing Time", f"{elapsed_time:.2f}s")
+                if fetch_stats.wire_bytes:
+                    st.caption(
+                        f"Downloaded {fetch_stats.bytes_downloaded / 1024 / 1024:.2f} MB of sitemap XML "
+                        f"({fetch_stats.wire_bytes / 1024 / 1024:.2f} MB on the wire, "
+                        f"{fetch_stats.compression_ratio:.1f}x compression; encodings: "
+                        + ", ".join(f"{name} {count}" for name, count in fetch_stats.encodings.most_common()) + ")"
+                    )
+                
+                display_partial_results_notice("continue_background_main")
+                
+                if fetch_stats.truncated:
+                    st.warning(
+                        f"{len(fetch_stats.truncated)} sitemap(s) were truncated because they exceeded the size or "
+                        "50,000-URL limits; only their first part was processed:\n\n"
+                        + "\n".join(f"- {url} ({reason})" for url, reason in fetch_stats.truncated.items())
+                    )
+                
+                if breakers.skipped:
+                    st.warning(
+                        f"{len(breakers.skipped)} sitemap(s) were skipped because their host kept failing:\n\n"
+                        + "\n".join(f"- {host}: {count} sitemap(s)" for host, count in breakers.skipped_by_host().most_common())
+                    )
+                
+                if profile_report:
+                    display_profile_report(profile_report, profile_bytes)
+                
+                display_snapshot_diff("snapshot_compare")
                 
                 # Site Structure snapshot (path, pages, percentage)
-                if sorted_urls:
-                    structure = get_site_structure(sorted_urls)
-                    if structure:
-                        st.subheader("Site Structure")
-                        structure_df = pd.DataFrame(
-                            [
-                                {"Site Structure": "▸ " + path, "Pages": count, "Percentage": f"{pct}%"}
-                                for path, count, pct in structure
-                            ]
-                        )
-                        st.dataframe(structure_df, use_container_width=True, hide_index=True)
+                display_structure(results)
                 
                 # Display URLs with pagination
-                if sorted_urls:
+                if len(results):
+                    display_url_checks(results, "check_urls_main")
+                    
                     # Pagination controls
                     st.subheader("All URLs")
+                    results = select_order(results, "url_order_main")
+                    results = search_results(results, "url_search_main")
                     
                     # Items per page selector
                     items_per_page_options = [25, 50, 100, 200, 500]
@@ -2344,8 +2881,8 @@ def main():
                     
                     # Get current items_per_page for initial calculation
                     items_per_page = st.session_state.items_per_page
-                    total_urls = len(sorted_urls)
-                    total_pages = (total_urls + items_per_page - 1) // items_per_page if items_per_page > 0 else 1
+                    total_urls = len(results)
+                    total_pages = max(1, (total_urls + items_per_page - 1) // items_per_page) if items_per_page > 0 else 1
                     
                     # All pagination controls in one line using flexbox
                     st.markdown('''
@@ -2399,7 +2936,7 @@ def main():
                     
                     # Recalculate pagination after items per page change
                     items_per_page = st.session_state.items_per_page
-                    total_pages = (total_urls + items_per_page - 1) // items_per_page if items_per_page > 0 else 1
+                    total_pages = max(1, (total_urls + items_per_page - 1) // items_per_page) if items_per_page > 0 else 1
                     if st.session_state.current_page > total_pages:
                         st.session_state.current_page = total_pages
                     
@@ -2409,18 +2946,22 @@ def main():
                     end_idx = min(start_idx + items_per_page, total_urls)
                     
                     # Display page info
-                    st.info(f"Showing page {current_page} of {total_pages} | URLs {start_idx + 1} to {end_idx} of {total_urls}")
+                    if total_urls:
+                        st.info(f"Showing page {current_page} of {total_pages} | URLs {start_idx + 1} to {end_idx} of {total_urls}")
+                    else:
+                        st.info("No URLs match the search.")
                     
                     # Display URLs for current page
-                    page_urls = sorted_urls[start_idx:end_idx]
-                    urls_df = pd.DataFrame({'URL': page_urls})
+                    urls_df = url_table(results, start_idx, end_idx)
                     urls_df.index = range(start_idx + 1, end_idx + 1)  # Start index from 1
                     
                     st.dataframe(urls_df, use_container_width=True, height=400)
                     
                     # Download button
                     st.divider()
-                    csv_data = pd.DataFrame({'URL': sorted_urls}).to_csv(index=False)
+                    include_details = st.checkbox("Include source sitemap, depth and lastmod columns",
+                                                  key="export_details_main")
+                    csv_data = results_csv(results, include_details)
                     st.download_button(
                         label="📥 Download Report",
                         data=csv_data,
@@ -2438,34 +2979,39 @@ def main():
     
     # Show previous results if available
     elif 'extraction_complete' in st.session_state and st.session_state.extraction_complete:
-        if 'urls' in st.session_state and st.session_state.urls:
-            sorted_urls = st.session_state.urls
+        display_background_crawl()
+        
+        results = st.session_state.get('results')
+        if results is not None and len(results):
             
             st.header("Previous Results")
             
             # Statistics
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total HTML URLs", len(sorted_urls))
+                st.metric("Total HTML URLs", len(results))
             with col2:
                 st.metric("Sitemaps Processed", st.session_state.get('visited_sitemaps_count', 0))
             with col3:
-                st.metric("Status", "Complete")
+                if st.session_state.get('background_job'):
+                    st.metric("Status", "Running")
+                elif st.session_state.get('truncated_reason'):
+                    st.metric("Status", "Partial")
+                else:
+                    st.metric("Status", "Complete")
+            
+            display_partial_results_notice("continue_background_prev")
+            display_snapshot_diff("snapshot_compare")
             
             # Site Structure snapshot (path, pages, percentage)
-            structure = get_site_structure(sorted_urls)
-            if structure:
-                st.subheader("Site Structure")
-                structure_df = pd.DataFrame(
-                    [
-                        {"Site Structure": "▸ " + path, "Pages": count, "Percentage": f"{pct}%"}
-                        for path, count, pct in structure
-                    ]
-                )
-                st.dataframe(structure_df, use_container_width=True, hide_index=True)
+            display_structure(results)
+            
+            display_url_checks(results, "check_urls_prev")
             
             # Pagination controls
             st.subheader("All URLs")
+            results = select_order(results, "url_order_prev")
+            results = search_results(results, "url_search_prev")
             
             # Items per page selector
             items_per_page_options = [25, 50, 100, 200, 500]
@@ -2477,8 +3023,8 @@ def main():
             
             # Get current items_per_page for initial calculation
             items_per_page = st.session_state.items_per_page
-            total_urls = len(sorted_urls)
-            total_pages = (total_urls + items_per_page - 1) // items_per_page if items_per_page > 0 else 1
+            total_urls = len(results)
+            total_pages = max(1, (total_urls + items_per_page - 1) // items_per_page) if items_per_page > 0 else 1
             
             # All pagination controls in one line using flexbox
             st.markdown('''
@@ -2532,7 +3078,7 @@ def main():
             
             # Recalculate pagination after items per page change
             items_per_page = st.session_state.items_per_page
-            total_pages = (total_urls + items_per_page - 1) // items_per_page if items_per_page > 0 else 1
+            total_pages = max(1, (total_urls + items_per_page - 1) // items_per_page) if items_per_page > 0 else 1
             if st.session_state.current_page > total_pages:
                 st.session_state.current_page = total_pages
             
@@ -2542,18 +3088,22 @@ def main():
             end_idx = min(start_idx + items_per_page, total_urls)
             
             # Display page info
-            st.info(f"Showing page {current_page} of {total_pages} | URLs {start_idx + 1} to {end_idx} of {total_urls}")
+            if total_urls:
+                st.info(f"Showing page {current_page} of {total_pages} | URLs {start_idx + 1} to {end_idx} of {total_urls}")
+            else:
+                st.info("No URLs match the search.")
             
             # Display URLs for current page
-            page_urls = sorted_urls[start_idx:end_idx]
-            urls_df = pd.DataFrame({'URL': page_urls})
+            urls_df = url_table(results, start_idx, end_idx)
             urls_df.index = range(start_idx + 1, end_idx + 1)
             
             st.dataframe(urls_df, use_container_width=True, height=400)
             
             # Download button
             st.divider()
-            csv_data = pd.DataFrame({'URL': sorted_urls}).to_csv(index=False)
+            include_details = st.checkbox("Include source sitemap, depth and lastmod columns",
+                                          key="export_details_prev")
+            csv_data = results_csv(results, include_details)
             st.download_button(
                 label="📥 Download Report",
                 data=csv_data,
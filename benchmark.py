@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""
+Sitemap Extractor Benchmark Harness
+
+Generates a synthetic sitemap tree of configurable shape, serves it from a
+local HTTP server and measures how fast the shared extraction engine
+(sitemap_engine, used by both the CLI and the web app) crawls it.
+
+Each run is executed in a fresh child process so that peak RSS is measured
+per run. Results are written as JSON so runs can be compared between commits;
+--check and --baseline turn the benchmark into a guard that exits non-zero
+when the engine loses URLs or gets slower than a saved result.
+
+Usage:
+    python benchmark.py [options]
+
+Example:
+    python benchmark.py --depth 2 --fanout 10 --urls-per-file 5000 --gzip --repeat 3
+    python benchmark.py --latency 0.05 --error-rate 0.1 --output bench_flaky.json
+    python benchmark.py --h2-server --transport h2c --workers 16 --per-host 16 --latency 0.02
+    python benchmark.py --check --baseline bench_baseline.json --max-slowdown 1.25
+
+Output:
+    bench_results.json - run metadata, per-run measurements and a summary
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+# Default tree shape
+DEFAULT_DEPTH = 1           # number of sitemap index levels above the URL sets
+DEFAULT_FANOUT = 10         # child sitemaps per index
+DEFAULT_URLS_PER_FILE = 1000
+DEFAULT_OUTPUT = 'bench_results.json'
+DEFAULT_MAX_SLOWDOWN = 1.25  # --baseline fails when the median wall time grows beyond this factor
+
+# Extractor functions whose time is accumulated per phase (missing ones are skipped)
+PHASES = (
+    'fetch_sitemap',       # download and streaming parse
+    'extract_page_entries',
+)
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# Content encodings the test server can use; gzip-file serves .xml.gz-style bodies
+GZIP_FILE = 'gzip-file'
+ENCODINGS = ('identity', 'gzip', 'deflate', 'br', 'zstd', GZIP_FILE)
+# Optional packages the fetcher (urllib3) decodes these with, and the server compresses with
+ENCODING_PACKAGES = {'br': 'brotli', 'zstd': 'backports.zstd'}
+
+# Test server endpoints for connection / protocol counters
+STATS_PATH = '/__stats'
+RESET_PATH = '/__stats/reset'
+
+
+def build_tree(base_url: str, depth: int, fanout: int, urls_per_file: int) -> Dict[str, bytes]:
+    """
+    Build a synthetic sitemap tree.
+
+    Args:
+        base_url: Origin the child sitemap <loc> entries point at
+        depth: Number of sitemap index levels (0 means the root is a URL set)
+        fanout: Number of children per sitemap index
+        urls_per_file: Number of <url> entries per URL set
+
+    Returns:
+        Mapping of request path -> XML document bytes. The root is '/sitemap.xml'.
+    """
+    tree: Dict[str, bytes] = {}
+    page_counter = 0
+
+    def add_node(path: str, level: int) -> None:
+        nonlocal page_counter
+        if level < depth:
+            children = [f"{path[:-4]}-{i}.xml" for i in range(fanout)]
+            entries = ''.join(
+                f"<sitemap><loc>{base_url}{child}</loc><lastmod>2024-01-01</lastmod></sitemap>"
+                for child in children
+            )
+            tree[path] = (
+                f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="{SITEMAP_NS}">{entries}</sitemapindex>'
+            ).encode('utf-8')
+            for child in children:
+                add_node(child, level + 1)
+        else:
+            entries = []
+            for _ in range(urls_per_file):
+                page_counter += 1
+                entries.append(
+                    f"<url><loc>https://bench.example.com/section-{page_counter % 50}/page-{page_counter}</loc>"
+                    f"<lastmod>2024-01-01</lastmod></url>"
+                )
+            tree[path] = (
+                f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="{SITEMAP_NS}">{"".join(entries)}</urlset>'
+            ).encode('utf-8')
+
+    add_node('/sitemap.xml', 0)
+    return tree
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body for the given content encoding (br and zstd need ENCODING_PACKAGES)."""
+    if encoding in ('gzip', GZIP_FILE):
+        return gzip.compress(body)
+    if encoding == 'deflate':
+        return zlib.compress(body)
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body)
+    if encoding == 'zstd':
+        try:
+            from compression import zstd  # Python 3.14+
+        except ImportError:
+            from backports import zstd
+        return zstd.compress(body)
+    return body
+
+
+class TreeResponder:
+    """
+    Serves a synthetic tree (shared by the HTTP/1.1 and HTTP/2 test servers)
+    and counts connections and requests per protocol version.
+
+    Args:
+        tree: Mapping of path -> XML bytes
+        encoding: Content encoding used when the client accepts it ('identity'
+            for none, 'gzip-file' to serve gzip files without Content-Encoding)
+        failing_paths: Mapping of path -> number of initial requests answered with 503
+    """
+
+    def __init__(self, tree: Dict[str, bytes], encoding: str, failing_paths: Dict[str, int]):
+        self.bodies = tree
+        self.encoding = encoding
+        self.encoded = {path: compress(body, encoding) for path, body in tree.items()}
+        self.remaining_failures = dict(failing_paths)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.clients: set = set()
+            self.requests_by_protocol: Dict[str, int] = {}
+
+    def respond(self, path: str, client, http_version: str,
+                accept_encoding: str = '') -> Tuple[int, List[Tuple[str, str]], bytes]:
+        """Return (status, headers, body) for a request path."""
+        path = path.split('?', 1)[0]
+        if path == STATS_PATH:
+            with self.lock:
+                body = json.dumps({
+                    'connections': len(self.clients),
+                    'requests_by_protocol': dict(self.requests_by_protocol),
+                }).encode('utf-8')
+            return 200, [('Content-Type', 'application/json')], body
+        if path == RESET_PATH:
+            self.reset_stats()
+            return 204, [], b''
+
+        with self.lock:
+            self.clients.add(tuple(client))
+            self.requests_by_protocol[http_version] = self.requests_by_protocol.get(http_version, 0) + 1
+            failures_left = self.remaining_failures.get(path, 0)
+            if failures_left:
+                self.remaining_failures[path] = failures_left - 1
+
+        if failures_left:
+            return 503, [('Content-Type', 'text/plain')], b'Injected failure'
+        if path not in self.bodies:
+            return 404, [('Content-Type', 'text/plain')], b'Not found'
+
+        accepted = {name.split(';')[0].strip() for name in accept_encoding.split(',')}
+        if self.encoding == GZIP_FILE:
+            return 200, [('Content-Type', 'application/x-gzip')], self.encoded[path]
+        if self.encoding != 'identity' and self.encoding in accepted:
+            return 200, [('Content-Type', 'application/xml'), ('Content-Encoding', self.encoding)], self.encoded[path]
+        return 200, [('Content-Type', 'application/xml')], self.bodies[path]
+
+
+def make_handler(responder: TreeResponder, latency: float):
+    """
+    Create an HTTP/1.1 (keep-alive) request handler class for the stdlib server.
+
+    Args:
+        responder: Tree to serve
+        latency: Seconds to sleep before answering each request
+    """
+
+    class SitemapRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            status, headers, body = responder.respond(self.path, self.client_address, '1.1',
+                                                      self.headers.get('Accept-Encoding', ''))
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SitemapRequestHandler
+
+
+def make_asgi_app(responder: TreeResponder, latency: float):
+    """
+    Create an ASGI app for hypercorn, which speaks HTTP/1.1, HTTP/2 over
+    TLS and h2c (cleartext HTTP/2 with prior knowledge) on the same port.
+    """
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        if latency:
+            await asyncio.sleep(latency)
+        request_headers = dict(scope['headers'])
+        status, headers, body = responder.respond(scope['path'], scope['client'], scope['http_version'],
+                                                  request_headers.get(b'accept-encoding', b'').decode())
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode(), value.encode())
+                        for name, value in headers + [('Content-Length', str(len(body)))]],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    return app
+
+
+def _serve(params: Dict, ready: multiprocessing.Queue) -> None:
+    """Child process entry point: build the tree and serve it forever."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(128)
+    base_url = f"http://127.0.0.1:{listener.getsockname()[1]}"
+
+    tree = build_tree(base_url, params['depth'], params['fanout'], params['urls_per_file'])
+
+    # Pick a reproducible subset of paths that fail their first N requests
+    rng = random.Random(params['seed'])
+    failing_paths = {
+        path: params['error_repeats']
+        for path in sorted(tree)
+        if rng.random() < params['error_rate']
+    }
+
+    encoding = params.get('encoding') or ('gzip' if params.get('gzip') else 'identity')
+    responder = TreeResponder(tree, encoding, failing_paths)
+    info = {
+        'root_url': f"{base_url}/sitemap.xml",
+        'sitemaps_total': len(tree),
+        'urls_total': params['fanout'] ** params['depth'] * params['urls_per_file'],
+        'bytes_total': sum(len(body) for body in tree.values()),
+        'failing_sitemaps': len(failing_paths),
+        'server': 'hypercorn' if params.get('h2_server') else 'http.server',
+    }
+
+    if params.get('h2_server'):
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"fd://{listener.fileno()}"]
+        config.accesslog = None
+        config.errorlog = None
+        ready.put(info)
+        asyncio.run(serve(make_asgi_app(responder, params['latency']), config))
+        return
+
+    server = ThreadingHTTPServer(listener.getsockname(), make_handler(responder, params['latency']),
+                                 bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    ready.put(info)
+    server.serve_forever()
+
+
+def _server_stats(root_url: str, reset: bool = False) -> Dict:
+    """Read (or reset) the test server's connection and protocol counters."""
+    origin = root_url.rsplit('/', 1)[0]
+    with urllib.request.urlopen(origin + (RESET_PATH if reset else STATS_PATH), timeout=10) as response:
+        body = response.read()
+    return json.loads(body) if body else {}
+
+
+class SitemapServer:
+    """Local synthetic sitemap server running in a separate process."""
+
+    def __init__(self, params: Dict):
+        self.params = params
+        self.process: Optional[multiprocessing.Process] = None
+        self.info: Dict = {}
+
+    def __enter__(self) -> 'SitemapServer':
+        ready: multiprocessing.Queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(self.params, ready), daemon=True)
+        self.process.start()
+        self.info = ready.get(timeout=120)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+
+
+def _timed(func, totals: Dict[str, List[float]], lock: threading.Lock):
+    """Wrap an extractor function so its wall time is accumulated under its name."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with lock:
+                entry = totals.setdefault(func.__name__, [0.0, 0])
+                entry[0] += elapsed
+                entry[1] += 1
+    return wrapper
+
+
+def _run_once(root_url: str, request_delay: float, crawl_options: Dict, result: multiprocessing.Queue) -> None:
+    """Child process entry point: crawl the local tree once and report measurements."""
+    import contextlib
+    import io
+    import sitemap_engine
+    from fetcher import FetchStats
+
+    sitemap_engine.REQUEST_DELAY = request_delay
+
+    totals: Dict[str, List[float]] = {}
+    lock = threading.Lock()
+    for name in PHASES:
+        func = getattr(sitemap_engine, name, None)
+        if func is not None:
+            setattr(sitemap_engine, name, _timed(func, totals, lock))
+
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    visited: set = set()
+    urls: set = set()
+    stats = FetchStats(max_crawl_bytes=None)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = sitemap_engine.process_sitemap(root_url, visited, urls, stats=stats, **crawl_options)
+    crawl_seconds = time.perf_counter() - start
+
+    sort_start = time.perf_counter()
+    sorted(urls)
+    sort_seconds = time.perf_counter() - sort_start
+
+    result.put({
+        'wall_seconds': crawl_seconds + sort_seconds,
+        'crawl_seconds': crawl_seconds,
+        'sitemaps_processed': len(visited),
+        'urls_found': len(urls),
+        'errors': summary['errors'],
+        'urls_per_second': len(urls) / crawl_seconds if crawl_seconds else 0.0,
+        'bytes_decoded': stats.bytes_downloaded,
+        'bytes_on_wire': stats.wire_bytes,
+        'encodings': dict(stats.encodings),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'rss_before_kb': rss_before_kb,
+        'phases': {
+            **{name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in totals.items()},
+            'sort': {'seconds': sort_seconds, 'calls': 1},
+        },
+    })
+
+
+def run_benchmark(params: Dict) -> Dict:
+    """
+    Serve a synthetic tree and crawl it params['repeat'] times.
+
+    Returns:
+        Dictionary with 'server', 'runs' and 'summary' sections
+    """
+    runs = []
+    with SitemapServer(params) as server:
+        for _ in range(params['repeat']):
+            _server_stats(server.info['root_url'], reset=True)
+            result: multiprocessing.Queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(
+                target=_run_once,
+                args=(server.info['root_url'], params['request_delay'], params['crawl_options'], result),
+            )
+            worker.start()
+            run = result.get()
+            worker.join()
+            run['server'] = _server_stats(server.info['root_url'])
+            runs.append(run)
+
+    def median(key: str) -> float:
+        return statistics.median(run[key] for run in runs)
+
+    summary = {
+        'wall_seconds_median': median('wall_seconds'),
+        'urls_per_second_median': median('urls_per_second'),
+        'peak_rss_kb_max': max(run['peak_rss_kb'] for run in runs),
+        'phases_seconds_median': {
+            name: statistics.median(run['phases'][name]['seconds'] for run in runs if name in run['phases'])
+            for name in runs[0]['phases']
+        },
+    }
+    return {'server': server.info, 'runs': runs, 'summary': summary}
+
+
+def check_results(results: Dict, baseline: Optional[Dict] = None, max_slowdown: float = DEFAULT_MAX_SLOWDOWN) -> List[str]:
+    """
+    Compare a benchmark result with what the served tree contains and,
+    optionally, with a saved baseline result.
+
+    Returns:
+        List of problems (empty if the engine passed)
+    """
+    from fetcher import MAX_URLS_PER_SITEMAP
+
+    problems = []
+    server = results['server']
+    params = results['meta']['params']
+    # URL sets beyond the protocol's 50,000 entries are cut off by design
+    expected_urls = params['fanout'] ** params['depth'] * min(params['urls_per_file'], MAX_URLS_PER_SITEMAP)
+    for number, run in enumerate(results['runs'], 1):
+        if run['urls_found'] != expected_urls:
+            problems.append(f"run {number}: found {run['urls_found']} URLs, expected {expected_urls} "
+                            f"(the tree has {server['urls_total']})")
+        if run['sitemaps_processed'] != server['sitemaps_total']:
+            problems.append(f"run {number}: processed {run['sitemaps_processed']} sitemaps, "
+                            f"the tree has {server['sitemaps_total']}")
+
+    if baseline is not None:
+        def shape(params: Dict) -> Dict:
+            return {key: value for key, value in params.items() if key != 'repeat'}
+
+        if shape(baseline['meta']['params']) != shape(results['meta']['params']):
+            problems.append("baseline was recorded with different parameters; rerun it with the same options")
+        else:
+            previous = baseline['summary']['wall_seconds_median']
+            current = results['summary']['wall_seconds_median']
+            if previous and current > previous * max_slowdown:
+                problems.append(f"median wall time {current:.3f}s is {current / previous:.2f}x the baseline "
+                                f"({previous:.3f}s, commit {baseline['meta'].get('commit') or 'unknown'}), "
+                                f"allowed {max_slowdown:.2f}x")
+    return problems
+
+
+def _git_commit() -> Optional[str]:
+    """Return the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the sitemap extraction engine against a local synthetic sitemap tree.')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help='sitemap index levels (0 = single URL set)')
+    parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT, help='child sitemaps per index')
+    parser.add_argument('--urls-per-file', type=int, default=DEFAULT_URLS_PER_FILE, help='<url> entries per URL set')
+    parser.add_argument('--gzip', action='store_true', help='shorthand for --encoding gzip')
+    parser.add_argument('--encoding', choices=ENCODINGS, default=None,
+                        help='content encoding the server uses when the client accepts it (default: identity)')
+    parser.add_argument('--latency', type=float, default=0.0, help='server-side delay per request in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of sitemaps that fail with 503')
+    parser.add_argument('--error-repeats', type=int, default=1, help='number of 503s each failing sitemap returns first')
+    parser.add_argument('--request-delay', type=float, default=0.0, help='value for sitemap_engine.REQUEST_DELAY')
+    parser.add_argument('--workers', type=int, default=None, help='concurrent fetches (extractor default if omitted)')
+    parser.add_argument('--per-host', type=int, default=None, help='concurrent fetches per host')
+    parser.add_argument('--policy', default=None, help='crawl frontier policy')
+    parser.add_argument('--transport', default=None,
+                        help='extractor transport: http1, http2 or h2c (h2c needs --h2-server)')
+    parser.add_argument('--h2-server', action='store_true',
+                        help='serve with hypercorn (HTTP/1.1 and h2c) instead of http.server')
+    parser.add_argument('--repeat', type=int, default=1, help='number of measured runs')
+    parser.add_argument('--seed', type=int, default=0, help='seed for error injection')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON results file')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 unless every run found all URLs and sitemaps of the tree')
+    parser.add_argument('--baseline', default=None, metavar='JSON',
+                        help='earlier results file to compare against; exit with status 1 on a slowdown')
+    parser.add_argument('--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help='allowed median wall time relative to --baseline (default: %(default)g)')
+    return parser.parse_args(argv)
+
+
+def main():
+    """
+    Main function to run the benchmark.
+    """
+    args = parse_args()
+    params = vars(args).copy()
+    output_file = params.pop('output')
+    check = params.pop('check')
+    baseline_file = params.pop('baseline')
+    max_slowdown = params.pop('max_slowdown')
+    crawl_options = {
+        'workers': params.pop('workers'),
+        'per_host_limit': params.pop('per_host'),
+        'policy': params.pop('policy'),
+        'transport': params.pop('transport'),
+    }
+    params['crawl_options'] = {key: value for key, value in crawl_options.items() if value is not None}
+
+    # Without the decoder the client would not accept the encoding and the run would measure identity
+    from fetcher import ACCEPT_ENCODING
+    if args.encoding in ENCODING_PACKAGES and args.encoding not in ACCEPT_ENCODING.split(','):
+        print(f"Error: --encoding {args.encoding} needs the optional dependency: pip install {ENCODING_PACKAGES[args.encoding]}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("Sitemap Extractor Benchmark")
+    print("=" * 60)
+    print(f"Tree: depth={args.depth} fanout={args.fanout} urls/file={args.urls_per_file} "
+          f"encoding={args.encoding or ('gzip' if args.gzip else 'identity')} latency={args.latency}s error_rate={args.error_rate}\n")
+
+    results = run_benchmark(params)
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'params': params,
+        },
+        **results,
+    }
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    summary = results['summary']
+    print(f"Sitemaps served: {results['server']['sitemaps_total']}")
+    print(f"Median wall time: {summary['wall_seconds_median']:.3f}s")
+    print(f"Median throughput: {summary['urls_per_second_median']:.0f} URLs/s")
+    print(f"Peak RSS: {summary['peak_rss_kb_max'] / 1024:.1f} MB")
+    last_run = results['runs'][-1]
+    print(f"Bytes on the wire: {last_run['bytes_on_wire'] / 1024 / 1024:.2f} MB "
+          f"(decoded {last_run['bytes_decoded'] / 1024 / 1024:.2f} MB, encodings {last_run['encodings']})")
+    last_server = results['runs'][-1]['server']
+    print(f"Server connections (last run): {last_server['connections']} "
+          f"(requests by HTTP version: {last_server['requests_by_protocol']})")
+    for name, seconds in summary['phases_seconds_median'].items():
+        print(f"  {name:<22} {seconds:.3f}s")
+    print(f"Results saved to: {output_file}")
+    print("=" * 60)
+
+    if check or baseline_file:
+        baseline = None
+        if baseline_file:
+            with open(baseline_file, encoding='utf-8') as f:
+                baseline = json.load(f)
+        problems = check_results(report, baseline, max_slowdown)
+        if problems:
+            print("Benchmark check FAILED:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("Benchmark check passed")
+
+
+if __name__ == '__main__':
+    main()
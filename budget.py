@@ -0,0 +1,85 @@
+"""
+Crawl Budgets
+
+Wall-clock, URL-count and sitemap-count limits for a single crawl. When a
+limit is reached the crawl stops fetching, keeps what it has found so far and
+records the sitemaps it did not get to in `remaining`, so the crawl can be
+continued later (e.g. in the background from the web app).
+"""
+
+import time
+from typing import List, Optional
+
+
+# Reasons reported when a budget stops a crawl
+TRUNCATED_DEADLINE = 'deadline'
+TRUNCATED_MAX_URLS = 'max_urls'
+TRUNCATED_MAX_SITEMAPS = 'max_sitemaps'
+
+REASON_LABELS = {
+    TRUNCATED_DEADLINE: 'time limit reached',
+    TRUNCATED_MAX_URLS: 'URL limit reached',
+    TRUNCATED_MAX_SITEMAPS: 'sitemap limit reached',
+}
+
+
+class CrawlBudget:
+    """
+    Limits for one crawl. Any limit left as None (or 0) is not enforced.
+
+    Attributes:
+        deadline: Wall-clock seconds allowed from construction
+        max_urls: Stop fetching once at least this many URLs were found
+        max_sitemaps: Stop after fetching this many sitemaps
+        reason: Why the budget stopped the crawl (sticky once set), or None
+        remaining: Sitemaps left unfetched when the budget stopped the crawl
+    """
+
+    def __init__(self, deadline: Optional[float] = None,
+                 max_urls: Optional[int] = None,
+                 max_sitemaps: Optional[int] = None):
+        self.deadline = deadline or None
+        self.max_urls = max_urls or None
+        self.max_sitemaps = max_sitemaps or None
+        self.started_at = time.monotonic()
+        self.reason: Optional[str] = None
+        self.remaining: List = []
+
+    @property
+    def truncated(self) -> bool:
+        """True if the budget stopped the crawl with sitemaps left unfetched."""
+        return self.reason is not None and bool(self.remaining)
+
+    def time_left(self) -> Optional[float]:
+        """Seconds until the deadline (never negative), or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - (time.monotonic() - self.started_at))
+
+    def check(self, urls_found: int, sitemaps_fetched: int) -> Optional[str]:
+        """
+        Check the limits against the crawl's progress.
+
+        Returns:
+            The reason the budget is exhausted, or None while fetching may continue
+        """
+        if self.reason is None:
+            if self.deadline is not None and self.time_left() <= 0:
+                self.reason = TRUNCATED_DEADLINE
+            elif self.max_urls is not None and urls_found >= self.max_urls:
+                self.reason = TRUNCATED_MAX_URLS
+            elif self.max_sitemaps is not None and sitemaps_fetched >= self.max_sitemaps:
+                self.reason = TRUNCATED_MAX_SITEMAPS
+        return self.reason
+
+    def stop(self, reason: str) -> None:
+        """
+        End the crawl early for an outside reason (e.g. from another thread);
+        it stops fetching at its next budget check, like for any other limit.
+        """
+        if self.reason is None:
+            self.reason = reason
+
+    def describe(self) -> str:
+        """Human-readable reason, e.g. 'time limit reached'."""
+        return REASON_LABELS.get(self.reason, self.reason or '')
@@ -0,0 +1,148 @@
+"""
+Per-Host Circuit Breakers
+
+Stops a crawl from spending its time on an origin that is down. Each host
+has a breaker with three states:
+
+    closed     Requests flow normally; consecutive transient failures are counted
+    open       After `failure_threshold` consecutive failures requests fail fast
+               (the sitemap is skipped) until `reset_timeout` seconds have passed
+    half-open  One probe request is let through; success closes the breaker,
+               failure opens it again for another `reset_timeout`
+
+Only transient failures (timeouts, connection errors, 5xx, 429) count; a 404
+proves the host is alive. Skipped sitemaps are recorded for the run summary.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+FAILURE_THRESHOLD = 5     # consecutive transient failures before a host's breaker opens
+RESET_TIMEOUT = 30.0      # seconds an open breaker fails fast before probing again
+
+# Breaker states
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    Breaker for a single host. Not thread-safe on its own; HostCircuitBreakers
+    serialises access.
+
+    Attributes:
+        state: STATE_CLOSED, STATE_OPEN or STATE_HALF_OPEN
+        failures: Consecutive transient failures while closed
+        opened_at: Monotonic time the breaker last opened
+        probe_in_flight: True while the half-open probe request is running
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Decide whether a request may go out now (claims the probe when half-open)."""
+        if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = STATE_HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = STATE_OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+
+class HostCircuitBreakers:
+    """
+    Thread-safe registry of per-host breakers for one crawl.
+
+    Attributes:
+        failure_threshold: Consecutive failures that open a host's breaker
+            (0 or None disables circuit breaking)
+        reset_timeout: Seconds an open breaker fails fast before probing again
+        skipped: Mapping of skipped sitemap URL -> host
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold or None
+        self.reset_timeout = reset_timeout
+        self.skipped: Dict[str, str] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def allow(self, host: str) -> bool:
+        """Return True if a request to `host` may be sent now."""
+        if self.failure_threshold is None:
+            return True
+        with self._lock:
+            return self._get(host).allow_request()
+
+    def probing(self, host: str) -> bool:
+        """True while a half-open probe to `host` is running (other requests should wait)."""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            return breaker is not None and breaker.state == STATE_HALF_OPEN and breaker.probe_in_flight
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            return breaker is not None and breaker.state == STATE_OPEN
+
+    def record_success(self, host: str) -> None:
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            self._get(host).record_success()
+
+    def record_failure(self, host: str) -> None:
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            breaker = self._get(host)
+            was_open = breaker.state == STATE_OPEN
+            breaker.record_failure()
+            if breaker.state == STATE_OPEN and not was_open:
+                logger.warning("%s failed %d time(s) in a row - skipping its sitemaps for %.0fs",
+                               host, breaker.failures, self.reset_timeout)
+
+    def record_skip(self, url: str, host: str) -> None:
+        with self._lock:
+            self.skipped[url] = host
+
+    def skipped_by_host(self) -> Counter:
+        """Number of skipped sitemaps per host."""
+        with self._lock:
+            return Counter(self.skipped.values())
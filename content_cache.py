@@ -0,0 +1,148 @@
+"""
+Content-Hash Sitemap Cache
+
+Some CMSs publish the same sitemap under several URLs (paginated aliases,
+http/https or trailing-slash variants, language folders pointing at one
+file). With a ContentCache the engine hashes each sitemap body while it
+downloads and parses it only if that content has not been seen before;
+identical bodies reuse the entries parsed the first time.
+
+- Bodies are hashed after content decoding (gzip etc.), so the same sitemap
+  served compressed and uncompressed still matches.
+- The in-memory cache is bounded by the number of entries it holds and
+  evicts the least recently used sitemaps first.
+- With a directory, parsed sitemaps are also stored on disk, so identical
+  sitemaps are not parsed again in later runs.
+- Truncated bodies are never cached.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sitemap_parser import SitemapDocument, SITEMAP_INDEX, URLSET
+
+
+# Configuration
+CACHE_MAX_ENTRIES = 2_000_000   # sitemap entries (URLs) kept in memory across all cached sitemaps
+CACHE_SUFFIX = '.tsv.gz'
+
+
+def content_hasher():
+    """New hash object for a sitemap body (BLAKE2b, 128-bit digest)."""
+    return hashlib.blake2b(digest_size=16)
+
+
+class ContentCache:
+    """
+    Thread-safe content digest -> parsed sitemap cache.
+
+    Attributes:
+        directory: Where parsed sitemaps are persisted (None for memory only)
+        max_entries: Sitemap entries kept in memory before the oldest sitemaps are evicted
+        hits: Bodies whose parse was skipped
+        misses: Bodies parsed and added to the cache
+        disk_hits: Hits served from the directory (parsed in an earlier run)
+        bytes_skipped: Decoded bytes that did not need parsing
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.bytes_skipped = 0
+        # digest -> (document, URL the content was first seen at), least recently used first
+        self._documents: 'OrderedDict[str, Tuple[SitemapDocument, str]]' = OrderedDict()
+        self._entry_count = 0
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest + CACHE_SUFFIX)
+
+    def _remember(self, digest: str, document: SitemapDocument, url: str) -> None:
+        with self._lock:
+            if digest in self._documents:
+                return
+            self._documents[digest] = (document, url)
+            self._entry_count += len(document.entries)
+            while self._entry_count > self.max_entries and len(self._documents) > 1:
+                _, (evicted, _) = self._documents.popitem(last=False)
+                self._entry_count -= len(evicted.entries)
+
+    def get(self, digest: str, size: int = 0) -> Optional[Tuple[SitemapDocument, str]]:
+        """
+        Look up a body by digest.
+
+        Returns:
+            (parsed document, URL it was first seen at), or None if the
+            content is new
+        """
+        with self._lock:
+            cached = self._documents.get(digest)
+            if cached is not None:
+                self._documents.move_to_end(digest)
+                self.hits += 1
+                self.bytes_skipped += size
+                return cached
+        if self.directory is None:
+            return None
+        cached = self._load(digest)
+        if cached is None:
+            return None
+        self._remember(digest, *cached)
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+            self.bytes_skipped += size
+        return cached
+
+    def put(self, digest: str, document: SitemapDocument, url: str) -> None:
+        """Cache the parsed document of a new body."""
+        with self._lock:
+            self.misses += 1
+        self._remember(digest, document, url)
+        if self.directory is not None:
+            self._store(digest, document, url)
+
+    def _store(self, digest: str, document: SitemapDocument, url: str) -> None:
+        """Write "root<TAB>url" then "loc<TAB>lastmod" lines, gzip-compressed (temp file + rename)."""
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = [f"{document.root}\t{url}"]
+        lines.extend(f"{loc}\t{lastmod or ''}" for loc, lastmod in document.entries)
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(compressor.compress(('\n'.join(lines) + '\n').encode('utf-8')))
+            out.write(compressor.flush())
+        os.replace(tmp_path, path)
+
+    def _load(self, digest: str) -> Optional[Tuple[SitemapDocument, str]]:
+        try:
+            with open(self._path(digest), 'rb') as f:
+                text = zlib.decompress(f.read(), 31).decode('utf-8')
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        lines = text.split('\n')
+        lines.pop()  # trailing newline
+        root, _, url = lines[0].partition('\t')
+        if root not in (SITEMAP_INDEX, URLSET):
+            return None
+        entries = []
+        for line in lines[1:]:
+            loc, _, lastmod = line.partition('\t')
+            entries.append((loc, lastmod or None))
+        return SitemapDocument(root, entries), url
+
+    def summary(self) -> Dict:
+        """Return the counters as a plain dictionary for reports."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                    'bytes_skipped': self.bytes_skipped, 'cached_sitemaps': len(self._documents)}
@@ -0,0 +1,206 @@
+"""
+Sitemap Discovery
+
+Turns a bare domain or site URL into the list of root sitemaps to crawl.
+Reads every `Sitemap:` directive from /robots.txt and, in parallel, probes
+the common sitemap locations. Robots results are cached per host with a TTL
+so batch jobs that touch the same host repeatedly only fetch robots.txt once.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DISCOVERY_TIMEOUT = 10        # seconds
+ROBOTS_CACHE_TTL = 3600       # seconds a host's robots.txt result stays cached
+PROBE_WORKERS = 8
+
+# Well-known sitemap locations, in the order they are reported
+COMMON_SITEMAP_PATHS = [
+    '/sitemap.xml',
+    '/sitemap_index.xml',
+    '/sitemap-index.xml',
+    '/sitemaps.xml',
+    '/wp-sitemap.xml',
+    '/sitemap/sitemap.xml',
+    '/sitemap.xml.gz',
+]
+
+
+class RobotsCache:
+    """
+    Thread-safe per-host cache of robots.txt Sitemap: directives.
+    Entries expire after `ttl` seconds; failed fetches are cached too so a
+    host without robots.txt is not asked again on every lookup.
+    """
+
+    def __init__(self, ttl: float = ROBOTS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, origin: str) -> Optional[List[str]]:
+        """Return the cached sitemaps for an origin, or None if missing/expired."""
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry is None:
+                return None
+            expires_at, sitemaps = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[origin]
+                return None
+            return list(sitemaps)
+
+    def put(self, origin: str, sitemaps: List[str]) -> None:
+        """Cache the sitemaps found for an origin."""
+        with self._lock:
+            self._entries[origin] = (time.monotonic() + self.ttl, list(sitemaps))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared cache used when callers do not pass their own
+robots_cache = RobotsCache()
+
+
+def normalize_start_url(url: str) -> str:
+    """
+    Add a scheme to bare domains ("example.com" -> "https://example.com").
+    """
+    url = url.strip()
+    if not urlparse(url).scheme:
+        url = 'https://' + url.lstrip('/')
+    return url
+
+
+def get_origin(url: str) -> str:
+    """Return scheme://host[:port] for a URL."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def looks_like_sitemap_url(url: str) -> bool:
+    """
+    Check if a URL points directly at a sitemap file rather than a site.
+    """
+    path = urlparse(url).path.lower()
+    return (
+        path.endswith(('.xml', '.xml.gz'))
+        or 'sitemap' in path.rsplit('/', 1)[-1]
+    )
+
+
+def parse_robots_sitemaps(robots_txt: str, origin: str) -> List[str]:
+    """
+    Extract every Sitemap: directive from robots.txt content.
+    Directives are case-insensitive and may appear anywhere in the file;
+    relative URLs are resolved against the origin.
+    """
+    sitemaps: List[str] = []
+    seen = set()
+    for line in robots_txt.splitlines():
+        line = line.split('#', 1)[0].strip()
+        key, sep, value = line.partition(':')
+        if not sep or key.strip().lower() != 'sitemap':
+            continue
+        sitemap_url = urljoin(origin + '/', value.strip())
+        if sitemap_url and sitemap_url not in seen:
+            seen.add(sitemap_url)
+            sitemaps.append(sitemap_url)
+    return sitemaps
+
+
+def fetch_robots_sitemaps(origin: str, cache: Optional[RobotsCache] = None,
+                          session: Optional[requests.Session] = None) -> List[str]:
+    """
+    Fetch /robots.txt for an origin (once per cache TTL) and return its sitemaps.
+    """
+    cache = cache if cache is not None else robots_cache
+    cached = cache.get(origin)
+    if cached is not None:
+        return cached
+
+    http = session or requests
+    sitemaps: List[str] = []
+    try:
+        response = http.get(f"{origin}/robots.txt", timeout=DISCOVERY_TIMEOUT)
+        if response.status_code == 200:
+            sitemaps = parse_robots_sitemaps(response.text, origin)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Could not fetch %s/robots.txt: %s", origin, e)
+
+    cache.put(origin, sitemaps)
+    return sitemaps
+
+
+def probe_sitemap_url(url: str, session: Optional[requests.Session] = None) -> bool:
+    """
+    Check if a URL serves a sitemap. Only the first bytes of the body are read.
+    """
+    http = session or requests
+    try:
+        with http.get(url, timeout=DISCOVERY_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return False
+            if url.endswith('.gz'):
+                return True
+            head = next(response.iter_content(chunk_size=512), b'').lstrip().lower()
+            if b'<html' in head:
+                return False  # an XHTML page, not a sitemap
+            return head.startswith(b'<?xml') or b'<urlset' in head or b'<sitemapindex' in head
+    except requests.exceptions.RequestException:
+        return False
+
+
+def discover_sitemaps(url: str, probe: bool = True,
+                      cache: Optional[RobotsCache] = None,
+                      session: Optional[requests.Session] = None) -> List[str]:
+    """
+    Resolve a user-supplied URL into the root sitemaps to crawl.
+
+    Direct sitemap URLs are returned unchanged. Any other URL with a path or
+    query is fetched as given first, since sitemaps can live anywhere (e.g.
+    /index.php?option=com_xmap&view=xml). Only for a domain, or a URL that
+    does not serve a sitemap, are robots.txt and the common sitemap locations
+    checked in parallel.
+
+    Args:
+        url: Sitemap URL, site URL or bare domain
+        probe: Also probe COMMON_SITEMAP_PATHS
+        cache: Robots cache to use (defaults to the shared robots_cache)
+        session: Optional requests session to reuse connections
+
+    Returns:
+        List of root sitemap URLs, robots.txt entries first, without duplicates
+    """
+    url = normalize_start_url(url)
+    if looks_like_sitemap_url(url):
+        return [url]
+    parsed = urlparse(url)
+    if (parsed.path not in ('', '/') or parsed.query) and probe_sitemap_url(url, session):
+        return [url]
+
+    origin = get_origin(url)
+    probe_urls = [origin + path for path in COMMON_SITEMAP_PATHS] if probe else []
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        robots_future = executor.submit(fetch_robots_sitemaps, origin, cache, session)
+        probe_futures = [executor.submit(probe_sitemap_url, probe_url, session) for probe_url in probe_urls]
+        roots = robots_future.result()
+        probed = [probe_url for probe_url, future in zip(probe_urls, probe_futures) if future.result()]
+
+    for probe_url in probed:
+        if probe_url not in roots:
+            roots.append(probe_url)
+    return roots
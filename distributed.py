@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Distributed Crawl (coordinator / workers)
+
+Crawls many sites in parallel across processes and machines. The coordinator
+shards the start URLs by domain into a durable SQLite work queue; any number
+of worker processes, on one box or on several nodes sharing a filesystem,
+claim shards, crawl them and write one CSV per shard.
+
+- Claims are leases: a worker renews its lease while crawling, and a shard
+  whose worker died is picked up again once the lease expires. A worker
+  that finds its lease taken over stops crawling and leaves the shard to
+  the new owner.
+- Failed shards are retried with exponential backoff up to
+  MAX_SHARD_ATTEMPTS times, then marked dead.
+- Results are written atomically (temp file + rename), so a crashed worker
+  never leaves a half-written CSV behind.
+
+Usage:
+    python distributed.py enqueue domains.txt [--queue crawl_queue.db]
+    python distributed.py worker [--queue crawl_queue.db] [--results-dir crawl_results]
+    python distributed.py run --processes 4 [--queue crawl_queue.db]
+    python distributed.py status [--queue crawl_queue.db]
+    python distributed.py merge [--output all_urls.csv]
+
+Example:
+    python distributed.py enqueue domains.txt
+    python distributed.py run --processes 8 --workers 4
+    python distributed.py merge --output all_urls.csv
+
+SQLite locking over NFS is unreliable; when workers on several nodes share
+the queue, put it on a filesystem with working POSIX locks.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from budget import CrawlBudget
+from discovery import discover_sitemaps, normalize_start_url
+from fetcher import FetchStats
+from sitemap_engine import crawl, format_event
+
+
+# Configuration
+DEFAULT_QUEUE = 'crawl_queue.db'
+DEFAULT_RESULTS_DIR = 'crawl_results'
+DEFAULT_MERGED_OUTPUT = 'all_urls.csv'
+LEASE_SECONDS = 300         # a shard is reclaimed if its worker stops renewing for this long
+MAX_SHARD_ATTEMPTS = 3      # attempts per shard before it is marked dead
+RETRY_BASE_DELAY = 60       # seconds before the first retry of a failed shard (doubles per attempt)
+POLL_INTERVAL = 2           # seconds between queue checks while other workers hold shards
+
+# Shard states
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'    # waiting for a retry
+STATUS_DEAD = 'dead'        # gave up after MAX_SHARD_ATTEMPTS
+
+# Budget reason that stops a crawl whose shard was reclaimed by another worker
+LEASE_LOST = 'lease lost'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL UNIQUE,
+    start_urls TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    urls_found INTEGER,
+    sitemaps_fetched INTEGER,
+    result_path TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, next_attempt_at);
+"""
+
+
+class LeaseLost(Exception):
+    """The shard was reclaimed by another worker while this one was crawling it."""
+
+
+def shard_key(url: str) -> str:
+    """Domain a start URL belongs to (host[:port], lowercased, without 'www.')."""
+    netloc = urlparse(normalize_start_url(url)).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def read_start_urls(path: str) -> List[str]:
+    """Read one domain or sitemap URL per line, skipping blanks and # comments."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+class WorkQueue:
+    """
+    Durable shard queue in a SQLite database (WAL mode, so readers do not
+    block the worker that is claiming). Each process opens its own WorkQueue.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front."""
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def enqueue(self, start_urls: Iterable[str]) -> int:
+        """
+        Shard start URLs by domain and add them to the queue. URLs for a
+        domain that is already queued are merged into its shard; a finished
+        shard that gains new URLs is queued again.
+
+        Returns:
+            Number of new shards
+        """
+        shards: Dict[str, List[str]] = {}
+        for url in start_urls:
+            shards.setdefault(shard_key(url), []).append(url)
+
+        added = 0
+        with self._transaction() as conn:
+            for domain, urls in shards.items():
+                row = conn.execute('SELECT id, start_urls, status FROM shards WHERE domain = ?', (domain,)).fetchone()
+                if row is None:
+                    conn.execute('INSERT INTO shards (domain, start_urls, updated_at) VALUES (?, ?, ?)',
+                                 (domain, json.dumps(urls), time.time()))
+                    added += 1
+                else:
+                    known = json.loads(row[1])
+                    merged = list(dict.fromkeys(known + urls))
+                    conn.execute('UPDATE shards SET start_urls = ? WHERE id = ?', (json.dumps(merged), row[0]))
+                    if row[2] == STATUS_DONE and len(merged) > len(known):
+                        # The new start URLs were never crawled: run the whole shard again
+                        conn.execute(
+                            """UPDATE shards SET status = ?, attempts = 0, next_attempt_at = 0, error = NULL,
+                               updated_at = ? WHERE id = ?""",
+                            (STATUS_PENDING, time.time(), row[0]),
+                        )
+        return added
+
+    def claim(self, worker: str, lease_seconds: float = LEASE_SECONDS,
+              max_attempts: int = MAX_SHARD_ATTEMPTS) -> Optional[Dict]:
+        """
+        Claim the next shard: a pending one, a failed one whose backoff has
+        passed, or a running one whose worker's lease expired. Expired shards
+        that already had max_attempts claims are marked dead instead, so a
+        shard that keeps killing its worker is not reclaimed forever.
+
+        Returns:
+            Shard dictionary (id, domain, start_urls, attempts), or None if nothing is claimable now
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE shards SET status = ?, error = ?, lease_expires = NULL, updated_at = ?
+                   WHERE status = ? AND lease_expires < ? AND attempts >= ?""",
+                (STATUS_DEAD, 'lease expired: the worker stopped on every attempt', now,
+                 STATUS_RUNNING, now, max_attempts),
+            )
+            row = conn.execute(
+                """SELECT id, domain, start_urls, attempts FROM shards
+                   WHERE status = ?
+                      OR (status = ? AND next_attempt_at <= ?)
+                      OR (status = ? AND lease_expires < ?)
+                   ORDER BY attempts, id LIMIT 1""",
+                (STATUS_PENDING, STATUS_FAILED, now, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """UPDATE shards SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1,
+                   updated_at = ? WHERE id = ?""",
+                (STATUS_RUNNING, worker, now + lease_seconds, now, row[0]),
+            )
+        return {'id': row[0], 'domain': row[1], 'start_urls': json.loads(row[2]), 'attempts': row[3] + 1}
+
+    def renew(self, shard_id: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend a lease; returns False if the shard was reclaimed by another worker."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?',
+                (time.time() + lease_seconds, shard_id, worker, STATUS_RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, shard_id: int, worker: str, urls_found: int, sitemaps_fetched: int,
+                 result_path: str) -> bool:
+        """Mark a shard done; returns False if the worker no longer held its lease."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """UPDATE shards SET status = ?, error = NULL, urls_found = ?, sitemaps_fetched = ?,
+                   result_path = ?, lease_expires = NULL, updated_at = ?
+                   WHERE id = ? AND worker = ? AND status = ?""",
+                (STATUS_DONE, urls_found, sitemaps_fetched, result_path, time.time(), shard_id, worker,
+                 STATUS_RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, shard_id: int, worker: str, error: str,
+             max_attempts: int = MAX_SHARD_ATTEMPTS) -> Optional[str]:
+        """
+        Record a failed attempt and schedule a retry with exponential backoff.
+
+        Returns:
+            The shard's new status (STATUS_FAILED, or STATUS_DEAD once out of
+            attempts), or None if the worker no longer held its lease
+        """
+        with self._transaction() as conn:
+            row = conn.execute('SELECT attempts FROM shards WHERE id = ?', (shard_id,)).fetchone()
+            attempts = row[0] if row else max_attempts
+            status = STATUS_DEAD if attempts >= max_attempts else STATUS_FAILED
+            next_attempt_at = time.time() + RETRY_BASE_DELAY * (2 ** (attempts - 1))
+            cursor = conn.execute(
+                """UPDATE shards SET status = ?, error = ?, next_attempt_at = ?, lease_expires = NULL,
+                   updated_at = ? WHERE id = ? AND worker = ? AND status = ?""",
+                (status, error[:2000], next_attempt_at, time.time(), shard_id, worker, STATUS_RUNNING),
+            )
+        return status if cursor.rowcount == 1 else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of shards per status."""
+        rows = self.conn.execute('SELECT status, COUNT(*) FROM shards GROUP BY status').fetchall()
+        return dict(rows)
+
+    def unfinished(self) -> int:
+        """Shards that may still produce results (not done and not dead)."""
+        row = self.conn.execute('SELECT COUNT(*) FROM shards WHERE status NOT IN (?, ?)',
+                                (STATUS_DONE, STATUS_DEAD)).fetchone()
+        return row[0]
+
+    def next_retry_in(self) -> Optional[float]:
+        """Seconds until the earliest failed shard may be retried or lease expires, if any."""
+        row = self.conn.execute(
+            """SELECT MIN(CASE WHEN status = ? THEN next_attempt_at ELSE lease_expires END)
+               FROM shards WHERE status IN (?, ?)""",
+            (STATUS_FAILED, STATUS_FAILED, STATUS_RUNNING),
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def shards(self, status: Optional[str] = None) -> List[Dict]:
+        query = 'SELECT id, domain, status, attempts, worker, error, urls_found, result_path FROM shards'
+        params: tuple = ()
+        if status:
+            query += ' WHERE status = ?'
+            params = (status,)
+        columns = ('id', 'domain', 'status', 'attempts', 'worker', 'error', 'urls_found', 'result_path')
+        return [dict(zip(columns, row)) for row in self.conn.execute(query + ' ORDER BY id', params)]
+
+
+def result_file(results_dir: str, shard: Dict) -> str:
+    safe_domain = ''.join(c if c.isalnum() or c in '.-' else '_' for c in shard['domain'])
+    return os.path.join(results_dir, f"{shard['id']:06d}-{safe_domain}.csv")
+
+
+def crawl_shard(shard: Dict, results_dir: str, crawl_options: Dict,
+                probe: bool = True, deadline: Optional[float] = None,
+                budget: Optional[CrawlBudget] = None) -> Dict:
+    """
+    Discover and crawl one shard's sitemaps and write its URLs to a CSV.
+
+    Args:
+        budget: Budget of the crawl (defaults to one with `deadline`); the
+            worker stops it with LEASE_LOST when its lease is taken over
+
+    Returns:
+        Dictionary with 'urls_found', 'sitemaps_fetched' and 'result_path'
+
+    Raises:
+        RuntimeError: If no sitemap was found or every fetched sitemap failed
+        LeaseLost: If the crawl was stopped because the lease was lost
+    """
+    budget = budget or CrawlBudget(deadline=deadline)
+    root_sitemaps: List[str] = []
+    for start_url in shard['start_urls']:
+        root_sitemaps.extend(url for url in discover_sitemaps(start_url, probe=probe) if url not in root_sitemaps)
+    if not root_sitemaps:
+        raise RuntimeError(f"No sitemaps found for {', '.join(shard['start_urls'])}")
+
+    visited: set = set()
+    urls: set = set()
+    summary = crawl(
+        root_sitemaps, visited, urls,
+        budget=budget,
+        stats=FetchStats(),
+        on_event=lambda event: print(format_event(event)),
+        **crawl_options,
+    )
+    if budget.reason == LEASE_LOST:
+        raise LeaseLost(f"Shard {shard['id']} was reclaimed by another worker")
+    if summary['sitemaps_fetched'] and summary['errors'] >= summary['sitemaps_fetched']:
+        raise RuntimeError(f"All {summary['errors']} sitemap fetch(es) failed")
+
+    path = result_file(results_dir, shard)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    pd.DataFrame({'URL': sorted(urls)}).to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+    return {'urls_found': len(urls), 'sitemaps_fetched': summary['sitemaps_fetched'], 'result_path': path}
+
+
+def run_worker(queue_path: str = DEFAULT_QUEUE, results_dir: str = DEFAULT_RESULTS_DIR,
+               crawl_options: Optional[Dict] = None, probe: bool = True,
+               shard_deadline: Optional[float] = None, lease_seconds: float = LEASE_SECONDS,
+               max_attempts: int = MAX_SHARD_ATTEMPTS, name: Optional[str] = None) -> int:
+    """
+    Claim and crawl shards until every shard is done or dead.
+
+    Each shard's crawl log goes to <results_dir>/logs/<shard file>.log.
+
+    Returns:
+        Number of shards this worker completed
+    """
+    worker = name or f"{socket.gethostname()}:{os.getpid()}"
+    crawl_options = crawl_options or {}
+    os.makedirs(os.path.join(results_dir, 'logs'), exist_ok=True)
+    queue = WorkQueue(queue_path)
+    completed = 0
+
+    try:
+        while True:
+            shard = queue.claim(worker, lease_seconds, max_attempts)
+            if shard is None:
+                if not queue.unfinished():
+                    break
+                # Others hold the remaining shards, or retries are backing off
+                wait = queue.next_retry_in()
+                time.sleep(min(POLL_INTERVAL, wait) if wait is not None else POLL_INTERVAL)
+                continue
+
+            print(f"[{worker}] shard {shard['id']} {shard['domain']} (attempt {shard['attempts']})", flush=True)
+
+            # Keep the lease alive while crawling; once another worker has taken it over, stop the crawl
+            stop_renewing = threading.Event()
+            budget = CrawlBudget(deadline=shard_deadline)
+
+            def renew_lease(shard_id: int = shard['id'], budget: CrawlBudget = budget) -> None:
+                while not stop_renewing.wait(lease_seconds / 3):
+                    if not queue.renew(shard_id, worker, lease_seconds):
+                        budget.stop(LEASE_LOST)
+                        return
+
+            renewer = threading.Thread(target=renew_lease, daemon=True)
+            renewer.start()
+            shard_name = os.path.splitext(os.path.basename(result_file(results_dir, shard)))[0]
+            log_path = os.path.join(results_dir, 'logs', shard_name + '.log')
+            try:
+                with open(log_path, 'a', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+                    result = crawl_shard(shard, results_dir, crawl_options, probe, budget=budget)
+            except LeaseLost:
+                print(f"[{worker}] shard {shard['id']} {shard['domain']} abandoned: "
+                      "the lease was taken over by another worker", flush=True)
+            except Exception as e:
+                status = queue.fail(shard['id'], worker, f"{type(e).__name__}: {e}", max_attempts)
+                if status is None:
+                    print(f"[{worker}] shard {shard['id']} {shard['domain']} failed after its lease "
+                          f"was taken over by another worker: {e}", flush=True)
+                else:
+                    print(f"[{worker}] shard {shard['id']} {shard['domain']} failed ({status}): {e}", flush=True)
+            else:
+                if queue.complete(shard['id'], worker, result['urls_found'], result['sitemaps_fetched'],
+                                  result['result_path']):
+                    completed += 1
+                    print(f"[{worker}] shard {shard['id']} {shard['domain']} done: "
+                          f"{result['urls_found']} URLs", flush=True)
+                else:
+                    print(f"[{worker}] shard {shard['id']} {shard['domain']} finished after its lease "
+                          "was taken over by another worker; not recorded", flush=True)
+            finally:
+                stop_renewing.set()
+                renewer.join()
+    finally:
+        queue.close()
+    return completed
+
+
+def _worker_process(kwargs: Dict) -> None:
+    """multiprocessing entry point for run_local()."""
+    run_worker(**kwargs)
+
+
+def run_local(processes: int, **worker_options) -> None:
+    """Run several worker processes on this machine and wait for them."""
+    workers = [multiprocessing.Process(target=_worker_process, args=(worker_options,)) for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+
+def merge_results(queue_path: str, output_file: str) -> int:
+    """
+    Combine the CSVs of all completed shards into one deduplicated CSV.
+
+    Returns:
+        Number of unique URLs written
+    """
+    queue = WorkQueue(queue_path)
+    try:
+        paths = [shard['result_path'] for shard in queue.shards(STATUS_DONE) if shard['result_path']]
+    finally:
+        queue.close()
+    urls: set = set()
+    for path in paths:
+        urls.update(pd.read_csv(path)['URL'].dropna())
+    pd.DataFrame({'URL': sorted(urls)}).to_csv(output_file, index=False)
+    return len(urls)
+
+
+def print_status(queue_path: str) -> None:
+    queue = WorkQueue(queue_path)
+    try:
+        counts = queue.counts()
+        total = sum(counts.values())
+        print(f"Shards: {total}")
+        for status in (STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED, STATUS_DONE, STATUS_DEAD):
+            if counts.get(status):
+                print(f"  {status:<8} {counts[status]}")
+        done = queue.shards(STATUS_DONE)
+        print(f"URLs found: {sum(shard['urls_found'] or 0 for shard in done)}")
+        for shard in queue.shards(STATUS_FAILED) + queue.shards(STATUS_DEAD):
+            print(f"  ! {shard['domain']} ({shard['status']}, {shard['attempts']} attempt(s)): {shard['error']}")
+    finally:
+        queue.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Domain-sharded sitemap crawl with a durable work queue.')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE, help='SQLite queue file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='shard start URLs by domain into the queue')
+    enqueue.add_argument('start_file', help='file with one domain or sitemap URL per line')
+
+    for command in ('worker', 'run'):
+        sub = commands.add_parser(command, help='claim and crawl shards' if command == 'worker'
+                                  else 'start several local worker processes')
+        if command == 'run':
+            sub.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                             help='worker processes (default: %(default)s)')
+        sub.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR, help='directory for shard CSVs')
+        sub.add_argument('--workers', type=int, default=None, help='concurrent fetches per shard')
+        sub.add_argument('--per-host', type=int, default=None, help='concurrent fetches per host')
+        sub.add_argument('--no-probe', action='store_true', help='only use robots.txt to discover sitemaps')
+        sub.add_argument('--shard-deadline', type=float, default=None, metavar='SECONDS',
+                         help='stop crawling a shard after this many seconds (partial results are kept)')
+        sub.add_argument('--lease', type=float, default=LEASE_SECONDS, metavar='SECONDS',
+                         help='reclaim shards whose worker stopped renewing for this long (default: %(default)g)')
+        sub.add_argument('--max-attempts', type=int, default=MAX_SHARD_ATTEMPTS,
+                         help='attempts per shard before it is marked dead (default: %(default)s)')
+
+    commands.add_parser('status', help='show shard counts and failures')
+
+    merge = commands.add_parser('merge', help='combine completed shard CSVs into one file')
+    merge.add_argument('--output', default=DEFAULT_MERGED_OUTPUT, help='merged CSV (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main():
+    """
+    Main function for the coordinator and worker commands.
+    """
+    args = parse_args()
+
+    if args.command == 'enqueue':
+        queue = WorkQueue(args.queue)
+        try:
+            start_urls = read_start_urls(args.start_file)
+            added = queue.enqueue(start_urls)
+        finally:
+            queue.close()
+        print(f"Queued {len(start_urls)} start URL(s) as {added} new shard(s) in {args.queue}")
+
+    elif args.command in ('worker', 'run'):
+        worker_options = {
+            'queue_path': args.queue,
+            'results_dir': args.results_dir,
+            'crawl_options': {key: value for key, value in
+                              {'workers': args.workers, 'per_host_limit': args.per_host}.items()
+                              if value is not None},
+            'probe': not args.no_probe,
+            'shard_deadline': args.shard_deadline,
+            'lease_seconds': args.lease,
+            'max_attempts': args.max_attempts,
+        }
+        if args.command == 'worker':
+            run_worker(**worker_options)
+        else:
+            run_local(args.processes, **worker_options)
+        print()
+        print_status(args.queue)
+
+    elif args.command == 'status':
+        print_status(args.queue)
+
+    elif args.command == 'merge':
+        count = merge_results(args.queue, args.output)
+        print(f"Merged {count} unique URLs into {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+DNS Cache
+
+In-process cache of hostname lookups for the sitemap HTTP layer. Wide
+sitemap indexes often spread their child sitemaps over several CDN hostnames,
+and every new connection would otherwise pay a fresh DNS lookup.
+
+- DnsCache keeps resolved addresses for DNS_CACHE_TTL seconds (failed
+  lookups for NEGATIVE_TTL) and can pre-resolve the hosts of an index's
+  children in the background before they are fetched.
+- CachingAdapter is a requests transport adapter whose connections look the
+  host up through the cache. TLS still verifies the certificate against the
+  hostname, only the TCP connect uses the cached address.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# Configuration
+DNS_CACHE_TTL = 300       # seconds a successful lookup is reused (0 disables the cache)
+NEGATIVE_TTL = 30         # seconds a failed lookup is remembered
+PREFETCH_WORKERS = 8      # concurrent background lookups when pre-resolving
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+class DnsCache:
+    """
+    Thread-safe hostname -> address cache with a fixed TTL.
+
+    Attributes:
+        ttl: Seconds a successful lookup is reused (0 or None disables caching)
+        negative_ttl: Seconds a failed lookup is remembered
+        hits: Lookups answered from the cache
+        misses: Lookups that went to the system resolver
+        prefetched: Hosts resolved ahead of time by prefetch()
+    """
+
+    def __init__(self, ttl: Optional[float] = DNS_CACHE_TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        # host -> (addresses, expires at); an empty address list is a cached failure
+        self._entries: Dict[str, Tuple[List[str], float]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ttl)
+
+    def _lookup(self, host: str) -> List[str]:
+        """Ask the system resolver, keeping the order it prefers."""
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            return []
+        addresses: List[str] = []
+        for info in infos:
+            address = info[4][0]
+            if address not in addresses:
+                addresses.append(address)
+        return addresses
+
+    def _store(self, host: str, addresses: List[str]) -> None:
+        ttl = self.ttl if addresses else self.negative_ttl
+        with self._lock:
+            self._entries[host] = (addresses, time.monotonic() + ttl)
+
+    def _cached(self, host: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def resolve(self, host: str) -> Optional[str]:
+        """
+        Return an address for `host`, from the cache when fresh.
+
+        Returns:
+            The preferred address, or None if the host cannot be resolved (or
+            the cache is disabled), in which case the caller should fall back
+            to a normal lookup to get the resolver's error
+        """
+        if not self.enabled or is_ip_address(host):
+            return None
+        host = host.lower()
+        addresses = self._cached(host)
+        if addresses is not None:
+            with self._lock:
+                self.hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            addresses = self._lookup(host)
+            self._store(host, addresses)
+        return addresses[0] if addresses else None
+
+    def invalidate(self, host: str) -> None:
+        """Forget a host (e.g. after connecting to its cached address failed)."""
+        with self._lock:
+            self._entries.pop(host.lower(), None)
+
+    def prefetch(self, hosts: Iterable[str]) -> None:
+        """
+        Resolve hosts in the background so their first fetch finds them cached.
+        Returns immediately; hosts already cached are skipped.
+        """
+        if not self.enabled:
+            return
+        pending = {host.lower() for host in hosts if host and not is_ip_address(host)}
+        pending = [host for host in pending if self._cached(host) is None]
+        if not pending:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS,
+                                                    thread_name_prefix='dns-prefetch')
+            executor = self._executor
+        for host in pending:
+            executor.submit(self._prefetch_one, host)
+
+    def _prefetch_one(self, host: str) -> None:
+        if self._cached(host) is not None:
+            return
+        self._store(host, self._lookup(host))
+        with self._lock:
+            self.prefetched += 1
+
+    def summary(self) -> Dict:
+        """Return the counters as a plain dictionary for reports."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'prefetched': self.prefetched}
+
+
+# Shared cache for the process (used by CachingAdapter connections)
+dns_cache = DnsCache()
+
+
+class _CachedDnsMixin:
+    """Connect to the cached address of self.host instead of looking it up again."""
+
+    def _new_conn(self):
+        address = dns_cache.resolve(self.host)
+        self._dns_host = address or self.host
+        try:
+            return super()._new_conn()
+        except Exception:
+            if address is not None:
+                dns_cache.invalidate(self.host)
+            raise
+
+
+class CachingHTTPConnection(_CachedDnsMixin, HTTPConnection):
+    pass
+
+
+class CachingHTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    pass
+
+
+class CachingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachingHTTPConnection
+
+
+class CachingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachingHTTPSConnection
+
+
+class CachingAdapter(HTTPAdapter):
+    """requests adapter whose connections resolve hostnames through dns_cache."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CachingHTTPConnectionPool,
+            'https': CachingHTTPSConnectionPool,
+        }
@@ -0,0 +1,445 @@
+"""
+Sitemap HTTP Fetching
+
+Streaming, size-bounded sitemap downloads shared by the CLI and the web app.
+Bodies are read in chunks and the download stops early once the per-file
+byte limit, the crawl-wide byte budget or the sitemap protocol's 50,000-entry
+cap is passed, so a broken or hostile "sitemap" cannot exhaust memory.
+
+Connect and read timeouts are separate, and a total-transfer deadline plus a
+minimum-throughput cutoff stop servers that trickle bytes just fast enough
+to dodge the read timeout from holding a worker indefinitely.
+
+Each thread reuses one requests session (keep-alive connections) whose
+hostname lookups go through the in-process DNS cache in dns_cache.py.
+Alternatively the optional HTTP/2 transport (http2_transport.py) multiplexes
+all workers' requests to a host over one connection.
+
+Requests advertise every content encoding the transport can decode (gzip and
+deflate, plus br and zstd when their optional packages are installed).
+Bodies are decoded chunk by chunk as they arrive, including .xml.gz files
+served without a Content-Encoding header, and both bytes on the wire and
+decoded bytes are recorded in FetchStats.
+"""
+
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import requests
+import urllib3
+
+import http2_transport
+from dns_cache import CachingAdapter
+
+
+# Configuration
+CONNECT_TIMEOUT = 5                        # seconds to establish a connection
+REQUEST_TIMEOUT = 10                       # seconds to wait for each read
+TRANSFER_TIMEOUT = 300                     # seconds for a whole download
+MIN_THROUGHPUT = 4 * 1024                  # bytes/second below which a download is abandoned
+THROUGHPUT_GRACE = 10                      # seconds before the throughput check applies
+CHUNK_SIZE = 64 * 1024                     # bytes per streamed read
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024       # protocol limit for one uncompressed sitemap
+MAX_CRAWL_BYTES = 2 * 1024 * 1024 * 1024   # total decoded bytes per crawl
+MAX_URLS_PER_SITEMAP = 50_000              # protocol limit for <url>/<sitemap> entries
+
+# Transports: pooled requests/urllib3 (HTTP/1.1), HTTP/2 via ALPN, HTTP/2 cleartext with prior knowledge
+TRANSPORT_HTTP1 = 'http1'
+TRANSPORT_HTTP2 = 'http2'
+TRANSPORT_H2C = 'h2c'
+TRANSPORTS = (TRANSPORT_HTTP1, TRANSPORT_HTTP2, TRANSPORT_H2C)
+
+# Encodings urllib3 can decode here, e.g. 'gzip,deflate,br,zstd' (br needs brotli,
+# zstd needs backports.zstd before Python 3.14)
+ACCEPT_ENCODING = urllib3.util.make_headers(accept_encoding=True)['accept-encoding']
+
+# Magic bytes of a gzip file (.xml.gz sitemaps served without Content-Encoding)
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Truncation reasons reported in FetchStats.truncated
+TRUNCATED_SIZE = 'size_limit'
+TRUNCATED_CRAWL_BUDGET = 'crawl_budget'
+TRUNCATED_URL_CAP = 'url_cap'
+
+# Closing tags that end one sitemap entry
+ENTRY_END_TAGS = (b'</url>', b'</sitemap>')
+
+
+class CrawlBudgetExceeded(Exception):
+    """Raised when a fetch is attempted after the crawl-wide byte budget is spent."""
+
+
+class TransferTimeout(requests.exceptions.Timeout):
+    """Raised when a download exceeds its total-transfer deadline."""
+
+
+class SlowTransfer(requests.exceptions.Timeout):
+    """Raised when a download stays below the minimum throughput."""
+
+
+class FetchTimeouts(NamedTuple):
+    """
+    Time limits for one download. Any limit set to None (or 0) is not enforced.
+
+    Attributes:
+        connect: Seconds to establish the TCP/TLS connection
+        read: Seconds to wait for each read from the socket
+        total: Seconds for the whole download, headers included
+        min_throughput: Bytes per second the body must average once `grace` has passed
+        grace: Seconds before the throughput check applies (slow starts are normal)
+    """
+    connect: Optional[float] = CONNECT_TIMEOUT
+    read: Optional[float] = REQUEST_TIMEOUT
+    total: Optional[float] = TRANSFER_TIMEOUT
+    min_throughput: Optional[float] = MIN_THROUGHPUT
+    grace: float = THROUGHPUT_GRACE
+
+
+DEFAULT_TIMEOUTS = FetchTimeouts()
+
+
+class FetchStats:
+    """
+    Thread-safe byte accounting and truncation notes for one crawl.
+
+    Attributes:
+        max_crawl_bytes: Crawl-wide budget of decoded bytes (None for unlimited)
+        bytes_downloaded: Decoded bytes kept so far
+        wire_bytes: Bytes received from the network (before decompression)
+        encodings: Number of responses per content encoding ('identity' if none)
+        truncated: Mapping of sitemap URL -> truncation reason
+    """
+
+    def __init__(self, max_crawl_bytes: Optional[int] = MAX_CRAWL_BYTES):
+        self.max_crawl_bytes = max_crawl_bytes
+        self.bytes_downloaded = 0
+        self.wire_bytes = 0
+        self.encodings: Counter = Counter()
+        self.truncated: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        """Decoded bytes per byte on the wire, or None before anything was received."""
+        if not self.wire_bytes:
+            return None
+        return self.bytes_downloaded / self.wire_bytes
+
+    @property
+    def budget_exhausted(self) -> bool:
+        return self.max_crawl_bytes is not None and self.bytes_downloaded >= self.max_crawl_bytes
+
+    def reserve(self, size: int) -> int:
+        """
+        Claim up to `size` bytes of the crawl budget.
+
+        Returns:
+            Number of bytes actually granted (may be less than requested)
+        """
+        with self._lock:
+            if self.max_crawl_bytes is not None:
+                size = max(0, min(size, self.max_crawl_bytes - self.bytes_downloaded))
+            self.bytes_downloaded += size
+            return size
+
+    def record_transfer(self, wire_bytes: int, encoding: str) -> None:
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.encodings[encoding] += 1
+
+    def mark_truncated(self, url: str, reason: str) -> None:
+        with self._lock:
+            self.truncated[url] = reason
+
+    def summary(self) -> Dict:
+        """Return the counters as a plain dictionary for reports."""
+        with self._lock:
+            return {
+                'bytes_downloaded': self.bytes_downloaded,
+                'wire_bytes': self.wire_bytes,
+                'encodings': dict(self.encodings),
+                'truncated': dict(self.truncated),
+            }
+
+
+class Download(NamedTuple):
+    """A downloaded sitemap body and why it was cut short, if it was."""
+    content: bytes
+    truncated: Optional[str]
+    wire_bytes: int = 0             # bytes received from the network
+    encoding: str = 'identity'      # content encoding(s) that were decoded
+    size: int = 0                   # decoded bytes kept (also when streamed to on_chunk)
+
+
+class EntryCounter:
+    """
+    Counts sitemap entries (closing </url> / </sitemap> tags) in a byte stream
+    fed in arbitrary chunks, and reports where to cut once the cap is passed.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.count = 0
+        self._tail = b''
+        self._offset = 0          # absolute stream offset of the current chunk
+        self._last_entry_end = 0  # absolute offset just after the most recent counted entry
+
+    def feed(self, chunk: bytes) -> Optional[int]:
+        """
+        Count the entries in the next chunk.
+
+        Returns:
+            Absolute offset to cut the stream at (just after the limit-th entry)
+            once an entry beyond the limit is seen, otherwise None
+        """
+        data = self._tail + chunk
+        base = self._offset - len(self._tail)
+        tail_len = len(self._tail)
+        position = 0
+
+        while True:
+            index, tag = -1, b''
+            for candidate in ENTRY_END_TAGS:
+                found = data.find(candidate, position)
+                if found != -1 and (index == -1 or found < index):
+                    index, tag = found, candidate
+            if index == -1:
+                break
+
+            end = index + len(tag)
+            position = end
+            if end <= tail_len:
+                continue  # fully inside the carried-over tail: already counted
+
+            self.count += 1
+            if self.count > self.limit:
+                return self._last_entry_end
+            self._last_entry_end = base + end
+
+        self._offset += len(chunk)
+        keep = max(len(tag) for tag in ENTRY_END_TAGS) - 1
+        self._tail = data[-keep:]
+        return None
+
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Return this thread's session, creating it on first use.
+    Sessions are not shared between threads; each keeps its own connection pool.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = CachingAdapter()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+def _iter_body(response: requests.Response, info: Dict) -> Iterator[bytes]:
+    """
+    Yield decoded body chunks as soon as they arrive, keeping
+    info['wire_bytes'] up to date.
+
+    iter_content() blocks until a full chunk is buffered, so a server sending
+    one byte per read-timeout would never hand control back to check the
+    deadline. read1() returns after a single socket read instead (urllib3 2.x;
+    older versions fall back to iter_content).
+    """
+    raw = response.raw
+    if not hasattr(raw, 'read1'):
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            info['wire_bytes'] = raw.tell()
+            yield chunk
+        return
+    try:
+        while True:
+            chunk = raw.read1(CHUNK_SIZE, decode_content=True)
+            info['wire_bytes'] = raw.tell()
+            if not chunk:
+                return
+            yield chunk
+    except urllib3.exceptions.ReadTimeoutError as e:
+        raise requests.exceptions.ReadTimeout(e, request=response.request)
+    except urllib3.exceptions.ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e, request=response.request)
+    except urllib3.exceptions.DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e, request=response.request)
+
+
+@contextmanager
+def _open_body(url: str, session: Optional[requests.Session], timeouts: FetchTimeouts,
+               transport: str) -> Iterator[tuple]:
+    """
+    Send the GET over the chosen transport.
+
+    Yields:
+        (chunks, info): an iterator of decoded body chunks, and a dict whose
+        'content_encoding' and 'wire_bytes' are kept up to date while reading
+    """
+    if transport in (TRANSPORT_HTTP2, TRANSPORT_H2C):
+        with http2_transport.open_stream(url, timeouts.connect, timeouts.read,
+                                         prior_knowledge=transport == TRANSPORT_H2C) as (chunks, info):
+            yield chunks, info
+        return
+    if transport != TRANSPORT_HTTP1:
+        raise ValueError(f"Unknown transport: {transport!r} (choose from {', '.join(TRANSPORTS)})")
+
+    http = session or get_session()
+    with http.get(url, timeout=(timeouts.connect, timeouts.read), stream=True,
+                  headers={'Accept-Encoding': ACCEPT_ENCODING}) as response:
+        response.raise_for_status()
+        info = {'content_encoding': response.headers.get('Content-Encoding', ''), 'wire_bytes': 0}
+        yield _iter_body(response, info), info
+
+
+def _gunzip_stream(first: bytes, chunks: Iterable[bytes], info: Dict) -> Iterator[bytes]:
+    """
+    Decompress a gzip file body on the fly, in pieces of at most CHUNK_SIZE
+    so a small compressed chunk cannot expand into one huge buffer.
+    Handles concatenated gzip members.
+    """
+    info['gzip_file'] = True
+    decompressor = zlib.decompressobj(wbits=31)
+
+    def pieces(data: bytes) -> Iterator[bytes]:
+        nonlocal decompressor
+        while data:
+            piece = decompressor.decompress(data, CHUNK_SIZE)
+            if piece:
+                yield piece
+            if decompressor.eof:
+                data = decompressor.unused_data
+                if data:
+                    decompressor = zlib.decompressobj(wbits=31)
+            else:
+                data = decompressor.unconsumed_tail
+
+    try:
+        yield from pieces(first)
+        for chunk in chunks:
+            yield from pieces(chunk)
+    except zlib.error as e:
+        raise requests.exceptions.ContentDecodingError(f"Invalid gzip sitemap body: {e}")
+
+
+def _decoded(chunks: Iterator[bytes], info: Dict) -> Iterator[bytes]:
+    """Pass chunks through, gunzipping the body if it is a gzip file."""
+    for first in chunks:
+        if not first:
+            continue
+        if first.startswith(GZIP_MAGIC):
+            yield from _gunzip_stream(first, chunks, info)
+        else:
+            yield first
+            yield from chunks
+        return
+
+
+def decompress_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gunzip a stream of body chunks if it is a gzip file, otherwise pass it through."""
+    return _decoded(iter(chunks), {})
+
+
+def download(url: str,
+             stats: Optional[FetchStats] = None,
+             session: Optional[requests.Session] = None,
+             timeouts: Optional[FetchTimeouts] = None,
+             max_bytes: Optional[int] = MAX_SITEMAP_BYTES,
+             max_entries: Optional[int] = MAX_URLS_PER_SITEMAP,
+             transport: str = TRANSPORT_HTTP1,
+             on_chunk: Optional[Callable[[bytes], None]] = None) -> Download:
+    """
+    Stream a sitemap body with early abort.
+
+    Args:
+        url: Sitemap URL
+        stats: Crawl-wide byte budget and truncation notes
+        session: Optional requests session (defaults to this thread's get_session())
+        timeouts: Connect / read / total-transfer / throughput limits
+            (defaults to DEFAULT_TIMEOUTS)
+        max_bytes: Per-file limit on decoded bytes (None for unlimited)
+        max_entries: Stop after this many <url>/<sitemap> entries (None for unlimited)
+        transport: TRANSPORT_HTTP1 (default), TRANSPORT_HTTP2 or TRANSPORT_H2C;
+            the HTTP/2 transports ignore `session`
+        on_chunk: Receives each decoded chunk as it arrives (e.g. a streaming
+            parser's feed); the body is then not buffered and Download.content is empty
+
+    Returns:
+        Download with the (possibly truncated) body and the truncation reason
+
+    Raises:
+        CrawlBudgetExceeded: If the crawl budget was already spent
+        TransferTimeout: If the download takes longer than timeouts.total
+        SlowTransfer: If the body arrives slower than timeouts.min_throughput
+        RuntimeError: If an HTTP/2 transport is requested without httpx[http2] installed
+        requests.exceptions.RequestException: On network or HTTP errors
+    """
+    if stats is not None and stats.budget_exhausted:
+        raise CrawlBudgetExceeded(f"Crawl byte budget exhausted before fetching {url}")
+
+    timeouts = timeouts or DEFAULT_TIMEOUTS
+    chunks: List[bytes] = []
+    size = 0
+    truncated: Optional[str] = None
+    cut_at: Optional[int] = None
+    counter = EntryCounter(max_entries) if max_entries else None
+
+    started = time.monotonic()
+    with _open_body(url, session, timeouts, transport) as (body, info):
+        received = 0
+        for chunk in _decoded(body, info):
+            if not chunk:
+                continue
+
+            received += len(chunk)
+            elapsed = time.monotonic() - started
+            if timeouts.total and elapsed > timeouts.total:
+                raise TransferTimeout(f"Download of {url} exceeded {timeouts.total:g}s "
+                                      f"({received} bytes received)")
+            if timeouts.min_throughput and elapsed > timeouts.grace and received / elapsed < timeouts.min_throughput:
+                raise SlowTransfer(f"Download of {url} too slow: {received / elapsed:.0f} B/s "
+                                   f"(minimum {timeouts.min_throughput:.0f} B/s)")
+
+            allowed = len(chunk)
+            if max_bytes is not None and size + allowed > max_bytes:
+                allowed = max_bytes - size
+                truncated = TRUNCATED_SIZE
+            if stats is not None:
+                granted = stats.reserve(allowed)
+                if granted < allowed:
+                    allowed = granted
+                    truncated = TRUNCATED_CRAWL_BUDGET
+            if allowed < len(chunk):
+                chunk = chunk[:allowed]
+
+            if counter is not None:
+                cut_at = counter.feed(chunk)
+                if cut_at is not None:
+                    truncated = TRUNCATED_URL_CAP
+                    chunk = chunk[:max(0, cut_at - size)]
+
+            if on_chunk is not None:
+                on_chunk(chunk)
+            else:
+                chunks.append(chunk)
+            size += len(chunk)
+            if truncated:
+                break
+
+    encoding = ','.join(filter(None, [info['content_encoding'], 'gzip-file' if info.get('gzip_file') else '']))
+    encoding = encoding or 'identity'
+    if stats is not None:
+        stats.record_transfer(info['wire_bytes'], encoding)
+
+    if truncated and stats is not None:
+        stats.mark_truncated(url, truncated)
+    return Download(b''.join(chunks), truncated, info['wire_bytes'], encoding, size)
@@ -186,5 +186,31 @@ def get_user_by_uid(uid: str) -> Optional[Dict]:
         return None
 
 
+def is_admin(user_info: Optional[Dict]) -> bool:
+    """
+    Check if a user may use hidden admin tools (e.g. extraction profiling).
+    In development mode every user is an admin. In production the user's
+    verified email must be listed in the comma-separated ADMIN_EMAILS variable.
+    
+    Args:
+        user_info: Dictionary returned by verify_token
+        
+    Returns:
+        True if the user is an admin, False otherwise
+    """
+    if is_development():
+        return True
+    
+    if not user_info or not user_info.get("email_verified"):
+        return False
+    
+    admin_emails = {
+        email.strip().lower()
+        for email in os.getenv("ADMIN_EMAILS", "").split(",")
+        if email.strip()
+    }
+    return (user_info.get("email") or "").lower() in admin_emails
+
+
 # Initialize Firebase when module is imported
 initialize_firebase()
@@ -0,0 +1,171 @@
+"""
+Crawl Frontier
+
+Explicit priority queue of sitemaps waiting to be fetched. Replaces the old
+recursive traversal, so there is no recursion limit and the visiting order is
+a pluggable scheduling policy:
+
+    depth-first      Same order as the original recursion (default)
+    breadth-first    All sitemaps of one index level before the next
+    lastmod          Newest <lastmod> first, so fresh URLs arrive early
+    host-interleave  Round-robin across hosts to keep per-host limits busy
+"""
+
+import heapq
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+
+POLICIES = ('depth-first', 'breadth-first', 'lastmod', 'host-interleave')
+DEFAULT_POLICY = 'depth-first'
+
+
+@dataclass
+class FrontierItem:
+    """A sitemap waiting to be fetched."""
+    url: str
+    depth: int = 0
+    lastmod: Optional[str] = None
+    parent: Optional[str] = None
+    attempt: int = 0  # failed attempts so far (retries re-enter the frontier)
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc.lower()
+
+
+def parse_lastmod(value: Optional[str]) -> float:
+    """
+    Convert a W3C datetime (<lastmod>) into a POSIX timestamp.
+    Dates without a timezone are taken as UTC, a bare year or year-month
+    as its first day. Missing or unparseable values sort as the oldest
+    possible date.
+    """
+    if not value:
+        return float('-inf')
+    text = value.strip().replace('Z', '+00:00')
+    if len(text) in (4, 7):
+        text += '-01-01'[:10 - len(text)]  # YYYY or YYYY-MM precision
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return float('-inf')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class Frontier:
+    """
+    Priority queue of FrontierItems ordered by a scheduling policy.
+    Ties are broken by insertion order, so children of one index keep the
+    order in which they were listed.
+
+    Items are queued per host, and a host can be held back (e.g. while it
+    has no free connection slot): pop() only looks at the first item of
+    each host that is not held, so held hosts cost nothing however many
+    sitemaps they have queued. Items can also be split into lanes (e.g.
+    remote and local fetches with separate worker limits) and popped from
+    the lanes that have capacity.
+    """
+
+    def __init__(self, policy: str = DEFAULT_POLICY, lane: Optional[Callable[[FrontierItem], str]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown crawl policy: {policy!r} (choose from {', '.join(POLICIES)})")
+        self.policy = policy
+        self._lane = lane or (lambda item: '')
+        self._counter = itertools.count()
+        self._host_turns: Dict[str, int] = {}
+        # host -> heap of (priority, sequence, item)
+        self._queues: Dict[str, List[Tuple[tuple, int, FrontierItem]]] = {}
+        # lane -> heap of (priority, sequence, host) for the first item of each host that is not held;
+        # entries go stale when that item is popped or its host is held, and are dropped when reached
+        self._ready: Dict[str, List[Tuple[tuple, int, str]]] = {}
+        self._held: Set[str] = set()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _priority(self, item: FrontierItem) -> tuple:
+        if self.policy == 'depth-first':
+            return (-item.depth,)
+        if self.policy == 'breadth-first':
+            return (item.depth,)
+        if self.policy == 'lastmod':
+            return (-parse_lastmod(item.lastmod),)
+        # host-interleave: the n-th queued sitemap of every host shares turn n
+        turn = self._host_turns.get(item.host, 0)
+        self._host_turns[item.host] = turn + 1
+        return (turn,)
+
+    def _offer(self, host: str) -> None:
+        """Make the first item of a host that is not held poppable."""
+        priority, sequence, item = self._queues[host][0]
+        heapq.heappush(self._ready.setdefault(self._lane(item), []), (priority, sequence, host))
+
+    def push(self, item: FrontierItem) -> None:
+        host = item.host
+        entry = (self._priority(item), next(self._counter), item)
+        queue = self._queues.setdefault(host, [])
+        heapq.heappush(queue, entry)
+        self._size += 1
+        if queue[0] is entry and host not in self._held:
+            self._offer(host)
+
+    def hold(self, host: str) -> None:
+        """Keep a host's items queued until release(host)."""
+        self._held.add(host)
+
+    def release(self, host: str) -> None:
+        """Let a held host's items be popped again."""
+        if host in self._held:
+            self._held.discard(host)
+            if self._queues.get(host):
+                self._offer(host)
+
+    def pop(self, lanes: Optional[Iterable[str]] = None) -> Optional[FrontierItem]:
+        """
+        Remove and return the highest-priority item of a host that is not held.
+
+        Args:
+            lanes: Only consider items of these lanes (default: all lanes)
+
+        Returns:
+            The item, or None if no host that is not held has items queued
+        """
+        best = None
+        for lane in (self._ready if lanes is None else lanes):
+            ready = self._ready.get(lane)
+            # Drop stale entries until the top is the current first item of a host that is not held
+            while ready:
+                _, sequence, host = ready[0]
+                queue = self._queues.get(host)
+                if host not in self._held and queue and queue[0][1] == sequence:
+                    break
+                heapq.heappop(ready)
+            if ready and (best is None or ready[0] < best[0]):
+                best = (ready[0], ready)
+        if best is None:
+            return None
+
+        _, _, host = heapq.heappop(best[1])
+        queue = self._queues[host]
+        item = heapq.heappop(queue)[2]
+        self._size -= 1
+        if queue:
+            self._offer(host)
+        else:
+            del self._queues[host]
+        return item
+
+    def drain(self) -> List[FrontierItem]:
+        """Remove and return all queued items (held hosts included) in priority order."""
+        entries = sorted(entry for queue in self._queues.values() for entry in queue)
+        self._queues.clear()
+        self._ready.clear()
+        self._size = 0
+        return [entry[2] for entry in entries]
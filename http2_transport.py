@@ -0,0 +1,218 @@
+"""
+HTTP/2 Transport (optional)
+
+Fetches sitemaps through one shared httpx client with HTTP/2 enabled, so
+concurrent child-sitemap requests to the same host are multiplexed as
+streams over a single connection instead of opening one TCP/TLS connection
+per worker.
+
+Requires the optional dependency `httpx[http2]`:
+
+    pip install "httpx[http2]"
+
+Two modes:
+    http2  HTTP/2 negotiated over TLS (ALPN); plain-http URLs and servers
+           without HTTP/2 fall back to HTTP/1.1 on the same client
+    h2c    HTTP/2 with prior knowledge over cleartext, for local test servers
+           and internal mirrors that speak h2c (no HTTP/1.1 fallback)
+
+httpx's synchronous HTTP/2 connections are not safe to share between
+threads, so the client is an AsyncClient running on one background event
+loop; worker threads submit requests to it and receive the body chunks
+through a bounded queue. A stream whose reader falls behind stops reading
+from the socket (HTTP/2 flow control then pauses the server) instead of
+buffering the rest of the body in memory. httpx errors are re-raised as the equivalent requests
+exceptions, so retry classification and circuit breaking behave the same on
+both transports.
+"""
+
+import asyncio
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+
+# Configuration
+MAX_CONNECTIONS = 100           # connections per client (streams are multiplexed on top)
+KEEPALIVE_CONNECTIONS = 20
+STREAM_QUEUE_CHUNKS = 16        # body chunks buffered per stream before reading pauses
+QUEUE_POLL_INTERVAL = 0.005     # seconds between put attempts while a stream's queue is full
+START_TIMEOUT = 60              # seconds to wait for response headers when no connect/read timeout is set
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_clients: Dict[str, 'httpx.AsyncClient'] = {}
+_lock = threading.Lock()
+
+
+def is_available() -> bool:
+    """True if httpx with HTTP/2 support (the h2 package) is installed."""
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def accept_encoding() -> str:
+    """Content encodings httpx can decode here (br and zstd depend on optional packages)."""
+    try:
+        from httpx._decoders import SUPPORTED_DECODERS
+    except ImportError:
+        return 'gzip, deflate'
+    return ', '.join(name for name in SUPPORTED_DECODERS if name != 'identity')
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http2-transport', daemon=True).start()
+        return _loop
+
+
+def get_client(prior_knowledge: bool = False) -> 'httpx.AsyncClient':
+    """
+    Return the process-wide HTTP/2 client (one per mode), creating it on first use.
+    The client is shared by all worker threads so that their requests
+    multiplex over the same connections.
+    """
+    if not is_available():
+        raise RuntimeError('The HTTP/2 transport needs the optional dependency: pip install "httpx[http2]"')
+    key = 'h2c' if prior_knowledge else 'http2'
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = httpx.AsyncClient(
+                http1=not prior_knowledge,
+                http2=True,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                    max_keepalive_connections=KEEPALIVE_CONNECTIONS),
+            )
+            _clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close the shared clients and their connections."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        loop = _loop
+    for client in clients:
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+
+
+def _as_requests_error(error: Exception) -> requests.exceptions.RequestException:
+    """Translate an httpx exception into the matching requests exception."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return requests.exceptions.HTTPError(str(error), response=error.response)
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(str(error))
+    if isinstance(error, (httpx.ConnectError, httpx.NetworkError)):
+        return requests.exceptions.ConnectionError(str(error))
+    if isinstance(error, httpx.RemoteProtocolError):
+        return requests.exceptions.ChunkedEncodingError(str(error))
+    if isinstance(error, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(str(error))
+    if isinstance(error, httpx.TooManyRedirects):
+        return requests.exceptions.TooManyRedirects(str(error))
+    if isinstance(error, httpx.UnsupportedProtocol):
+        return requests.exceptions.InvalidSchema(str(error))
+    if isinstance(error, httpx.InvalidURL):
+        return requests.exceptions.InvalidURL(str(error))
+    return requests.exceptions.RequestException(str(error))
+
+
+async def _put(events: queue.Queue, event: tuple) -> None:
+    """
+    Hand an event to the worker thread, waiting while its queue is full.
+    Never blocks the event loop (other streams keep flowing), and stays
+    cancellable when the worker stops reading.
+    """
+    while True:
+        try:
+            events.put_nowait(event)
+            return
+        except queue.Full:
+            await asyncio.sleep(QUEUE_POLL_INTERVAL)
+
+
+async def _produce(client: 'httpx.AsyncClient', url: str, timeout: 'httpx.Timeout', events: queue.Queue) -> None:
+    """Run one request on the event loop, passing events to the waiting worker thread."""
+    try:
+        async with client.stream('GET', url, timeout=timeout,
+                                 headers={'Accept-Encoding': accept_encoding()}) as response:
+            response.raise_for_status()
+            await _put(events, ('start', response.headers.get('Content-Encoding', '')))
+            async for chunk in response.aiter_bytes():
+                await _put(events, ('data', (chunk, response.num_bytes_downloaded)))
+        await _put(events, ('end', None))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await _put(events, ('error', e))
+
+
+@contextmanager
+def open_stream(url: str, connect_timeout: Optional[float], read_timeout: Optional[float],
+                prior_knowledge: bool = False) -> Iterator[tuple]:
+    """
+    Send a GET over the shared HTTP/2 client and yield (chunks, info): an
+    iterator of decoded body chunks (each handed over as soon as it arrives)
+    and a dict with the response's 'content_encoding' and the 'wire_bytes'
+    received so far. Leaving the block early cancels the stream without
+    closing the connection.
+
+    Raises:
+        RuntimeError: If httpx[http2] is not installed
+        requests.exceptions.RequestException: On network or HTTP errors, or
+            when the response headers do not arrive in time
+    """
+    client = get_client(prior_knowledge)
+    timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=None)
+    # Headers are due within the connect and read timeouts; the wait also covers a free pool connection
+    start_timeout = ((connect_timeout or 0) + (read_timeout or 0)) or START_TIMEOUT
+    events: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    future = asyncio.run_coroutine_threadsafe(_produce(client, url, timeout, events), _get_loop())
+
+    def next_event(wait: Optional[float] = None):
+        try:
+            kind, value = events.get(timeout=wait)
+        except queue.Empty:
+            raise requests.exceptions.Timeout(f"No response from {url} within {wait:g}s") from None
+        if kind == 'error':
+            if isinstance(value, httpx.HTTPError):
+                raise _as_requests_error(value) from value
+            raise value
+        return kind, value
+
+    info = {'content_encoding': '', 'wire_bytes': 0}
+
+    def chunks() -> Iterator[bytes]:
+        while True:
+            kind, value = next_event()
+            if kind == 'end':
+                return
+            chunk, info['wire_bytes'] = value
+            yield chunk
+
+    try:
+        _, info['content_encoding'] = next_event(start_timeout)  # wait for the status line (raises on errors)
+        yield chunks(), info
+    finally:
+        future.cancel()
@@ -0,0 +1,291 @@
+"""
+URL Liveness Checks
+
+Optional stage after extraction: sends a HEAD request to every page URL and
+records its status code, redirect target and response time, so broken
+(4xx / 5xx) and redirecting (3xx) entries in a sitemap show up next to the
+URLs themselves.
+
+- Servers that reject HEAD (400, 403, 405, 501) are asked again with a GET
+  whose body is never read.
+- Redirects are not followed; a 3xx is reported with its Location target.
+- URLs are grouped by host and scheduled round-robin, with a concurrency
+  limit and a request-rate limit per host, so a large site is checked at a
+  steady, polite pace while other hosts keep the workers busy.
+- 429 / 503 responses and timeouts pause their host (honouring
+  Retry-After) and are retried; hosts that keep failing trip their circuit
+  breaker and their remaining URLs are reported as skipped.
+
+Checks reuse the fetcher's per-thread keep-alive sessions and DNS cache.
+Results are delivered to an `on_result` callback on the calling thread as
+they complete.
+"""
+
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import pandas as pd
+import requests
+
+from fetcher import FetchTimeouts, get_session
+from retry import RetryPolicy, classify_error, parse_retry_after
+from circuit_breaker import HostCircuitBreakers
+
+
+# Configuration
+CHECK_WORKERS = 64                 # concurrent checks across all hosts
+CHECK_PER_HOST = 16                # concurrent checks per host
+CHECK_RATE = 50.0                  # requests per second per host (0 = unlimited)
+CHECK_ATTEMPTS = 2                 # attempts per URL for timeouts, 429 and 503
+CHECK_TIMEOUTS = FetchTimeouts(connect=5, read=10)
+
+# HEAD responses that usually mean "HEAD not supported" rather than a broken page
+GET_FALLBACK_STATUSES = frozenset({400, 403, 405, 501})
+# Responses that mean "slow down" rather than a verdict on the page
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# Export columns added next to 'URL'
+STATUS_COLUMNS = ['Status', 'Redirect', 'Response Time (ms)', 'Check Error']
+
+
+class CheckResult(NamedTuple):
+    """
+    Outcome of checking one URL.
+
+    Attributes:
+        url: The URL checked
+        status: HTTP status code, or None if no response was received
+        location: Absolute redirect target of a 3xx response
+        elapsed: Seconds until the response headers arrived
+        method: 'HEAD', or 'GET' when the server rejected HEAD
+        error: Why there is no status (connection error, skipped host, ...)
+    """
+    url: str
+    status: Optional[int]
+    location: Optional[str] = None
+    elapsed: float = 0.0
+    method: str = 'HEAD'
+    error: Optional[str] = None
+
+    @property
+    def status_class(self) -> str:
+        """'2xx', '3xx', '4xx', '5xx' or 'error'."""
+        return f"{self.status // 100}xx" if self.status else 'error'
+
+
+ResultCallback = Callable[[CheckResult], None]
+
+
+def _request(url: str, timeouts: FetchTimeouts) -> Tuple[CheckResult, Optional[float]]:
+    """HEAD (or headers-only GET) request; returns the result and the Retry-After delay, if any."""
+    session = get_session()
+    timeout = (timeouts.connect, timeouts.read)
+    method = 'HEAD'
+    start = time.monotonic()
+    response = session.head(url, timeout=timeout, allow_redirects=False)
+    if response.status_code in GET_FALLBACK_STATUSES:
+        response.close()
+        method = 'GET'
+        start = time.monotonic()
+        response = session.get(url, timeout=timeout, allow_redirects=False, stream=True)
+    elapsed = time.monotonic() - start
+    # Closing without reading the body drops a streamed GET's connection, which is cheaper than downloading the page
+    response.close()
+    location = response.headers.get('Location') if response.is_redirect else None
+    result = CheckResult(url, response.status_code, urljoin(url, location) if location else None, elapsed, method)
+    return result, parse_retry_after(response.headers.get('Retry-After'))
+
+
+def check_url(url: str, timeouts: FetchTimeouts = CHECK_TIMEOUTS) -> CheckResult:
+    """
+    Check one URL: HEAD, falling back to a GET (headers only) when the server
+    rejects HEAD.
+
+    Raises:
+        requests.exceptions.RequestException: When no response was received
+    """
+    return _request(url, timeouts)[0]
+
+
+def _attempt(url: str, timeouts: FetchTimeouts) -> Tuple[Optional[CheckResult], Optional[float], Optional[Exception]]:
+    # Any failure (a malformed URL, an undecodable header, ...) belongs to this URL, not to the whole run
+    try:
+        return _request(url, timeouts) + (None,)
+    except Exception as e:
+        return None, None, e
+
+
+def _host(url: str) -> str:
+    """Scheduling key of a URL; malformed URLs share the '' host and fail when checked."""
+    try:
+        return urlparse(url).netloc.lower()
+    except ValueError:
+        return ''
+
+
+def _describe_error(error: Exception) -> str:
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.SSLError):
+        return "TLS error"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection error"
+    if not isinstance(error, requests.exceptions.RequestException):
+        return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+    return str(error) or type(error).__name__
+
+
+def check_urls(urls: Iterable[str],
+               workers: Optional[int] = None,
+               per_host: Optional[int] = None,
+               rate: Optional[float] = None,
+               timeouts: Optional[FetchTimeouts] = None,
+               retry_policy: Optional[RetryPolicy] = None,
+               breakers: Optional[HostCircuitBreakers] = None,
+               on_result: Optional[ResultCallback] = None) -> Dict:
+    """
+    Check many URLs concurrently.
+
+    Args:
+        urls: URLs to check (each is checked once per call)
+        workers: Concurrent checks in total (defaults to CHECK_WORKERS)
+        per_host: Concurrent checks per host (defaults to CHECK_PER_HOST)
+        rate: Requests per second per host, 0 for no limit (defaults to CHECK_RATE)
+        timeouts: Connect / read timeouts per request (defaults to CHECK_TIMEOUTS)
+        retry_policy: Attempts and backoff for timeouts, 429 and 503
+            (defaults to CHECK_ATTEMPTS attempts)
+        breakers: Per-host circuit breakers; URLs on a host whose breaker is
+            open are reported with an error instead of being requested
+        on_result: Called with the CheckResult of every URL, on the calling
+            thread, in completion order
+
+    Returns:
+        Summary dictionary with 'checked', 'statuses' (Counter of status
+        classes), 'retries', 'skipped_circuit' and 'elapsed' (seconds)
+    """
+    workers = workers or CHECK_WORKERS
+    per_host = per_host or CHECK_PER_HOST
+    rate = CHECK_RATE if rate is None else rate
+    timeouts = timeouts or CHECK_TIMEOUTS
+    retry_policy = retry_policy or RetryPolicy(max_attempts=CHECK_ATTEMPTS)
+    breakers = breakers if breakers is not None else HostCircuitBreakers()
+    interval = 1.0 / rate if rate else 0.0
+
+    # host -> (url, failed attempts) waiting to be checked; hosts are served round-robin
+    queues: Dict[str, Deque[Tuple[str, int]]] = {}
+    for url in dict.fromkeys(urls):
+        queues.setdefault(_host(url), deque()).append((url, 0))
+    hosts: Deque[str] = deque(queues)
+    host_load: Counter = Counter()
+    next_start: Dict[str, float] = dict.fromkeys(queues, 0.0)
+    in_flight: Dict = {}
+    summary = {'checked': 0, 'statuses': Counter(), 'retries': 0, 'skipped_circuit': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    def report(result: CheckResult) -> None:
+        summary['checked'] += 1
+        summary['statuses'][result.status_class] += 1
+        if on_result is not None:
+            on_result(result)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while in_flight or hosts:
+            # One pass over the hosts with work left, starting as many checks as their limits allow
+            now = time.monotonic()
+            for _ in range(len(hosts)):
+                if len(in_flight) >= workers:
+                    break
+                host = hosts.popleft()
+                queue = queues[host]
+                while (queue and len(in_flight) < workers and host_load[host] < per_host
+                       and next_start[host] <= now and not breakers.probing(host)):
+                    url, attempt = queue.popleft()
+                    if not breakers.allow(host):
+                        summary['skipped_circuit'] += 1
+                        breakers.record_skip(url, host)
+                        report(CheckResult(url, None, error=f"skipped: circuit open for {host}"))
+                        continue
+                    host_load[host] += 1
+                    next_start[host] = max(next_start[host], now) + interval
+                    in_flight[executor.submit(_attempt, url, timeouts)] = (host, url, attempt)
+                if queue:
+                    hosts.append(host)
+
+            if not in_flight:
+                # Every host with work left is paused or rate limited
+                if hosts:
+                    time.sleep(max(0.0, min(next_start[host] for host in hosts) - time.monotonic()))
+                continue
+
+            # Wake up for the next rate-limited host that has a free slot; hosts at their concurrency
+            # limit (or waiting for a circuit probe) only move on when one of their checks completes
+            now = time.monotonic()
+            waiting = [next_start[host] for host in hosts
+                       if host_load[host] < per_host and next_start[host] > now and not breakers.probing(host)]
+            timeout = max(0.0, min(waiting) - now) if waiting else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                host, url, attempt = in_flight.pop(future)
+                host_load[host] -= 1
+                result, retry_after, error = future.result()
+
+                if error is not None:
+                    retryable, _ = classify_error(error)
+                    if retryable:
+                        breakers.record_failure(host)
+                    elif isinstance(error, requests.exceptions.RequestException):
+                        breakers.record_success(host)  # the host answered, e.g. with a bad TLS setup
+                elif result.status in THROTTLE_STATUSES:
+                    retryable = True  # "slow down" says nothing about the page
+                    breakers.record_success(host)
+                else:
+                    retryable = False
+                    breakers.record_success(host)
+
+                if retryable and attempt + 1 < retry_policy.max_attempts and not breakers.is_open(host):
+                    delay = retry_policy.delay_for(attempt + 1, retry_after)
+                    # The whole host slows down, not just this URL
+                    next_start[host] = max(next_start[host], time.monotonic() + delay)
+                    if not queues[host]:
+                        hosts.append(host)
+                    queues[host].append((url, attempt + 1))
+                    summary['retries'] += 1
+                    continue
+
+                if result is None:
+                    result = CheckResult(url, None, error=_describe_error(error))
+                report(result)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    summary['elapsed'] = time.monotonic() - started
+    return summary
+
+
+def add_status_columns(table: pd.DataFrame, results: Dict[str, CheckResult]) -> pd.DataFrame:
+    """
+    Add the check results (STATUS_COLUMNS) to a table with a 'URL' column;
+    URLs not checked yet get empty cells.
+    """
+    checked = [results.get(url) for url in table['URL']]
+    table['Status'] = pd.array([r.status if r else None for r in checked], dtype='Int64')
+    table['Redirect'] = [r.location if r else None for r in checked]
+    table['Response Time (ms)'] = [round(r.elapsed * 1000, 1) if r and r.status else None for r in checked]
+    table['Check Error'] = [r.error if r else None for r in checked]
+    return table
+
+
+def results_frame(urls: List[str], results: Dict[str, CheckResult]) -> pd.DataFrame:
+    """Table of URLs with their check results (STATUS_COLUMNS)."""
+    return add_status_columns(pd.DataFrame({'URL': urls}), results)
+
+
+def format_progress(summary: Dict, total: int) -> str:
+    """One-line progress / summary text, e.g. "1,200 of 5,000 URLs checked (2xx 1,150, 3xx 40, 4xx 10)"."""
+    statuses = ", ".join(f"{name} {count:,}" for name, count in sorted(summary['statuses'].items()))
+    return f"{summary['checked']:,} of {total:,} URLs checked" + (f" ({statuses})" if statuses else "")
@@ -0,0 +1,146 @@
+"""
+Local Sitemap Files
+
+Offline input for the extractor: sitemap dumps on disk (.xml or .xml.gz,
+single files of any size or whole directories) are read with memory mapping
+and streamed into the parser, so archived snapshots can be re-analysed at
+disk speed without a web server.
+
+- Local files are addressed as file:// URLs inside the crawl, so the
+  frontier, deduplication and results work exactly as for HTTP sitemaps.
+- A LocalMirror maps the <loc> URLs of a sitemap index onto mirrored files
+  (<mirror>/<host>/<path>, <mirror>/<path> or a unique file name match,
+  with or without .gz), so a mirrored index is followed on disk.
+- Gzip files are detected by their magic bytes, not their name.
+"""
+
+import mmap
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.request import pathname2url
+
+from fetcher import decompress_chunks
+
+
+# Configuration
+LOCAL_CHUNK_SIZE = 1024 * 1024   # bytes handed to the parser per read
+SITEMAP_SUFFIXES = ('.xml', '.xml.gz')
+
+
+def to_file_url(path: str) -> str:
+    """Absolute file:// URL for a local path (symlinks resolved, so each file has one URL)."""
+    return 'file://' + pathname2url(os.path.realpath(path))
+
+
+def is_local(url: str) -> bool:
+    """True if a crawl URL points at a local file."""
+    return url.startswith('file:')
+
+
+def file_path(url: str) -> str:
+    """Local path of a file:// URL."""
+    return unquote(urlparse(url).path)
+
+
+def is_local_target(target: str) -> bool:
+    """True if a command-line target is a file:// URL or an existing local file or directory."""
+    return is_local(target) or os.path.exists(target)
+
+
+def list_sitemap_files(directory: str) -> List[str]:
+    """All .xml / .xml.gz files below a directory, sorted by path."""
+    found = []
+    for folder, _, names in os.walk(directory):
+        found.extend(os.path.join(folder, name) for name in names if name.lower().endswith(SITEMAP_SUFFIXES))
+    return sorted(found)
+
+
+def read_chunks(path: str, chunk_size: int = LOCAL_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Stream a local sitemap file in chunks through a read-only memory map
+    (gzip files are decompressed on the fly). Memory use does not depend on
+    the file size.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            pieces = (mapped[offset:offset + chunk_size] for offset in range(0, len(mapped), chunk_size))
+            yield from decompress_chunks(pieces)
+
+
+def _gz_variants(relative: str) -> List[str]:
+    """The path itself plus its gzipped / un-gzipped counterpart."""
+    if relative.endswith('.gz'):
+        return [relative, relative[:-3]]
+    return [relative, relative + '.gz']
+
+
+class LocalMirror:
+    """
+    Resolves sitemap URLs to mirrored local files.
+
+    Attributes:
+        roots: Directories holding mirrored sitemaps
+        offline: Skip sitemaps that are not mirrored instead of fetching them over HTTP
+        missing: URLs that could not be resolved locally (in offline mode)
+    """
+
+    def __init__(self, roots: Iterable[str], offline: bool = False):
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.offline = offline
+        self.missing: List[str] = []
+        self._by_name: Optional[Dict[str, List[str]]] = None
+
+    def _name_index(self) -> Dict[str, List[str]]:
+        """File name -> paths below the mirror roots, built on first use."""
+        if self._by_name is None:
+            self._by_name = {}
+            for root in self.roots:
+                for path in list_sitemap_files(root):
+                    self._by_name.setdefault(os.path.basename(path), []).append(path)
+        return self._by_name
+
+    def find(self, url: str) -> Optional[str]:
+        """Local path mirroring `url`, or None."""
+        parsed = urlparse(url)
+        relative = unquote(parsed.path).lstrip('/')
+        if not relative:
+            return None
+        for root in self.roots:
+            for candidate in (os.path.join(root, parsed.netloc, relative), os.path.join(root, relative)):
+                # Never follow '..' out of the mirror
+                if not os.path.realpath(candidate).startswith(root + os.sep):
+                    continue
+                for variant in _gz_variants(candidate):
+                    if os.path.isfile(variant):
+                        return variant
+        names = self._name_index()
+        for variant in _gz_variants(os.path.basename(relative)):
+            matches = names.get(variant, [])
+            if len(matches) == 1:
+                return matches[0]
+        return None
+
+    def resolve(self, url: str, parent: Optional[str] = None) -> Optional[str]:
+        """
+        Location to crawl for a child sitemap listed in `parent`.
+
+        Returns:
+            A file:// URL when the sitemap is available locally, the original
+            URL to fetch it over HTTP, or None to skip it (offline mode)
+        """
+        if parent and is_local(parent) and not urlparse(url).scheme:
+            url = urljoin(parent, url)  # relative <loc> in a local index
+        if is_local(url):
+            return url
+        path = self.find(url)
+        if path is not None:
+            return to_file_url(path)
+        if self.offline:
+            self.missing.append(url)
+            return None
+        return url
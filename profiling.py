@@ -0,0 +1,161 @@
+"""
+Profiling Helpers
+
+Wraps a single extraction in cProfile and/or tracemalloc so slow or
+memory-hungry sitemaps can be diagnosed on real inputs without editing code.
+Used by the CLI (--profile / --trace-memory) and the hidden admin toggle in
+the web app.
+
+Fetching, parsing and deduplication run on the crawl's worker threads, so
+the CPU profile covers every thread started during the run (each gets its
+own profiler, merged into one report). Worker processes (the local-file
+lane with --processes > 1) are not profiled.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+# Number of functions / allocation sites shown in reports
+TOP_N = 25
+DEFAULT_PROFILE_FILE = 'sitemap_extractor.prof'
+
+
+def run_profiled(func: Callable[..., Any], *args,
+                 profile_path: Optional[str] = None,
+                 cpu: bool = True,
+                 trace_memory: bool = False,
+                 top_n: int = TOP_N,
+                 **kwargs) -> Tuple[Any, Dict]:
+    """
+    Call func(*args, **kwargs) under cProfile and/or tracemalloc.
+
+    Args:
+        func: The function to call (e.g. process_sitemap)
+        profile_path: Where to save the raw cProfile stats (.prof), if given
+        cpu: Enable cProfile
+        trace_memory: Enable tracemalloc peak and top-allocator tracking
+        top_n: Number of entries in the text reports
+
+    Returns:
+        Tuple of (func's return value, report dictionary). The report contains
+        'cpu_stats' (text), 'profile_path', 'memory_peak_bytes',
+        'memory_current_bytes' and 'top_allocators' as available.
+    """
+    report: Dict = {}
+    profiler = cProfile.Profile() if cpu else None
+    thread_profilers: List[cProfile.Profile] = []
+    lock = threading.Lock()
+
+    def profile_thread(frame, event, arg) -> None:
+        # First event in a new thread: replace this hook with a profiler of the thread's own
+        thread_profiler = cProfile.Profile()
+        with lock:
+            thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        # Before 3.12 a profiler only sees the thread that enabled it
+        if sys.version_info < (3, 12):
+            threading.setprofile(profile_thread)
+        profiler.enable()
+
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        # Snapshot memory first so the profiler's own bookkeeping is not reported
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report['memory_current_bytes'] = current
+            report['memory_peak_bytes'] = peak
+            report['top_allocators'] = top_allocators(snapshot, top_n)
+
+        if profiler:
+            profiler.disable()
+            threading.setprofile(None)
+            stats = merge_profiles([profiler] + thread_profilers)
+            if profile_path:
+                stats.dump_stats(profile_path)
+                report['profile_path'] = profile_path
+            report['cpu_stats'] = format_cpu_stats(stats, top_n)
+
+    return result, report
+
+
+def merge_profiles(profilers: List[cProfile.Profile]) -> pstats.Stats:
+    """
+    Combine the profilers of several threads into one Stats object.
+    Profilers that recorded nothing (threads that never ran code) are skipped.
+    """
+    stats = None
+    for profiler in profilers:
+        profiler.create_stats()
+        if not profiler.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+    return stats if stats is not None else pstats.Stats(profilers[0])
+
+
+def format_cpu_stats(stats: Union[cProfile.Profile, pstats.Stats], top_n: int = TOP_N) -> str:
+    """Render the top functions by cumulative time as text."""
+    stream = io.StringIO()
+    if isinstance(stats, pstats.Stats):
+        stats.stream = stream
+    else:
+        stats = pstats.Stats(stats, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(top_n)
+    return stream.getvalue()
+
+
+def top_allocators(snapshot: tracemalloc.Snapshot, top_n: int = TOP_N) -> List[Dict]:
+    """
+    Summarize a tracemalloc snapshot by source line.
+
+    Returns:
+        List of {'location', 'size_bytes', 'count'} dictionaries, largest first
+    """
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+    allocators = []
+    for stat in snapshot.statistics('lineno')[:top_n]:
+        frame = stat.traceback[0]
+        allocators.append({
+            'location': f"{frame.filename}:{frame.lineno}",
+            'size_bytes': stat.size,
+            'count': stat.count,
+        })
+    return allocators
+
+
+def format_report(report: Dict) -> str:
+    """Render a run_profiled report as plain text for terminals and logs."""
+    lines = []
+    if 'cpu_stats' in report:
+        lines.append("CPU profile (top functions by cumulative time):")
+        lines.append(report['cpu_stats'].rstrip())
+        if report.get('profile_path'):
+            lines.append(f"Raw profile saved to: {report['profile_path']} "
+                         f"(inspect with: python -m pstats {report['profile_path']})")
+    if 'memory_peak_bytes' in report:
+        if lines:
+            lines.append("")
+        lines.append(f"Memory: peak {report['memory_peak_bytes'] / 1024 / 1024:.1f} MB, "
+                     f"still allocated {report['memory_current_bytes'] / 1024 / 1024:.1f} MB")
+        lines.append("Top allocators:")
+        for entry in report['top_allocators']:
+            lines.append(f"  {entry['size_bytes'] / 1024:>10.1f} KB  {entry['count']:>8} blocks  {entry['location']}")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+Retry Policy
+
+Decides whether a failed sitemap fetch is worth retrying and when.
+
+- Errors are classified: timeouts, connection errors, 5xx, 408 and 429 are
+  transient; other 4xx responses, invalid URLs and TLS failures are not.
+- Delays use exponential backoff with full jitter and honour Retry-After.
+- A crawl-wide RetryBudget caps the total number of retries, so a flaky
+  origin cannot multiply the crawl time.
+
+The policy only computes delays; callers decide how to wait. The crawl
+frontier schedules retries for later instead of sleeping on a worker.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+import requests
+
+
+# Configuration
+MAX_ATTEMPTS = 3          # total attempts per sitemap (first try + retries)
+BASE_DELAY = 0.5          # seconds; backoff ceiling doubles with every attempt
+MAX_DELAY = 30.0          # seconds; upper bound for one backoff delay
+MAX_CRAWL_RETRIES = 100   # retries allowed across a whole crawl
+
+# HTTP statuses that are worth retrying (besides every 5xx)
+RETRYABLE_STATUSES = frozenset({408, 425, 429})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Classify a fetch error.
+
+    Returns:
+        (retryable, retry_after) where retry_after is the server-requested
+        delay in seconds, if any
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+        return (status >= 500 or status in RETRYABLE_STATUSES), retry_after
+
+    if isinstance(error, (requests.exceptions.InvalidURL,
+                          requests.exceptions.MissingSchema,
+                          requests.exceptions.InvalidSchema,
+                          requests.exceptions.SSLError,
+                          requests.exceptions.TooManyRedirects)):
+        return False, None
+
+    if isinstance(error, (requests.exceptions.Timeout,
+                          requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True, None
+
+    # Other request errors are treated as transient; parse and budget errors are not
+    return isinstance(error, requests.exceptions.RequestException), None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Attributes:
+        max_attempts: Total attempts per sitemap
+        base_delay: Backoff ceiling for the first retry, in seconds
+        max_delay: Upper bound for any single delay, in seconds
+    """
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY, rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def delay_for(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retry number `attempt` (1 for the first retry).
+        A server-provided Retry-After wins when it is longer, up to max_delay.
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = self._rng.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def next_delay(self, error: BaseException, attempts_made: int) -> Optional[float]:
+        """
+        Decide what to do after a failed attempt.
+
+        Args:
+            error: The exception raised by the attempt
+            attempts_made: Attempts made so far, including the failed one
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if attempts_made >= self.max_attempts:
+            return None
+        retryable, retry_after = classify_error(error)
+        if not retryable:
+            return None
+        return self.delay_for(attempts_made, retry_after)
+
+
+class RetryBudget:
+    """
+    Thread-safe cap on the number of retries across a whole crawl.
+
+    Attributes:
+        max_retries: Retries allowed (None for unlimited)
+        used: Retries granted so far
+        denied: Retries refused because the budget was spent
+    """
+
+    def __init__(self, max_retries: Optional[int] = MAX_CRAWL_RETRIES):
+        self.max_retries = max_retries
+        self.used = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Claim one retry; returns False once the budget is spent."""
+        with self._lock:
+            if self.max_retries is not None and self.used >= self.max_retries:
+                self.denied += 1
+                return False
+            self.used += 1
+            return True
@@ -0,0 +1,704 @@
+"""
+Sitemap Extraction Engine
+
+The crawl core shared by the command-line tool, the Streamlit app and the
+distributed workers: fetching and parsing sitemaps, filtering HTML page URLs
+and crawling sitemap indexes through a prioritized, concurrent frontier.
+
+The engine never prints or renders anything itself. Front ends follow a crawl
+by passing an `on_event` callback to crawl(), which receives a CrawlEvent for
+every fetch, parsed sitemap, retry, error, skip and truncation:
+
+    def on_event(event: CrawlEvent) -> None:
+        print(format_event(event))
+
+    crawl(['https://example.com/sitemap.xml'], visited, urls, on_event=on_event)
+
+Events are delivered on the thread that called crawl(), in processing order,
+so a callback may update UI elements that are bound to that thread.
+
+Local sitemap files (file:// URLs, see local_source.py) go through the same
+crawl: they are read from disk without delays or retries and, when
+`processes` > 1, parsed in a process pool so large dumps use every core.
+"""
+
+import os
+import time
+import heapq
+import itertools
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+
+from sitemap_parser import SitemapDocument, SitemapParser
+from fetcher import download, FetchStats, FetchTimeouts, MAX_SITEMAP_BYTES, TRANSPORT_HTTP1
+from url_normalize import UrlCanonicalizer, FRONTIER_RULES, get_canonicalizer
+from frontier import Frontier, FrontierItem, DEFAULT_POLICY
+from budget import CrawlBudget
+from retry import RetryPolicy, RetryBudget, classify_error
+from circuit_breaker import HostCircuitBreakers
+from dns_cache import dns_cache
+from local_source import is_local, file_path, read_chunks
+from content_cache import ContentCache, content_hasher
+from url_filter import UrlFilter
+from url_results import ResultsCollector
+
+
+# Configuration
+REQUEST_TIMEOUT = 10  # seconds per socket read
+CONNECT_TIMEOUT = 5   # seconds to connect
+TRANSFER_TIMEOUT = 300  # seconds for one whole sitemap download
+MIN_THROUGHPUT = 4 * 1024  # bytes/second; slower downloads are abandoned
+REQUEST_DELAY = 0.5   # seconds between requests to be respectful
+MAX_RETRIES = 3       # total attempts per sitemap; backoff and retry classification live in retry.py
+# Download limits (MAX_SITEMAP_BYTES per file, MAX_CRAWL_BYTES per crawl) live in fetcher.py
+URL_NORMALIZATION = 'standard'  # preset for page URLs: off, standard or aggressive
+CRAWL_POLICY = DEFAULT_POLICY   # frontier order: depth-first, breadth-first, lastmod, host-interleave
+MAX_WORKERS = 4                 # concurrent sitemap fetches
+PER_HOST_LIMIT = 2              # concurrent fetches per host
+HTTP_TRANSPORT = TRANSPORT_HTTP1  # http1 (pooled requests), http2 or h2c (multiplexed, needs httpx[http2])
+PREWARM_DNS = False             # resolve the hosts of an index's children before fetching them
+LOCAL_PROCESSES = os.cpu_count() or 1  # processes parsing local sitemap files (1 = worker threads)
+
+FETCH_TIMEOUTS = FetchTimeouts(connect=CONNECT_TIMEOUT, read=REQUEST_TIMEOUT,
+                               total=TRANSFER_TIMEOUT, min_throughput=MIN_THROUGHPUT)
+
+# Used by the crawl workers: one attempt per fetch, retries are scheduled by the frontier
+SINGLE_ATTEMPT = RetryPolicy(max_attempts=1)
+
+# Shared URL normalizers (memoized across the whole crawl)
+frontier_canonicalizer = UrlCanonicalizer(FRONTIER_RULES)
+result_canonicalizer = get_canonicalizer(URL_NORMALIZATION)
+
+# Crawl event kinds
+EVENT_FETCH = 'fetch'          # a sitemap fetch started (event.attempt > 0 for retries)
+EVENT_INDEX = 'index'          # a sitemap index was parsed (event.count child sitemaps)
+EVENT_URLSET = 'urlset'        # a URL set was parsed (event.count HTML URLs, event.new_urls not seen before)
+EVENT_RETRY = 'retry'          # a fetch failed and is retried after event.delay seconds
+EVENT_ERROR = 'error'          # a sitemap failed for good (event.error)
+EVENT_SKIP = 'skip'            # a sitemap was skipped without fetching (event.detail says why)
+EVENT_TRUNCATED = 'truncated'  # a sitemap body was cut short (event.detail is the reason)
+EVENT_DUPLICATE = 'duplicate'  # a body matched content parsed before (event.detail: where, None if outside this crawl), so it was not parsed again
+
+
+@dataclass
+class CrawlEvent:
+    """
+    Something that happened during a crawl, passed to the on_event callback.
+
+    Attributes:
+        kind: One of the EVENT_* constants
+        url: Sitemap the event is about
+        depth: Index nesting level of the sitemap (root is 0)
+        attempt: Failed attempts before this one (EVENT_FETCH, EVENT_RETRY)
+        count: Child sitemaps (EVENT_INDEX), HTML URLs (EVENT_URLSET) or bytes read (EVENT_TRUNCATED, EVENT_DUPLICATE)
+        new_urls: Canonical page URLs this sitemap added to the results (EVENT_URLSET)
+        error: The exception (EVENT_RETRY, EVENT_ERROR)
+        delay: Backoff before the retry in seconds (EVENT_RETRY)
+        detail: Short explanation (skip reason, truncation reason, retry progress)
+        sitemaps_fetched: Sitemaps fetched so far in this crawl
+        urls_found: Page URLs collected so far
+        pending: Sitemaps queued, in flight or waiting for a retry
+    """
+    kind: str
+    url: str
+    depth: int = 0
+    attempt: int = 0
+    count: int = 0
+    new_urls: List[str] = field(default_factory=list)
+    error: Optional[Exception] = None
+    delay: Optional[float] = None
+    detail: Optional[str] = None
+    sitemaps_fetched: int = 0
+    urls_found: int = 0
+    pending: int = 0
+
+    @property
+    def progress(self) -> float:
+        """Share of the sitemaps known so far that have been fetched (0.0 - 1.0)."""
+        known = self.sitemaps_fetched + self.pending
+        return self.sitemaps_fetched / known if known else 1.0
+
+
+EventCallback = Callable[[CrawlEvent], None]
+
+
+def format_event(event: CrawlEvent) -> str:
+    """Render an event as the one-line log message the command-line tool prints."""
+    if event.kind == EVENT_FETCH:
+        return f"Processing: {event.url}" + (f" (retry {event.attempt})" if event.attempt else "")
+    if event.kind == EVENT_INDEX:
+        return f"  -> {event.url}: sitemap index with {event.count} child sitemap(s)"
+    if event.kind == EVENT_URLSET:
+        return f"  -> {event.url}: URL set with {event.count} HTML URL(s)"
+    if event.kind == EVENT_RETRY:
+        return f"  ! {event.url}: {event.error} - retrying in {event.delay:.1f}s ({event.detail})"
+    if event.kind == EVENT_ERROR:
+        return f"  X Error processing {event.url}: {event.error}" + (f" ({event.detail})" if event.detail else "")
+    if event.kind == EVENT_SKIP:
+        return f"Skipping: {event.url} ({event.detail})"
+    if event.kind == EVENT_TRUNCATED:
+        return f"Warning: {event.url} truncated ({event.detail}) after {event.count} bytes"
+    if event.kind == EVENT_DUPLICATE:
+        if event.detail is None:
+            return f"  = {event.url}: same content as a sitemap parsed in an earlier crawl, not parsed again"
+        if event.detail == event.url:
+            return f"  = {event.url}: unchanged since an earlier run, not parsed again"
+        return f"  = {event.url}: same content as {event.detail}, not parsed again"
+    return f"{event.kind}: {event.url}"
+
+
+def is_html_url(url: str) -> bool:
+    """
+    Check if a URL points to an HTML page.
+    Filters out images, PDFs, videos, XML, and other non-HTML resources.
+    """
+    # Parse URL to get path
+    parsed = urlparse(url)
+    path = parsed.path.lower()
+
+    # Non-HTML extensions to exclude
+    non_html_extensions = {
+        '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico',  # Images
+        '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',  # Documents
+        '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm',  # Videos
+        '.mp3', '.wav', '.ogg', '.flac',  # Audio
+        '.xml', '.rss', '.atom',  # XML feeds
+        '.zip', '.rar', '.tar', '.gz',  # Archives
+        '.css', '.js', '.json',  # Assets
+        '.txt', '.csv',  # Text files
+    }
+
+    # Check if URL ends with a non-HTML extension
+    for ext in non_html_extensions:
+        if path.endswith(ext):
+            return False
+
+    # URLs without extensions or with .html/.htm are considered HTML
+    # Also include URLs with query parameters or fragments
+    if not path or path.endswith('/') or path.endswith('.html') or path.endswith('.htm'):
+        return True
+
+    # If there's no extension, assume it's HTML (common for modern websites)
+    if '.' not in path.split('/')[-1]:
+        return True
+
+    # Default: include if not explicitly excluded
+    return True
+
+
+def fetch_sitemap(url: str, stats: Optional[FetchStats] = None,
+                  retry_policy: Optional[RetryPolicy] = None,
+                  retry_budget: Optional[RetryBudget] = None,
+                  transport: Optional[str] = None,
+                  timeouts: Optional[FetchTimeouts] = None,
+                  max_bytes: Optional[int] = None,
+                  content_cache: Optional[ContentCache] = None,
+                  on_event: Optional[EventCallback] = None) -> SitemapDocument:
+    """
+    Fetch and parse an XML sitemap from a URL.
+    Includes retry logic and error handling.
+
+    The body is fed to a streaming parser chunk by chunk as it arrives, so
+    the document type (from the root element) and its <loc> / <lastmod>
+    entries come out of one pass, without buffering the whole file.
+
+    Transient failures (timeouts, connection errors, 5xx, 429) are retried
+    with jittered exponential backoff; other 4xx responses fail immediately.
+    This blocks the calling thread while backing off; the crawl frontier
+    passes SINGLE_ATTEMPT and schedules retries itself instead.
+
+    `transport` selects HTTP/1.1 or the multiplexed HTTP/2 client
+    (defaults to HTTP_TRANSPORT).
+
+    Each attempt is bounded by `timeouts` (connect, read, total transfer and
+    minimum throughput; defaults to FETCH_TIMEOUTS), so a trickling server
+    cannot hold a worker.
+
+    The body is cut short once `max_bytes` (MAX_SITEMAP_BYTES by default),
+    the crawl-wide byte budget in `stats` or the 50,000-entry protocol cap is
+    passed; the entries read so far are kept, the truncation is recorded in
+    `stats` and reported as an EVENT_TRUNCATED.
+
+    With a `content_cache` the body is hashed and held while it downloads
+    instead of being parsed on the fly; a body seen before (under any URL,
+    or in an earlier run with a persistent cache) returns the cached
+    document without parsing and is reported as an EVENT_DUPLICATE.
+
+    file:// URLs are streamed from disk instead, without retries or limits.
+
+    Raises:
+        requests.exceptions.RequestException: When the last attempt failed
+        OSError: When a local file cannot be read
+    """
+    if is_local(url):
+        parser = SitemapParser()
+        for chunk in read_chunks(file_path(url)):
+            parser.feed(chunk)
+        return parser.close()
+
+    retry_policy = retry_policy or RetryPolicy(max_attempts=MAX_RETRIES)
+    attempt = 0
+
+    while True:
+        attempt += 1
+        parser = SitemapParser()
+        hasher = content_hasher() if content_cache is not None else None
+        chunks: List[bytes] = []
+
+        def hold(chunk: bytes) -> None:
+            hasher.update(chunk)
+            chunks.append(chunk)
+
+        try:
+            result = download(url, stats=stats, timeouts=timeouts or FETCH_TIMEOUTS,
+                              max_bytes=max_bytes or MAX_SITEMAP_BYTES, transport=transport or HTTP_TRANSPORT,
+                              on_chunk=parser.feed if hasher is None else hold)
+            if result.truncated and on_event is not None:
+                on_event(CrawlEvent(EVENT_TRUNCATED, url, count=result.size, detail=result.truncated))
+            if hasher is None:
+                return parser.close()
+
+            # Only complete bodies are looked up and cached
+            digest = hasher.hexdigest()
+            cached = content_cache.get(digest, result.size) if not result.truncated else None
+            if cached is not None:
+                if on_event is not None:
+                    on_event(CrawlEvent(EVENT_DUPLICATE, url, count=result.size, detail=cached[1]))
+                return cached[0]
+            for chunk in chunks:
+                parser.feed(chunk)
+            chunks.clear()
+            document = parser.close()
+            if not result.truncated:
+                content_cache.put(digest, document, url)
+            return document
+
+        except requests.exceptions.RequestException as e:
+            delay = retry_policy.next_delay(e, attempt)
+            if delay is None or (retry_budget is not None and not retry_budget.try_acquire()):
+                raise
+            if on_event is not None:
+                on_event(CrawlEvent(EVENT_RETRY, url, attempt=attempt, error=e, delay=delay,
+                                    detail=f"attempt {attempt + 1}/{retry_policy.max_attempts}"))
+            time.sleep(delay)
+
+
+def extract_sitemap_entries(document: SitemapDocument) -> List[Tuple[str, Optional[str]]]:
+    """
+    Extract child sitemaps from a sitemap index.
+    Returns a list of (sitemap URL, lastmod or None) tuples.
+    """
+    return document.entries if document.is_index else []
+
+
+def extract_page_entries(document: SitemapDocument,
+                         url_filter: Optional[UrlFilter] = None) -> List[Tuple[str, Optional[str]]]:
+    """
+    Extract page entries from a URL set sitemap.
+    Returns a list of (HTML page URL, lastmod or None) tuples, keeping only
+    URLs accepted by `url_filter` if one is given.
+    """
+    if document.is_index:
+        return []
+    # Only include HTML URLs
+    if url_filter is None:
+        return [entry for entry in document.entries if is_html_url(entry[0])]
+    return [entry for entry in document.entries if is_html_url(entry[0]) and url_filter(entry[0])]
+
+
+def extract_page_urls(document: SitemapDocument, url_filter: Optional[UrlFilter] = None) -> List[str]:
+    """
+    Extract page URLs from a URL set sitemap.
+    Returns a list of HTML page URLs (accepted by `url_filter`, if given).
+    """
+    return [url for url, _ in extract_page_entries(document, url_filter)]
+
+
+class ParsedSitemap(NamedTuple):
+    """Result of fetch_and_parse()."""
+    is_index: bool
+    entries: list                # [(child sitemap URL, lastmod), ...] or [page URL, ...]
+    events: List[CrawlEvent]     # events raised while fetching (e.g. truncation), delivered by crawl()
+    lastmods: Optional[list] = None  # <lastmod> (or None) of each page URL in a URL set
+
+
+def _parsed(document: SitemapDocument, events: List[CrawlEvent],
+            url_filter: Optional[UrlFilter] = None) -> ParsedSitemap:
+    # The type was decided from the root element while parsing
+    if document.is_index:
+        return ParsedSitemap(True, extract_sitemap_entries(document), events)
+    pages = extract_page_entries(document, url_filter)
+    return ParsedSitemap(False, [url for url, _ in pages], events, [lastmod for _, lastmod in pages])
+
+
+def parse_local(url: str, url_filter: Optional[UrlFilter] = None) -> ParsedSitemap:
+    """
+    Read and parse a local sitemap file (a file:// URL). Module-level so it
+    can run in a worker process.
+    """
+    return _parsed(fetch_sitemap(url), [], url_filter)
+
+
+def fetch_and_parse(url: str, stats: Optional[FetchStats] = None,
+                    transport: Optional[str] = None,
+                    timeouts: Optional[FetchTimeouts] = None,
+                    max_bytes: Optional[int] = None,
+                    content_cache: Optional[ContentCache] = None,
+                    url_filter: Optional[UrlFilter] = None) -> ParsedSitemap:
+    """
+    Fetch one sitemap and extract its entries (runs on a worker thread).
+    Makes a single attempt; the crawl loop decides about retries.
+
+    Returns:
+        ParsedSitemap with (child sitemap URL, lastmod) entries for a sitemap
+        index, or HTML page URLs (accepted by `url_filter`) for a URL set
+    """
+    if is_local(url):
+        return parse_local(url, url_filter)
+
+    events: List[CrawlEvent] = []
+    document = fetch_sitemap(url, stats, retry_policy=SINGLE_ATTEMPT, transport=transport,
+                             timeouts=timeouts, max_bytes=max_bytes, content_cache=content_cache,
+                             on_event=events.append)
+
+    # Small delay to be respectful to the server (the host slot stays taken)
+    time.sleep(REQUEST_DELAY)
+
+    return _parsed(document, events, url_filter)
+
+
+def crawl(root_urls: List[Union[str, FrontierItem]], visited: Set[str], all_urls: Set[str],
+          policy: Optional[str] = None,
+          max_depth: Optional[int] = None,
+          budget: Optional[CrawlBudget] = None,
+          workers: Optional[int] = None,
+          per_host_limit: Optional[int] = None,
+          canonicalize_sitemap: Optional[UrlCanonicalizer] = None,
+          canonicalize_url: Optional[UrlCanonicalizer] = None,
+          stats: Optional[FetchStats] = None,
+          retry_policy: Optional[RetryPolicy] = None,
+          retry_budget: Optional[RetryBudget] = None,
+          breakers: Optional[HostCircuitBreakers] = None,
+          prewarm_dns: Optional[bool] = None,
+          transport: Optional[str] = None,
+          timeouts: Optional[FetchTimeouts] = None,
+          max_sitemap_bytes: Optional[int] = None,
+          resolve_child: Optional[Callable[[str, Optional[str]], Optional[str]]] = None,
+          processes: Optional[int] = None,
+          lastmods: Optional[Dict[str, str]] = None,
+          content_cache: Optional[ContentCache] = None,
+          url_filter: Optional[UrlFilter] = None,
+          results: Optional[ResultsCollector] = None,
+          on_event: Optional[EventCallback] = None) -> Dict:
+    """
+    Crawl one or more root sitemaps through an explicit frontier queue.
+    Handles both sitemap indexes and URL sets, with no recursion limit.
+
+    Args:
+        root_urls: Sitemap URLs (or FrontierItems left over from an earlier,
+            budget-limited crawl) to start from
+        visited: Set of canonical keys of fetched sitemap URLs (to prevent infinite loops)
+        all_urls: Set to collect all HTML page URLs (canonicalized)
+        policy: Frontier scheduling policy (defaults to CRAWL_POLICY)
+        max_depth: Do not follow sitemap indexes deeper than this (root is depth 0)
+        budget: Time / URL / sitemap limits. When one is reached no new fetches
+            start; on the deadline, fetches still running are abandoned. The
+            sitemaps not processed are stored in budget.remaining.
+        workers: Number of concurrent fetches (defaults to MAX_WORKERS)
+        per_host_limit: Concurrent fetches per host (defaults to PER_HOST_LIMIT)
+        canonicalize_sitemap: Normalizer for the visited check (defaults to frontier_canonicalizer)
+        canonicalize_url: Normalizer for page URLs (defaults to result_canonicalizer)
+        stats: Byte budget and truncation notes shared by the whole crawl
+        retry_policy: Which failures to retry and how long to back off
+            (defaults to MAX_RETRIES attempts with jittered exponential backoff)
+        retry_budget: Crawl-wide cap on retries (defaults to MAX_CRAWL_RETRIES)
+        breakers: Per-host circuit breakers; sitemaps on a host whose breaker
+            is open are skipped and recorded in breakers.skipped
+        prewarm_dns: Pre-resolve the hosts of every index's children in the
+            background (defaults to PREWARM_DNS)
+        transport: 'http1', or 'http2' / 'h2c' to multiplex same-host fetches
+            over one HTTP/2 connection (defaults to HTTP_TRANSPORT)
+        timeouts: Connect / read / transfer / throughput limits per fetch
+            (defaults to FETCH_TIMEOUTS)
+        max_sitemap_bytes: Size limit per sitemap (defaults to MAX_SITEMAP_BYTES)
+        resolve_child: Maps a child sitemap URL (and its index's URL) to the
+            location to crawl, e.g. LocalMirror.resolve to read mirrored files
+            from disk; returning None skips the child
+        processes: Local files parsed at once; above 1 they are parsed in a
+            process pool (defaults to LOCAL_PROCESSES)
+        lastmods: If given, collects canonical page URL -> <lastmod> for
+            every page that has one (the first value seen wins)
+        content_cache: Skip parsing sitemaps whose body was already parsed
+            (identical aliases, or earlier runs with a persistent cache)
+        url_filter: Include / exclude rules applied to page URLs as each URL
+            set is extracted; rejected URLs are never stored
+        results: If given, collects a row per new page URL with its source
+            sitemap, depth and lastmod (build() it into a columnar UrlResults)
+        on_event: Called with a CrawlEvent for every fetch, parsed sitemap,
+            retry, error, skip and truncation, on the calling thread
+
+    Failed fetches are put on a delay queue and re-enter the frontier when
+    their backoff expires, so retries never block a worker.
+
+    Returns:
+        Summary dictionary with 'sitemaps_fetched', 'errors', 'retries',
+        'skipped_depth', 'skipped_circuit' (sitemaps skipped because their
+        host's breaker was open), 'skipped_unresolved' (children resolve_child
+        rejected), 'duplicates' (sitemaps not parsed because their content
+        was cached), 'remaining' (sitemaps left unfetched) and
+        'truncated' (the budget reason, or None if the crawl ran to completion)
+    """
+    policy = policy or CRAWL_POLICY
+    workers = workers or MAX_WORKERS
+    per_host_limit = per_host_limit or PER_HOST_LIMIT
+    canonicalize_sitemap = canonicalize_sitemap or frontier_canonicalizer
+    canonicalize_url = canonicalize_url or result_canonicalizer
+    retry_policy = retry_policy or RetryPolicy(max_attempts=MAX_RETRIES)
+    retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+    breakers = breakers if breakers is not None else HostCircuitBreakers()
+    prewarm_dns = PREWARM_DNS if prewarm_dns is None else prewarm_dns
+    transport = transport or HTTP_TRANSPORT
+    processes = processes or LOCAL_PROCESSES
+
+    frontier = Frontier(policy, lane=lambda item: 'local' if is_local(item.url) else 'remote')
+    # Failed fetches waiting for their backoff: (due time, sequence, item)
+    delayed: List[Tuple[float, int, FrontierItem]] = []
+    delay_sequence = itertools.count()
+    # Canonical keys of everything fetched or queued, so each sitemap is queued once
+    queued: Set[str] = set(visited)
+    summary = {'sitemaps_fetched': 0, 'errors': 0, 'retries': 0, 'skipped_depth': 0, 'skipped_circuit': 0,
+               'skipped_unresolved': 0, 'duplicates': 0, 'remaining': 0, 'truncated': None}
+
+    host_load: Counter = Counter()
+    # Fetches in flight per lane: 'remote' (HTTP, bounded by workers) and 'local' (files, bounded by processes)
+    lane_load: Counter = Counter()
+    in_flight: Dict = {}
+    # Hosts whose fetches completed since the last fill (their load and breaker state changed)
+    finished_hosts: Set[str] = set()
+    abandoned: List[FrontierItem] = []
+    local_pool: Optional[Executor] = None
+
+    def emit(event: CrawlEvent) -> None:
+        if on_event is None:
+            return
+        event.sitemaps_fetched = summary['sitemaps_fetched']
+        event.urls_found = len(all_urls)
+        event.pending = len(frontier) + len(in_flight) + len(delayed)
+        on_event(event)
+
+    def enqueue(item: FrontierItem) -> None:
+        sitemap_key = canonicalize_sitemap(item.url)
+        if sitemap_key in queued:
+            return
+        if max_depth is not None and item.depth > max_depth:
+            summary['skipped_depth'] += 1
+            return
+        queued.add(sitemap_key)
+        frontier.push(item)
+
+    def budget_reached() -> bool:
+        return budget is not None and budget.check(len(all_urls), summary['sitemaps_fetched']) is not None
+
+    def update_host(host: str) -> None:
+        # Hold back a host's sitemaps while it is at its limit or its recovery probe runs
+        if host_load[host] >= per_host_limit or breakers.probing(host):
+            frontier.hold(host)
+        else:
+            frontier.release(host)
+
+    for root in root_urls:
+        enqueue(root if isinstance(root, FrontierItem) else FrontierItem(root))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    try:
+        while in_flight or ((frontier or delayed) and not budget_reached()):
+            # Retries whose backoff has expired go back into the frontier
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                frontier.push(heapq.heappop(delayed)[2])
+            for host in finished_hosts:
+                update_host(host)
+            finished_hosts.clear()
+
+            # Fill free worker slots from the lanes with capacity (hosts without a free slot are held back)
+            while frontier and not budget_reached():
+                lanes = [lane for lane, limit in (('remote', workers), ('local', processes)) if lane_load[lane] < limit]
+                item = frontier.pop(lanes) if lanes else None
+                if item is None:
+                    break
+
+                if is_local(item.url):
+                    if local_pool is None:
+                        local_pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else executor
+                    visited.add(canonicalize_sitemap(item.url))
+                    lane_load['local'] += 1
+                    summary['sitemaps_fetched'] += 1
+                    in_flight[local_pool.submit(parse_local, item.url, url_filter)] = item
+                    emit(CrawlEvent(EVENT_FETCH, item.url, depth=item.depth))
+                    continue
+
+                if not breakers.allow(item.host):
+                    summary['skipped_circuit'] += 1
+                    breakers.record_skip(item.url, item.host)
+                    emit(CrawlEvent(EVENT_SKIP, item.url, depth=item.depth,
+                                    detail=f"circuit open for {item.host}"))
+                    continue
+
+                visited.add(canonicalize_sitemap(item.url))
+                host_load[item.host] += 1
+                lane_load['remote'] += 1
+                update_host(item.host)
+                if item.attempt == 0:
+                    summary['sitemaps_fetched'] += 1
+                in_flight[executor.submit(fetch_and_parse, item.url, stats, transport,
+                                          timeouts, max_sitemap_bytes, content_cache, url_filter)] = item
+                emit(CrawlEvent(EVENT_FETCH, item.url, depth=item.depth, attempt=item.attempt))
+
+            # Wait for the next result, the next retry becoming due or the deadline
+            wait_limits = []
+            if budget is not None and budget.time_left() is not None:
+                wait_limits.append(budget.time_left())
+            if delayed:
+                wait_limits.append(max(0.0, delayed[0][0] - time.monotonic()))
+            timeout = min(wait_limits) if wait_limits else None
+
+            if not in_flight:
+                if not delayed:
+                    break
+                time.sleep(timeout)
+                continue
+
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if budget is not None and budget_reached():
+                    # Deadline passed while fetches were still running: give up on them
+                    abandoned = list(in_flight.values())
+                    in_flight.clear()
+                    break
+                continue
+
+            for future in done:
+                item = in_flight.pop(future)
+                local = is_local(item.url)
+                if local:
+                    lane_load['local'] -= 1
+                else:
+                    lane_load['remote'] -= 1
+                    host_load[item.host] -= 1
+                    finished_hosts.add(item.host)
+
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    if local:
+                        # A missing or unreadable file does not get better by retrying
+                        summary['errors'] += 1
+                        emit(CrawlEvent(EVENT_ERROR, item.url, depth=item.depth, error=e))
+                        continue
+                    if classify_error(e)[0]:
+                        breakers.record_failure(item.host)
+                    else:
+                        breakers.record_success(item.host)  # the host answered, the sitemap is just bad
+                    if breakers.is_open(item.host):
+                        summary['errors'] += 1
+                        emit(CrawlEvent(EVENT_ERROR, item.url, depth=item.depth, attempt=item.attempt, error=e,
+                                        detail="circuit open, not retrying"))
+                        continue
+                    delay = retry_policy.next_delay(e, item.attempt + 1)
+                    if delay is not None and retry_budget.try_acquire():
+                        summary['retries'] += 1
+                        item.attempt += 1
+                        heapq.heappush(delayed, (time.monotonic() + delay, next(delay_sequence), item))
+                        emit(CrawlEvent(EVENT_RETRY, item.url, depth=item.depth, attempt=item.attempt, error=e,
+                                        delay=delay, detail=f"attempt {item.attempt + 1}/{retry_policy.max_attempts}"))
+                        continue
+                    summary['errors'] += 1
+                    emit(CrawlEvent(EVENT_ERROR, item.url, depth=item.depth, attempt=item.attempt, error=e))
+                    continue
+
+                if not local:
+                    breakers.record_success(item.host)
+                for event in parsed.events:
+                    event.depth = item.depth
+                    if event.kind == EVENT_DUPLICATE:
+                        summary['duplicates'] += 1
+                        # A shared cache holds other crawls' (and users') sitemaps: only name copies this crawl fetched
+                        if event.detail != event.url and canonicalize_sitemap(event.detail) not in visited:
+                            event.detail = None
+                    emit(event)
+                if parsed.is_index:
+                    if prewarm_dns:
+                        dns_cache.prefetch(urlparse(child_url).hostname for child_url, _ in parsed.entries)
+                    for child_url, lastmod in parsed.entries:
+                        # A remote index must never make the crawl read local files
+                        if is_local(child_url) and not local:
+                            summary['skipped_unresolved'] += 1
+                            emit(CrawlEvent(EVENT_SKIP, child_url, depth=item.depth + 1,
+                                            detail="local path in a remote index"))
+                            continue
+                        if resolve_child is not None:
+                            resolved = resolve_child(child_url, item.url)
+                            if resolved is None:
+                                summary['skipped_unresolved'] += 1
+                                emit(CrawlEvent(EVENT_SKIP, child_url, depth=item.depth + 1,
+                                                detail="not available locally"))
+                                continue
+                            child_url = resolved
+                        enqueue(FrontierItem(child_url, depth=item.depth + 1, lastmod=lastmod, parent=item.url))
+                    emit(CrawlEvent(EVENT_INDEX, item.url, depth=item.depth, count=len(parsed.entries)))
+                else:
+                    # Add canonical URLs to the collection (set automatically handles duplicates)
+                    page_urls = list(map(canonicalize_url, parsed.entries))
+                    new_urls = set(page_urls)
+                    new_urls -= all_urls
+                    all_urls.update(new_urls)
+                    if lastmods is not None and parsed.lastmods:
+                        for page_url, lastmod in zip(page_urls, parsed.lastmods):
+                            if lastmod:
+                                lastmods.setdefault(page_url, lastmod)
+                    if results is not None:
+                        results.add(item.url, item.depth, page_urls, parsed.lastmods, new_urls)
+                    emit(CrawlEvent(EVENT_URLSET, item.url, depth=item.depth, count=len(parsed.entries),
+                                    new_urls=list(new_urls)))
+    finally:
+        if local_pool is not None and local_pool is not executor:
+            local_pool.shutdown(wait=not abandoned, cancel_futures=True)
+        executor.shutdown(wait=not abandoned, cancel_futures=True)
+
+    # Abandoned fetches and pending retries were never processed, so they may be fetched again on resume
+    retries_pending = [entry[2] for entry in sorted(delayed)]
+    for item in abandoned:
+        if item.attempt == 0:
+            summary['sitemaps_fetched'] -= 1
+    for item in abandoned + retries_pending:
+        visited.discard(canonicalize_sitemap(item.url))
+    remaining = abandoned + frontier.drain() + retries_pending
+
+    summary['remaining'] = len(remaining)
+    if budget is not None and remaining:
+        budget.remaining = remaining
+        summary['truncated'] = budget.reason
+    return summary
+
+
+def process_sitemap(url: str, visited: Set[str], all_urls: Set[str], **options) -> Dict:
+    """
+    Process a sitemap URL and everything it links to.
+    Handles both sitemap indexes and URL sets.
+
+    Args:
+        url: The sitemap URL to process
+        visited: Set of canonical keys of visited sitemap URLs (to prevent infinite loops)
+        all_urls: Set to collect all HTML page URLs
+        **options: Crawl options, see crawl()
+
+    Returns:
+        Crawl summary dictionary, see crawl()
+    """
+    return crawl([url], visited, all_urls, **options)
@@ -3,241 +3,444 @@
 XML Sitemap -> HTML URL Extractor (CSV Tool)
 
 A lightweight command-line tool that extracts HTML page URLs from XML sitemaps.
-Supports sitemap indexes and recursively follows nested sitemaps.
+Supports sitemap indexes and follows nested sitemaps through a prioritized,
+concurrent crawl frontier (no recursion limit).
+Bare domains are resolved to their sitemaps via robots.txt and common locations.
+Local sitemap files (.xml / .xml.gz) and directories of them are read from disk.
 
 Usage:
-    python sitemap_extractor.py <sitemap_url>
+    python sitemap_extractor.py <sitemap_url|domain|path> [--no-probe] [--normalize PRESET]
+        [--policy POLICY] [--max-depth N] [--max-sitemaps N]
+        [--max-urls N] [--deadline SECONDS] [--workers N] [--per-host N]
+        [--connect-timeout S] [--read-timeout S] [--transfer-timeout S]
+        [--min-throughput KB_PER_S] [--transport {http1,http2,h2c}]
+        [--dns-ttl SECONDS] [--prewarm-dns]
+        [--max-attempts N] [--max-retries N]
+        [--breaker-threshold N] [--breaker-cooldown SECONDS]
+        [--mirror DIR] [--offline] [--processes N]
+        [--snapshot] [--snapshot-dir DIR] [--snapshot-keep N] [--diff-output CSV]
+        [--dedup] [--content-cache DIR]
+        [--include RULE] [--exclude RULE]
+        [--check] [--check-workers N] [--check-per-host N] [--check-rate PER_S] [--details]
+        [--order {url,host,lastmod,discovery}]
+        [--profile [PROF_FILE]] [--trace-memory]
     
 Example:
     python sitemap_extractor.py https://example.com/sitemap.xml
+    python sitemap_extractor.py example.com
+    python sitemap_extractor.py ./sitemap-dump/ --offline
+    python sitemap_extractor.py https://example.com/sitemap.xml --mirror ./sitemap-dump
+    python sitemap_extractor.py https://example.com/sitemap.xml --snapshot
+    python sitemap_extractor.py https://example.com/sitemap.xml --include /blog/ --exclude query:page
+    python sitemap_extractor.py https://example.com/sitemap.xml --check
+    python sitemap_extractor.py https://example.com/sitemap.xml --details --order lastmod
+    python sitemap_extractor.py https://example.com/sitemap.xml --profile --trace-memory
 
 Output:
     sitemap_urls.csv - CSV file with a single column 'URL' containing all HTML URLs
+                       (with --details also Sitemap, Depth and Lastmod;
+                       with --check also Status, Redirect, Response Time (ms) and Check Error)
+    sitemap_diff.csv - With --snapshot: URLs added, removed or with a new lastmod since the last snapshot
 """
 
+import os
 import sys
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from urllib.parse import urlparse
 import time
-from typing import Set, List
+import argparse
+from collections import Counter
+from typing import Set, List, Optional, Dict, Tuple
+from profiling import run_profiled, format_report, DEFAULT_PROFILE_FILE
+from discovery import discover_sitemaps
+from fetcher import FetchStats, FetchTimeouts, MAX_SITEMAP_BYTES, MAX_CRAWL_BYTES, TRANSPORTS, TRANSPORT_HTTP1
+import http2_transport
+from url_normalize import PRESETS, get_canonicalizer
+from frontier import POLICIES
+from budget import CrawlBudget
+from retry import RetryPolicy, RetryBudget, MAX_CRAWL_RETRIES
+from circuit_breaker import HostCircuitBreakers, FAILURE_THRESHOLD, RESET_TIMEOUT
+from dns_cache import dns_cache, DNS_CACHE_TTL
+from snapshots import (SNAPSHOT_DIR, SNAPSHOT_KEEP, DEFAULT_DIFF_OUTPUT, site_key, scoped_site, list_snapshots,
+                       save_snapshot, prune_snapshots, incomplete_reasons, diff_to_file, format_summary)
+from content_cache import ContentCache
+from url_filter import UrlFilter, build_filter
+from liveness import CheckResult, check_urls, format_progress, add_status_columns, CHECK_WORKERS, CHECK_PER_HOST, CHECK_RATE
+from url_results import ResultsCollector, DETAIL_COLUMNS, DEFAULT_ORDER, ORDERS, ORDER_URL
+from local_source import LocalMirror, is_local, is_local_target, file_path, list_sitemap_files, to_file_url
+from sitemap_engine import (
+    crawl, format_event, CrawlEvent,
+    REQUEST_TIMEOUT, CONNECT_TIMEOUT, TRANSFER_TIMEOUT, MIN_THROUGHPUT, MAX_RETRIES,
+    URL_NORMALIZATION, CRAWL_POLICY, MAX_WORKERS, PER_HOST_LIMIT, HTTP_TRANSPORT, LOCAL_PROCESSES,
+)
 
+# Fetching, parsing and crawling live in sitemap_engine.py (shared with the web app);
+# this module is the command-line front end.
 
-# Configuration
-REQUEST_TIMEOUT = 10  # seconds
-REQUEST_DELAY = 0.5   # seconds between requests to be respectful
-MAX_RETRIES = 3
+CHECK_PROGRESS_INTERVAL = 5  # seconds between progress lines while checking URLs
 
 
-def is_html_url(url: str) -> bool:
-    """
-    Check if a URL points to an HTML page.
-    Filters out images, PDFs, videos, XML, and other non-HTML resources.
-    """
-    # Parse URL to get path
-    parsed = urlparse(url)
-    path = parsed.path.lower()
-    
-    # Non-HTML extensions to exclude
-    non_html_extensions = {
-        '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico',  # Images
-        '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',  # Documents
-        '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm',  # Videos
-        '.mp3', '.wav', '.ogg', '.flac',  # Audio
-        '.xml', '.rss', '.atom',  # XML feeds
-        '.zip', '.rar', '.tar', '.gz',  # Archives
-        '.css', '.js', '.json',  # Assets
-        '.txt', '.csv',  # Text files
-    }
-    
-    # Check if URL ends with a non-HTML extension
-    for ext in non_html_extensions:
-        if path.endswith(ext):
-            return False
-    
-    # URLs without extensions or with .html/.htm are considered HTML
-    # Also include URLs with query parameters or fragments
-    if not path or path.endswith('/') or path.endswith('.html') or path.endswith('.htm'):
-        return True
-    
-    # If there's no extension, assume it's HTML (common for modern websites)
-    if '.' not in path.split('/')[-1]:
-        return True
-    
-    # Default: include if not explicitly excluded
-    return True
+def print_event(event: CrawlEvent) -> None:
+    """Crawl event callback: log every event as one line."""
+    print(format_event(event))
 
 
-def fetch_sitemap(url: str) -> BeautifulSoup:
-    """
-    Fetch and parse an XML sitemap from a URL.
-    Includes retry logic and error handling.
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = requests.get(url, timeout=REQUEST_TIMEOUT)
-            response.raise_for_status()
-            
-            # Parse XML
-            soup = BeautifulSoup(response.content, 'xml')
-            return soup
-            
-        except requests.exceptions.RequestException as e:
-            if attempt < MAX_RETRIES - 1:
-                print(f"Warning: Failed to fetch {url} (attempt {attempt + 1}/{MAX_RETRIES}). Retrying...")
-                time.sleep(REQUEST_DELAY * (attempt + 1))  # Exponential backoff
-            else:
-                print(f"Error: Failed to fetch {url} after {MAX_RETRIES} attempts: {e}")
-                raise
-    
-    raise Exception(f"Failed to fetch sitemap: {url}")
-
-
-def is_sitemap_index(soup: BeautifulSoup) -> bool:
+    Parse command-line arguments.
     """
-    Check if the parsed XML is a sitemap index (contains <sitemap> tags)
-    or a URL set (contains <url> tags).
-    """
-    # Sitemap index contains <sitemap> elements
-    if soup.find('sitemap'):
-        return True
-    
-    # URL set contains <url> elements
-    if soup.find('url'):
-        return False
-    
-    # If neither found, assume it's a URL set (most common case)
-    return False
+    parser = argparse.ArgumentParser(
+        description='Extract HTML page URLs from an XML sitemap into sitemap_urls.csv.',
+        epilog='Example: python sitemap_extractor.py https://example.com/sitemap.xml',
+    )
+    parser.add_argument('sitemap_url',
+                        help='URL of the XML sitemap or sitemap index, a domain to discover sitemaps for, '
+                             'or a local .xml/.xml.gz file or directory')
+    parser.add_argument('--no-probe', action='store_true',
+                        help='when discovering sitemaps for a domain, only use robots.txt')
+    parser.add_argument('--normalize', choices=sorted(PRESETS), default=URL_NORMALIZATION,
+                        help='page URL normalization used for deduplication (default: %(default)s)')
+    parser.add_argument('--policy', choices=POLICIES, default=CRAWL_POLICY,
+                        help='order in which child sitemaps are fetched (default: %(default)s)')
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help='do not follow sitemap indexes nested deeper than this (root is depth 0)')
+    parser.add_argument('--max-sitemaps', type=int, default=None,
+                        help='stop after fetching this many sitemaps')
+    parser.add_argument('--max-urls', type=int, default=None,
+                        help='stop fetching once at least this many URLs were found')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='stop fetching after this many seconds and save partial results')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='concurrent sitemap fetches (default: %(default)s)')
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT,
+                        help='concurrent fetches per host (default: %(default)s)')
+    parser.add_argument('--connect-timeout', type=float, default=CONNECT_TIMEOUT, metavar='SECONDS',
+                        help='seconds to establish a connection (default: %(default)g)')
+    parser.add_argument('--read-timeout', type=float, default=REQUEST_TIMEOUT, metavar='SECONDS',
+                        help='seconds to wait for each read (default: %(default)g)')
+    parser.add_argument('--transfer-timeout', type=float, default=TRANSFER_TIMEOUT, metavar='SECONDS',
+                        help='seconds allowed for one whole sitemap download, 0 for no limit (default: %(default)g)')
+    parser.add_argument('--min-throughput', type=float, default=MIN_THROUGHPUT / 1024, metavar='KB_PER_S',
+                        help='abandon downloads slower than this, 0 to disable (default: %(default)g)')
+    parser.add_argument('--transport', choices=TRANSPORTS, default=HTTP_TRANSPORT,
+                        help='http1 (pooled connections), http2 (multiplexed over TLS) or h2c '
+                             '(HTTP/2 cleartext, prior knowledge); http2/h2c need httpx[http2] (default: %(default)s)')
+    parser.add_argument('--dns-ttl', type=float, default=DNS_CACHE_TTL, metavar='SECONDS',
+                        help='reuse DNS lookups for this long, 0 to disable the cache (default: %(default)g)')
+    parser.add_argument('--prewarm-dns', action='store_true',
+                        help="resolve the hosts of an index's child sitemaps before fetching them")
+    parser.add_argument('--max-attempts', type=int, default=MAX_RETRIES,
+                        help='attempts per sitemap for transient errors (default: %(default)s)')
+    parser.add_argument('--max-retries', type=int, default=MAX_CRAWL_RETRIES,
+                        help='retries allowed across the whole crawl (default: %(default)s)')
+    parser.add_argument('--breaker-threshold', type=int, default=FAILURE_THRESHOLD,
+                        help='consecutive failures before a host is skipped, 0 to disable (default: %(default)s)')
+    parser.add_argument('--breaker-cooldown', type=float, default=RESET_TIMEOUT, metavar='SECONDS',
+                        help='seconds to skip a failing host before probing it again (default: %(default)g)')
+    parser.add_argument('--max-sitemap-mb', type=float, default=MAX_SITEMAP_BYTES / 1024 / 1024,
+                        help='stop reading a single sitemap after this many MB (default: %(default)g)')
+    parser.add_argument('--max-crawl-mb', type=float, default=MAX_CRAWL_BYTES / 1024 / 1024,
+                        help='stop the crawl after downloading this many MB in total (default: %(default)g)')
+    parser.add_argument('--mirror', action='append', default=[], metavar='DIR',
+                        help='directory of mirrored sitemaps; child sitemaps found there are read from disk '
+                             '(repeatable; a local input is always its own mirror)')
+    parser.add_argument('--offline', action='store_true',
+                        help='skip child sitemaps that are not mirrored locally instead of fetching them')
+    parser.add_argument('--processes', type=int, default=LOCAL_PROCESSES,
+                        help='processes parsing local sitemap files in parallel (default: %(default)s)')
+    parser.add_argument('--include', action='append', default=[], metavar='RULE',
+                        help='keep only page URLs matching a rule (repeatable): a path prefix such as /blog/, '
+                             'path:GLOB, re:REGEX, host:HOST or query:KEY')
+    parser.add_argument('--exclude', action='append', default=[], metavar='RULE',
+                        help='drop page URLs matching a rule (repeatable, same syntax as --include)')
+    parser.add_argument('--check', action='store_true',
+                        help='after extraction, send a HEAD request to every URL and add its status code, '
+                             'redirect target and response time to the CSV')
+    parser.add_argument('--check-workers', type=int, default=CHECK_WORKERS,
+                        help='concurrent URL checks (default: %(default)s)')
+    parser.add_argument('--check-per-host', type=int, default=CHECK_PER_HOST,
+                        help='concurrent URL checks per host (default: %(default)s)')
+    parser.add_argument('--check-rate', type=float, default=CHECK_RATE, metavar='PER_S',
+                        help='URL checks per second per host, 0 for no limit (default: %(default)g)')
+    parser.add_argument('--details', action='store_true',
+                        help='add the source sitemap, its depth and the lastmod of each URL to the CSV')
+    parser.add_argument('--order', choices=ORDERS, default=DEFAULT_ORDER,
+                        help='row order of the CSV: url (lexicographic), host (by host, then path), lastmod '
+                             '(newest first, undated last) or discovery (as found, no sorting) (default: %(default)s)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='hash sitemap bodies and parse identical content (e.g. aliased child sitemaps) only once')
+    parser.add_argument('--content-cache', metavar='DIR', default=None,
+                        help='like --dedup, and keep parsed sitemaps in DIR so identical content '
+                             'is not parsed again in later runs')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='save the result as a versioned snapshot and diff it against the previous one')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, metavar='DIR',
+                        help='snapshot archive (default: %(default)s)')
+    parser.add_argument('--snapshot-keep', type=int, default=SNAPSHOT_KEEP, metavar='N',
+                        help='snapshots kept per site, older ones are deleted (default: %(default)s, 0 = all)')
+    parser.add_argument('--diff-output', default=DEFAULT_DIFF_OUTPUT, metavar='CSV',
+                        help='where --snapshot writes the changes since the previous snapshot (default: %(default)s)')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_FILE, metavar='PROF_FILE',
+                        help=f'run under cProfile and save stats (default file: {DEFAULT_PROFILE_FILE})')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='track peak memory and top allocators with tracemalloc')
+    return parser.parse_args(argv)
 
 
-def extract_sitemap_urls(soup: BeautifulSoup) -> List[str]:
+def local_roots(target: str) -> Tuple[List[str], str]:
     """
-    Extract sitemap URLs from a sitemap index.
-    Returns a list of sitemap URLs to process.
+    Root sitemaps for a local input.
+
+    Returns:
+        (file:// URLs to crawl, directory that mirrors the input's child sitemaps)
     """
-    sitemap_urls = []
-    sitemap_tags = soup.find_all('sitemap')
-    
-    for sitemap_tag in sitemap_tags:
-        loc_tag = sitemap_tag.find('loc')
-        if loc_tag and loc_tag.text:
-            sitemap_urls.append(loc_tag.text.strip())
-    
-    return sitemap_urls
+    path = file_path(target) if is_local(target) else target
+    if os.path.isdir(path):
+        return [to_file_url(name) for name in list_sitemap_files(path)], path
+    return [to_file_url(path)], os.path.dirname(os.path.abspath(path))
 
 
-def extract_page_urls(soup: BeautifulSoup) -> List[str]:
+def save_and_diff_snapshot(target: str, sorted_urls: List[str], lastmods: Optional[Dict[str, str]],
+                           crawl_summary: Dict, truncated_sitemaps: int, snapshot_dir: str, diff_output: str,
+                           keep: int = SNAPSHOT_KEEP, scope: Optional[Dict] = None) -> None:
     """
-    Extract page URLs from a URL set sitemap.
-    Returns a list of HTML page URLs.
+    Archive a complete crawl result and report the changes since the
+    previous snapshot of the same site. `scope` holds the settings that make
+    the crawl return only part of the site, see snapshots.scoped_site().
     """
-    page_urls = []
-    url_tags = soup.find_all('url')
-    
-    for url_tag in url_tags:
-        loc_tag = url_tag.find('loc')
-        if loc_tag and loc_tag.text:
-            url = loc_tag.text.strip()
-            # Only include HTML URLs
-            if is_html_url(url):
-                page_urls.append(url)
-    
-    return page_urls
+    reasons = incomplete_reasons(crawl_summary, truncated_sitemaps)
+    if reasons:
+        print(f"Snapshot not saved, the results are incomplete: {'; '.join(reasons)}")
+        return
+    site = scoped_site(site_key(target), scope)
+    previous = list_snapshots(site, snapshot_dir)
+    # Prune after diffing, so even --snapshot-keep 1 compares with the previous version
+    path = save_snapshot(sorted_urls, lastmods, site, snapshot_dir, keep=0)
+    print(f"Snapshot saved to: {path}")
+    if previous:
+        changes = diff_to_file(previous[-1], path, diff_output)
+        print(f"Changes since {os.path.basename(previous[-1])}: {format_summary(changes)}")
+        print(f"Diff saved to: {diff_output}")
+    prune_snapshots(site, snapshot_dir, keep)
+
+
+def snapshot_scope(args: argparse.Namespace, url_filter: Optional[UrlFilter]) -> Dict:
+    """Settings that make a crawl return only part of the site, for scoped_site()."""
+    return {
+        'normalize': args.normalize if args.normalize != URL_NORMALIZATION else None,
+        'include': sorted(url_filter.include) if url_filter is not None else None,
+        'exclude': sorted(url_filter.exclude) if url_filter is not None else None,
+        'max_depth': args.max_depth,
+    }
 
 
-def process_sitemap(url: str, visited: Set[str], all_urls: Set[str]) -> None:
+def run_url_checks(urls: List[str], args: argparse.Namespace) -> Dict[str, CheckResult]:
     """
-    Recursively process a sitemap URL.
-    Handles both sitemap indexes and URL sets.
-    
-    Args:
-        url: The sitemap URL to process
-        visited: Set of already visited sitemap URLs (to prevent infinite loops)
-        all_urls: Set to collect all HTML page URLs
+    Check the status of every extracted URL, printing progress as results arrive.
+    Ctrl+C stops the checks and keeps the results so far.
     """
-    # Prevent infinite loops
-    if url in visited:
-        return
+    results: Dict[str, CheckResult] = {}
+    progress = {'checked': 0, 'statuses': Counter()}
+    last_report = time.monotonic()
     
-    visited.add(url)
-    print(f"Processing: {url}")
+    def on_result(result: CheckResult) -> None:
+        nonlocal last_report
+        results[result.url] = result
+        progress['checked'] += 1
+        progress['statuses'][result.status_class] += 1
+        if time.monotonic() - last_report >= CHECK_PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            print(f"  {format_progress(progress, len(urls))}")
     
+    print(f"\nChecking {len(urls)} URL(s) (HEAD, {args.check_workers} workers, "
+          f"{args.check_per_host} per host, " + (f"{args.check_rate:g}/s per host)" if args.check_rate else "no rate limit)"))
     try:
-        # Fetch and parse sitemap
-        soup = fetch_sitemap(url)
-        
-        # Small delay to be respectful to the server
-        time.sleep(REQUEST_DELAY)
-        
-        # Check if it's a sitemap index or URL set
-        if is_sitemap_index(soup):
-            print(f"  -> Detected sitemap index, following child sitemaps...")
-            child_sitemaps = extract_sitemap_urls(soup)
-            print(f"  -> Found {len(child_sitemaps)} child sitemap(s)")
-            
-            # Recursively process each child sitemap
-            for child_url in child_sitemaps:
-                process_sitemap(child_url, visited, all_urls)
-        else:
-            print(f"  -> Detected URL set, extracting HTML URLs...")
-            page_urls = extract_page_urls(soup)
-            print(f"  -> Found {len(page_urls)} HTML URL(s)")
-            
-            # Add URLs to the collection (set automatically handles duplicates)
-            all_urls.update(page_urls)
-            
-    except Exception as e:
-        print(f"  X Error processing {url}: {e}")
+        summary = check_urls(urls, workers=args.check_workers, per_host=args.check_per_host, rate=args.check_rate,
+                             on_result=on_result)
+        rate = summary['checked'] / summary['elapsed'] if summary['elapsed'] else 0
+        print(f"  {format_progress(summary, len(urls))} in {summary['elapsed']:.1f}s ({rate:.0f} URLs/s)")
+    except KeyboardInterrupt:
+        print(f"\n  Checks interrupted: {format_progress(progress, len(urls))}")
+    return results
 
 
 def main():
     """
     Main function to run the sitemap extractor.
     """
-    # Check command-line arguments
-    if len(sys.argv) != 2:
-        print("Usage: python sitemap_extractor.py <sitemap_url>")
-        print("\nExample:")
-        print("  python sitemap_extractor.py https://example.com/sitemap.xml")
-        sys.exit(1)
-    
-    sitemap_url = sys.argv[1]
+    args = parse_args()
+    sitemap_url = args.sitemap_url
     
     print("=" * 60)
     print("XML Sitemap -> HTML URL Extractor")
     print("=" * 60)
     print(f"Starting extraction from: {sitemap_url}\n")
     
+    if args.transport != TRANSPORT_HTTP1 and not http2_transport.is_available():
+        print(f'Error: --transport {args.transport} needs the optional dependency: pip install "httpx[http2]"')
+        sys.exit(1)
+    
+    try:
+        url_filter = build_filter(args.include, args.exclude)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if url_filter is not None:
+        print(f"URL filter: {url_filter.describe()}\n")
+    
+    mirror_dirs = list(args.mirror)
+    if is_local_target(sitemap_url):
+        # Local file or directory: no discovery, the input mirrors its own children
+        root_sitemaps, input_dir = local_roots(sitemap_url)
+        mirror_dirs.insert(0, input_dir)
+        if not root_sitemaps:
+            print(f"Error: No .xml or .xml.gz files found in {sitemap_url}")
+            sys.exit(1)
+    else:
+        # Resolve domains and site URLs into root sitemaps (robots.txt + common locations)
+        root_sitemaps = discover_sitemaps(sitemap_url, probe=not args.no_probe)
+        if not root_sitemaps:
+            print(f"Error: No sitemaps found for {sitemap_url} (checked robots.txt and common locations)")
+            sys.exit(1)
+    mirror = LocalMirror(mirror_dirs, offline=args.offline) if mirror_dirs or args.offline else None
+    if root_sitemaps != [sitemap_url]:
+        print(f"Discovered {len(root_sitemaps)} root sitemap(s):")
+        for root in root_sitemaps:
+            print(f"  - {root}")
+        print()
+    
     # Track visited sitemaps and collected URLs
     visited_sitemaps: Set[str] = set()
     html_urls: Set[str] = set()
+    collector = ResultsCollector()
+    # Page URL -> <lastmod>, only needed for snapshots
+    lastmods: Optional[Dict[str, str]] = {} if args.snapshot else None
+    
+    canonicalize_url = get_canonicalizer(args.normalize)
+    content_cache = ContentCache(args.content_cache) if args.dedup or args.content_cache else None
+    
+    # Download and time limits
+    max_sitemap_bytes = int(args.max_sitemap_mb * 1024 * 1024)
+    fetch_timeouts = FetchTimeouts(connect=args.connect_timeout, read=args.read_timeout,
+                                   total=args.transfer_timeout or None,
+                                   min_throughput=args.min_throughput * 1024 or None)
+    fetch_stats = FetchStats(max_crawl_bytes=int(args.max_crawl_mb * 1024 * 1024))
+    
+    crawl_summary: Dict = {}
+    crawl_budget = CrawlBudget(deadline=args.deadline, max_urls=args.max_urls, max_sitemaps=args.max_sitemaps)
+    breakers = HostCircuitBreakers(args.breaker_threshold, args.breaker_cooldown)
+    dns_cache.ttl = args.dns_ttl
     
-    # Process the sitemap recursively
+    def run_extraction() -> None:
+        try:
+            crawl_summary.update(crawl(
+                root_sitemaps, visited_sitemaps, html_urls,
+                policy=args.policy,
+                max_depth=args.max_depth,
+                budget=crawl_budget,
+                workers=args.workers,
+                per_host_limit=args.per_host,
+                canonicalize_url=canonicalize_url,
+                stats=fetch_stats,
+                retry_policy=RetryPolicy(max_attempts=args.max_attempts),
+                retry_budget=RetryBudget(args.max_retries),
+                breakers=breakers,
+                prewarm_dns=args.prewarm_dns,
+                transport=args.transport,
+                timeouts=fetch_timeouts,
+                max_sitemap_bytes=max_sitemap_bytes,
+                resolve_child=mirror.resolve if mirror is not None else None,
+                processes=args.processes,
+                lastmods=lastmods,
+                content_cache=content_cache,
+                url_filter=url_filter,
+                results=collector,
+                on_event=print_event,
+            ))
+        except KeyboardInterrupt:
+            print("\n\nInterrupted by user. Saving progress...")
+    
+    # Process the sitemaps, optionally under the profilers
+    profile_report = None
+    if args.profile and args.processes > 1:
+        # cProfile cannot see worker processes; parse local files on the profiled threads instead
+        print("Profiling: local sitemap files are parsed with --processes 1")
+        args.processes = 1
     try:
-        process_sitemap(sitemap_url, visited_sitemaps, html_urls)
-    except KeyboardInterrupt:
-        print("\n\nInterrupted by user. Saving progress...")
+        if args.profile or args.trace_memory:
+            _, profile_report = run_profiled(
+                run_extraction,
+                profile_path=args.profile,
+                cpu=bool(args.profile),
+                trace_memory=args.trace_memory,
+            )
+        else:
+            run_extraction()
     except Exception as e:
         print(f"\n\nFatal error: {e}")
         sys.exit(1)
     
-    # Convert to sorted list for consistent output
-    sorted_urls = sorted(html_urls)
+    # Columnar results, written in the requested order (discovery order skips sorting)
+    results = collector.build(args.order)
     
-    # Create DataFrame and save to CSV
-    df = pd.DataFrame({'URL': sorted_urls})
+    # Save to CSV, straight from the columns unless check results must be joined
     output_file = 'sitemap_urls.csv'
-    df.to_csv(output_file, index=False)
+    columns = ['url'] + (DETAIL_COLUMNS if args.details else [])
+    if args.check:
+        statuses = run_url_checks(results.urls(), args)
+        add_status_columns(results.export_table(columns).to_pandas(), statuses).to_csv(output_file, index=False)
+    else:
+        results.write_csv(output_file, columns)
     
     # Print summary
     print("\n" + "=" * 60)
-    print("Extraction Complete!")
+    if crawl_summary.get('truncated'):
+        print(f"Extraction Stopped Early ({crawl_budget.describe()}) - PARTIAL RESULTS")
+    else:
+        print("Extraction Complete!")
     print("=" * 60)
     print(f"Total sitemaps processed: {len(visited_sitemaps)}")
     print(f"Total HTML URLs found: {len(html_urls)}")
+    print(f"Total downloaded: {fetch_stats.bytes_downloaded / 1024 / 1024:.1f} MB "
+          f"({fetch_stats.wire_bytes / 1024 / 1024:.1f} MB on the wire"
+          + (f", {fetch_stats.compression_ratio:.1f}x compression" if fetch_stats.compression_ratio else "") + ")")
+    if fetch_stats.encodings:
+        print("Content encodings: " + ", ".join(f"{name} {count}" for name, count in fetch_stats.encodings.most_common()))
+    if dns_cache.enabled:
+        dns = dns_cache.summary()
+        print(f"DNS lookups: {dns['misses']} resolved, {dns['hits']} from cache, {dns['prefetched']} pre-resolved")
+    if content_cache is not None:
+        cache = content_cache.summary()
+        print(f"Duplicate sitemaps (same content, not parsed again): {cache['hits']}"
+              + (f", {cache['disk_hits']} from earlier runs" if cache['disk_hits'] else "")
+              + f" ({cache['bytes_skipped'] / 1024 / 1024:.1f} MB)")
+    if crawl_summary.get('retries'):
+        print(f"Retries: {crawl_summary['retries']}")
+    if crawl_summary.get('errors'):
+        print(f"Sitemaps with errors: {crawl_summary['errors']}")
+    if breakers.skipped:
+        print(f"Sitemaps skipped (host circuit open): {len(breakers.skipped)}")
+        for host, count in breakers.skipped_by_host().most_common():
+            print(f"  - {host}: {count}")
+    if mirror is not None and mirror.missing:
+        print(f"Sitemaps skipped (not mirrored locally, --offline): {len(mirror.missing)}")
+    if crawl_summary.get('skipped_depth'):
+        print(f"Sitemaps skipped (deeper than --max-depth): {crawl_summary['skipped_depth']}")
+    if crawl_summary.get('truncated'):
+        print(f"PARTIAL RESULTS (truncated: {crawl_budget.describe()}): "
+              f"{crawl_summary['remaining']} sitemap(s) not fetched")
+    if fetch_stats.truncated:
+        print(f"Truncated sitemaps: {len(fetch_stats.truncated)}")
+        for truncated_url, reason in fetch_stats.truncated.items():
+            print(f"  - {truncated_url} ({reason})")
     print(f"Output saved to: {output_file}")
+    if args.snapshot:
+        save_and_diff_snapshot(sitemap_url, results.ordered(ORDER_URL).urls(), lastmods, crawl_summary,
+                               len(fetch_stats.truncated), args.snapshot_dir, args.diff_output, args.snapshot_keep,
+                               scope=snapshot_scope(args, url_filter))
     print("=" * 60)
+    
+    if profile_report:
+        print()
+        print(format_report(profile_report))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+"""
+Streaming Sitemap Parser
+
+Parses a sitemap in a single pass while its body is still arriving. The
+document type is decided from the root element (<sitemapindex> or <urlset>)
+as soon as its start tag is seen, and <loc> / <lastmod> pairs are collected
+in the same pass, so a 50,000-URL file is walked once instead of once for
+type detection and again for extraction.
+
+Built on lxml's XMLPullParser: bytes are fed in arbitrary chunks (as they come
+off the network or out of the gzip decoder), only sitemap elements produce
+events, and every finished entry is removed from the tree so memory stays
+bounded by one entry rather than the whole document.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from lxml import etree
+
+
+# Root element names
+SITEMAP_INDEX = 'sitemapindex'
+URLSET = 'urlset'
+
+# Elements the parser reports, in any or no namespace (everything else is skipped in C)
+_WATCHED_TAGS = ('{*}sitemapindex', '{*}urlset', '{*}sitemap', '{*}url', '{*}loc', '{*}lastmod')
+_ENTRY_TAGS = {'sitemap', 'url'}
+
+
+def _split_tag(tag: str) -> Tuple[str, str]:
+    """('{namespace', local name) of an lxml tag; the namespace part is '' without one."""
+    namespace, _, name = tag.rpartition('}')
+    return namespace, name
+
+
+class SitemapDocument(NamedTuple):
+    """A parsed sitemap: its type and its (loc, lastmod or None) entries."""
+    root: str                                    # SITEMAP_INDEX or URLSET
+    entries: List[Tuple[str, Optional[str]]]     # child sitemaps of an index, or pages of a URL set
+
+    @property
+    def is_index(self) -> bool:
+        return self.root == SITEMAP_INDEX
+
+
+class SitemapParser:
+    """
+    Incremental sitemap parser. Call feed() with each chunk of the body and
+    close() at the end to get the SitemapDocument.
+
+    Documents whose root is neither <sitemapindex> nor <urlset> (e.g. a
+    wrapper element) are still parsed: they count as an index if they contain
+    any <sitemap> entry, otherwise as a URL set of their <url> entries.
+
+    Attributes:
+        root: Type decided from the root start tag (None until it is seen or if unrecognised)
+    """
+
+    def __init__(self):
+        self.root: Optional[str] = None
+        self._root_seen = False
+        self._parser = etree.XMLPullParser(
+            events=('start', 'end'), tag=_WATCHED_TAGS,
+            recover=True, huge_tree=True, resolve_entities=False, no_network=True,
+        )
+        self._entries = {'sitemap': [], 'url': []}
+        self._loc: Optional[str] = None
+        self._lastmod: Optional[str] = None
+        # Namespace of the current entry; its <loc> / <lastmod> are in the same one or in none
+        self._entry_namespace = ''
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.feed(chunk)
+        self._handle_events()
+
+    def _handle_events(self) -> None:
+        for event, element in self._parser.read_events():
+            namespace, name = _split_tag(element.tag)
+            if event == 'start':
+                if not self._root_seen:
+                    self._root_seen = True
+                    if name in (SITEMAP_INDEX, URLSET):
+                        self.root = name
+                elif name in _ENTRY_TAGS:
+                    self._loc = self._lastmod = None
+                    self._entry_namespace = namespace
+                continue
+
+            if name == 'loc':
+                # Extension elements (image:loc, video:loc, ...) are in another namespace and may come first
+                if self._loc is None and element.text and namespace in ('', self._entry_namespace):
+                    self._loc = element.text.strip() or None
+            elif name == 'lastmod':
+                if self._lastmod is None and element.text and namespace in ('', self._entry_namespace):
+                    self._lastmod = element.text.strip() or None
+            elif name in _ENTRY_TAGS:
+                if self._loc:
+                    self._entries[name].append((self._loc, self._lastmod))
+                self._loc = self._lastmod = None
+                # Drop the finished entry so the tree never holds more than one
+                element.clear()
+                parent = element.getparent()
+                if parent is not None:
+                    parent.remove(element)
+
+    def close(self) -> SitemapDocument:
+        """Finish parsing (recovering from a truncated or malformed tail) and return the document."""
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass  # empty or unrecoverable document: keep whatever was parsed
+        self._handle_events()
+
+        root = self.root
+        if root is None:
+            root = SITEMAP_INDEX if self._entries['sitemap'] else URLSET
+        return SitemapDocument(root, self._entries['sitemap'] if root == SITEMAP_INDEX else self._entries['url'])
+
+
+def parse_sitemap(content: bytes) -> SitemapDocument:
+    """Parse a complete sitemap body in one pass."""
+    parser = SitemapParser()
+    parser.feed(content)
+    return parser.close()
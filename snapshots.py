@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Crawl Snapshots and Diffs
+
+Keeps a versioned archive of crawl results and compares any two of them, so
+"what was added or removed since yesterday" is one command instead of a
+manual diff of two re-sorted CSV files.
+
+- A snapshot is a gzip file of "URL<TAB>lastmod" lines sorted by URL, stored
+  as <snapshot dir>/<site>/<UTC timestamp>.tsv.gz; every saved crawl is a
+  new version and versions sort by name.
+- Crawls that keep only part of a site (URL filters, another normalization
+  preset, a depth limit) are archived under <site>+<settings hash> (see
+  scoped_site()), so they are only ever compared with crawls of the same slice.
+- Only complete crawls are archived (see incomplete_reasons()), and each
+  site keeps its latest SNAPSHOT_KEEP versions.
+- Diffs are a sorted merge of two snapshots read in blocks, so memory stays
+  constant however large the sites are. Runs of identical lines are compared
+  a block at a time as raw bytes; only the differences are decoded. Two
+  10M-URL snapshots are compared in a few seconds.
+
+Usage:
+    python snapshots.py [--dir snapshots] list <site>
+    python snapshots.py [--dir snapshots] diff <site> [--output sitemap_diff.csv]
+    python snapshots.py diff <old.tsv.gz> <new.tsv.gz> [--output sitemap_diff.csv]
+
+Example:
+    python sitemap_extractor.py https://example.com/sitemap.xml --snapshot
+    python snapshots.py diff example.com
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import operator
+import os
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from urllib.parse import urlparse
+
+
+# Configuration
+SNAPSHOT_DIR = 'snapshots'
+DEFAULT_DIFF_OUTPUT = 'sitemap_diff.csv'
+SNAPSHOT_SUFFIX = '.tsv.gz'
+SNAPSHOT_HEADER = b'# sitemap-snapshot v1\n'
+SNAPSHOT_KEEP = 30            # versions kept per site; older ones are deleted when a new one is saved
+COMPRESS_LEVEL = 1            # gzip level for snapshot files (6 is ~10% smaller but twice as slow)
+READ_BUFFER = 256 * 1024      # compressed bytes read per block while diffing
+WRITE_BATCH = 100_000         # URLs formatted and compressed per batch
+MERGE_BLOCK = 4096            # most lines compared at once while skipping unchanged runs
+
+# Change kinds reported by diff_snapshots()
+CHANGE_ADDED = 'added'
+CHANGE_REMOVED = 'removed'
+CHANGE_LASTMOD = 'lastmod'    # URL in both snapshots, <lastmod> differs
+
+
+@dataclass
+class DiffSummary:
+    """Counts of a snapshot diff."""
+    added: int = 0
+    removed: int = 0
+    lastmod_changed: int = 0
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.added + self.removed + self.lastmod_changed
+
+
+def site_key(target: str) -> str:
+    """
+    Archive folder name for a crawl target: the host without "www." for URLs
+    and domains, the file or directory name for local paths.
+    """
+    if os.path.exists(target):
+        name = os.path.basename(os.path.normpath(target))
+        for suffix in ('.gz', '.xml'):
+            name = name[:-len(suffix)] if name.endswith(suffix) else name
+        return name or 'local'
+    host = (urlparse(target if '://' in target else f'//{target}').hostname or target).lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def scoped_site(site: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Archive folder for a crawl whose settings change which URLs it returns.
+
+    Args:
+        site: Archive folder of the full site, see site_key()
+        settings: Name -> value of the settings that shape the result (filter
+            rules, normalization preset, depth limit); None or empty values
+            mean the default
+
+    Returns:
+        `site` for a default crawl, else "<site>+<8-character hash of the settings>"
+    """
+    used = {name: value for name, value in (settings or {}).items() if value not in (None, '', [], ())}
+    if not used:
+        return site
+    digest = hashlib.sha1(json.dumps(used, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return f"{site}+{digest}"
+
+
+def list_snapshots(site: str, directory: str = SNAPSHOT_DIR) -> List[str]:
+    """Paths of a site's snapshots, oldest first."""
+    folder = os.path.join(directory, site)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(SNAPSHOT_SUFFIX))
+
+
+def snapshot_label(path: str) -> str:
+    """Readable UTC time of a snapshot, from its file name."""
+    stamp = os.path.basename(path)[:-len(SNAPSHOT_SUFFIX)]
+    try:
+        taken = time.strptime(stamp.split('.')[0], '%Y%m%dT%H%M%S')
+    except ValueError:
+        return stamp
+    return time.strftime('%Y-%m-%d %H:%M:%S UTC', taken)
+
+
+def incomplete_reasons(crawl_summary: Optional[Dict], truncated_sitemaps: int = 0) -> List[str]:
+    """
+    Why a crawl result is not a full copy of its site. Such a result must not
+    be archived: diffed against, every URL it missed would show as removed.
+
+    Args:
+        crawl_summary: Summary returned by sitemap_engine.crawl(); None or
+            empty if the crawl did not finish
+        truncated_sitemaps: Sitemaps cut short by a size limit (FetchStats.truncated)
+
+    Returns:
+        Readable reasons, empty for a complete crawl
+    """
+    if not crawl_summary:
+        return ["the crawl did not finish"]
+    reasons = []
+    if crawl_summary.get('truncated'):
+        reasons.append(f"stopped early ({crawl_summary['truncated']})")
+    if crawl_summary.get('errors'):
+        reasons.append(f"{crawl_summary['errors']} sitemap(s) failed")
+    if crawl_summary.get('skipped_circuit'):
+        reasons.append(f"{crawl_summary['skipped_circuit']} sitemap(s) skipped on failing hosts")
+    if crawl_summary.get('skipped_unresolved'):
+        reasons.append(f"{crawl_summary['skipped_unresolved']} sitemap(s) not available locally")
+    if truncated_sitemaps:
+        reasons.append(f"{truncated_sitemaps} sitemap(s) truncated")
+    return reasons
+
+
+def prune_snapshots(site: str, directory: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_KEEP) -> List[str]:
+    """Delete all but the latest `keep` snapshots of a site and return the deleted paths."""
+    paths = list_snapshots(site, directory)
+    removed = paths[:-keep] if keep > 0 else []
+    for path in removed:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # pruned concurrently by another run
+    return removed
+
+
+def save_snapshot(sorted_urls: Iterable[str], lastmods: Optional[Dict[str, str]], site: str,
+                  directory: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_KEEP) -> str:
+    """
+    Store a crawl result as a new snapshot version.
+
+    Args:
+        sorted_urls: Page URLs in sorted order (as written to sitemap_urls.csv)
+        lastmods: URL -> <lastmod> for the URLs that have one
+        site: Archive folder, see site_key()
+        directory: Snapshot archive root
+        keep: Versions of the site to keep, including the new one (0 keeps all)
+
+    Returns:
+        Path of the snapshot file
+    """
+    folder = os.path.join(directory, site)
+    os.makedirs(folder, exist_ok=True)
+    # UTC timestamps sort chronologically; microseconds keep quick re-runs apart
+    now = time.time()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f'.{int(now % 1 * 1e6):06d}Z'
+    path = os.path.join(folder, stamp + SNAPSHOT_SUFFIX)
+
+    lastmods = lastmods or {}
+    tmp_path = path + '.tmp'
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    previous: List[str] = []
+    urls = iter(sorted_urls)
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(compressor.compress(SNAPSHOT_HEADER))
+            while True:
+                batch = [url for _, url in zip(range(WRITE_BATCH), urls)]
+                if not batch:
+                    break
+                # The diff merge relies on strictly increasing URLs
+                checked = previous + batch
+                if not all(map(operator.lt, checked, checked[1:])):
+                    raise ValueError("Snapshot URLs must be sorted and unique")
+                previous = batch[-1:]
+                lines = '\n'.join(f"{url}\t{lastmods.get(url, '')}" for url in batch) + '\n'
+                out.write(compressor.compress(lines.encode('utf-8')))
+            out.write(compressor.flush())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    prune_snapshots(site, directory, keep)
+    return path
+
+
+class _SnapshotReader:
+    """
+    Reads a snapshot as blocks of raw "URL<TAB>lastmod" lines.
+
+    Attributes:
+        lines: Lines of the current block
+        pos: Index of the next unread line in `lines`
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._decompressor = zlib.decompressobj(31)
+        self._tail = b''
+        self._header = True
+        self.lines: List[bytes] = []
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Make sure an unread line is available; False at the end of the file."""
+        while self.pos >= len(self.lines):
+            chunk = self._file.read(READ_BUFFER)
+            if chunk:
+                data = self._decompressor.decompress(chunk)
+                while self._decompressor.eof and self._decompressor.unused_data:
+                    # Concatenated gzip members
+                    rest = self._decompressor.unused_data
+                    self._decompressor = zlib.decompressobj(31)
+                    data += self._decompressor.decompress(rest)
+            else:
+                data = self._decompressor.flush() + (b'\n' if self._tail else b'')
+            lines = (self._tail + data).split(b'\n')
+            self._tail = lines.pop()
+            if self._header and lines:
+                self._header = False
+                if lines[0].startswith(b'#'):
+                    del lines[0]
+            self.lines, self.pos = lines, 0
+            if not chunk and not lines:
+                return False
+        return True
+
+    def take(self) -> bytes:
+        line = self.lines[self.pos]
+        self.pos += 1
+        return line
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _decode(line: bytes) -> Tuple[str, Optional[str]]:
+    url, _, lastmod = line.partition(b'\t')
+    return url.decode('utf-8'), lastmod.decode('utf-8') or None
+
+
+def read_snapshot(path: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """Stream (URL, lastmod or None) pairs from a snapshot in URL order."""
+    reader = _SnapshotReader(path)
+    try:
+        while reader.fill():
+            lines, reader.pos = reader.lines[reader.pos:], len(reader.lines)
+            for line in lines:
+                yield _decode(line)
+    finally:
+        reader.close()
+
+
+def diff_snapshots(old_path: str, new_path: str,
+                   summary: Optional[DiffSummary] = None) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """
+    Compare two snapshots in one sorted-merge pass with constant memory.
+
+    Identical lines are matched as raw bytes; only differences are decoded
+    and split. Unchanged URLs are counted in `summary` if one is given.
+
+    Yields:
+        (change, url, old lastmod, new lastmod) for every CHANGE_* difference, in URL order
+    """
+    old = _SnapshotReader(old_path)
+    new = _SnapshotReader(new_path)
+    unchanged = 0
+    # Lines compared per step: doubles across unchanged runs, restarts small after a difference
+    window = 1
+    try:
+        while old.fill() and new.fill():
+            # Skip a run of identical lines with one C-level list comparison
+            step = min(window, len(old.lines) - old.pos, len(new.lines) - new.pos)
+            if old.lines[old.pos:old.pos + step] == new.lines[new.pos:new.pos + step]:
+                old.pos += step
+                new.pos += step
+                unchanged += step
+                window = min(window * 2, MERGE_BLOCK)
+                continue
+            window = 1
+
+            # Binary-search the first differing line, then merge that one line
+            same, differs = 0, step
+            while differs - same > 1:
+                middle = (same + differs) // 2
+                if (old.lines[old.pos + same:old.pos + middle]
+                        == new.lines[new.pos + same:new.pos + middle]):
+                    same = middle
+                else:
+                    differs = middle
+            old.pos += same
+            new.pos += same
+            unchanged += same
+
+            old_url, old_lastmod = _decode(old.lines[old.pos])
+            new_url, new_lastmod = _decode(new.lines[new.pos])
+            if old_url == new_url:
+                yield CHANGE_LASTMOD, new_url, old_lastmod, new_lastmod
+                old.pos += 1
+                new.pos += 1
+            elif old_url < new_url:
+                yield CHANGE_REMOVED, old_url, old_lastmod, None
+                old.pos += 1
+            else:
+                yield CHANGE_ADDED, new_url, None, new_lastmod
+                new.pos += 1
+
+        while old.fill():
+            old_url, old_lastmod = _decode(old.take())
+            yield CHANGE_REMOVED, old_url, old_lastmod, None
+        while new.fill():
+            new_url, new_lastmod = _decode(new.take())
+            yield CHANGE_ADDED, new_url, None, new_lastmod
+    finally:
+        old.close()
+        new.close()
+
+    if summary is not None:
+        summary.unchanged += unchanged
+
+
+def write_diff(old_path: str, new_path: str, out: TextIO) -> DiffSummary:
+    """
+    Write the diff of two snapshots as CSV (Change, URL, Old Lastmod, New Lastmod)
+    to an open text file and return the counts.
+    """
+    summary = DiffSummary()
+    writer = csv.writer(out)
+    writer.writerow(['Change', 'URL', 'Old Lastmod', 'New Lastmod'])
+    for change, url, old_lastmod, new_lastmod in diff_snapshots(old_path, new_path, summary):
+        writer.writerow([change, url, old_lastmod or '', new_lastmod or ''])
+        if change == CHANGE_ADDED:
+            summary.added += 1
+        elif change == CHANGE_REMOVED:
+            summary.removed += 1
+        else:
+            summary.lastmod_changed += 1
+    return summary
+
+
+def diff_to_file(old_path: str, new_path: str, output: str = DEFAULT_DIFF_OUTPUT) -> DiffSummary:
+    """Write the diff of two snapshots to a CSV file and return the counts."""
+    with open(output, 'w', newline='', encoding='utf-8') as out:
+        return write_diff(old_path, new_path, out)
+
+
+def format_summary(summary: DiffSummary) -> str:
+    return (f"{summary.added} added, {summary.removed} removed, "
+            f"{summary.lastmod_changed} with a new lastmod, {summary.unchanged} unchanged")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='List and compare saved crawl snapshots.')
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='snapshot archive (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    listing = commands.add_parser('list', help="list a site's snapshots")
+    listing.add_argument('site', help='site (domain, URL or archive folder name)')
+
+    diff = commands.add_parser('diff', help='compare the two latest snapshots of a site, or two snapshot files')
+    diff.add_argument('targets', nargs='+', metavar='SITE | OLD NEW',
+                      help='a site, or the old and new snapshot files')
+    diff.add_argument('--output', default=DEFAULT_DIFF_OUTPUT, help='diff CSV (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main():
+    """
+    Main function for the snapshot commands.
+    """
+    args = parse_args()
+
+    if args.command == 'list':
+        site = site_key(args.site)
+        paths = list_snapshots(site, args.dir)
+        if not paths:
+            print(f"No snapshots for {site} in {args.dir}")
+            return 1
+        for path in paths:
+            print(f"{snapshot_label(path)}  {path}  {os.path.getsize(path) / 1024:.0f} KB")
+        scoped = sorted(name for name in os.listdir(args.dir) if name.startswith(site + '+'))
+        if scoped:
+            print(f"Filtered crawls of {site} (list them by folder name): {', '.join(scoped)}")
+        return 0
+
+    if len(args.targets) == 2:
+        old_path, new_path = args.targets
+    elif len(args.targets) == 1:
+        site = site_key(args.targets[0])
+        paths = list_snapshots(site, args.dir)
+        if len(paths) < 2:
+            print(f"Error: {site} needs at least two snapshots in {args.dir} to compare (found {len(paths)})")
+            return 1
+        old_path, new_path = paths[-2:]
+    else:
+        print("Error: pass a site, or the old and new snapshot files")
+        return 1
+
+    started = time.perf_counter()
+    summary = diff_to_file(old_path, new_path, args.output)
+    print(f"{old_path} -> {new_path}")
+    print(f"{format_summary(summary)} ({time.perf_counter() - started:.1f}s)")
+    print(f"Diff saved to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
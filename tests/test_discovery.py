@@ -0,0 +1,73 @@
+"""Tests for discovery.py: resolving start URLs into root sitemaps."""
+
+from discovery import RobotsCache, discover_sitemaps, parse_robots_sitemaps
+
+
+URLSET = b'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>'
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.body = body
+        self.text = body.decode('utf-8')
+
+    def iter_content(self, chunk_size: int):
+        yield self.body[:chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Serves a fixed URL -> body map; every other URL is a 404."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        if url in self.pages:
+            return FakeResponse(200, self.pages[url])
+        return FakeResponse(404, b'')
+
+
+def test_parse_robots_sitemaps():
+    robots = "User-agent: *\nSITEMAP: /a.xml  # main\nsitemap: https://cdn.example.com/b.xml\nSitemap: /a.xml\n"
+    assert parse_robots_sitemaps(robots, 'https://example.com') == [
+        'https://example.com/a.xml', 'https://cdn.example.com/b.xml']
+
+
+def test_sitemap_file_url_is_used_without_fetching():
+    session = FakeSession({})
+    assert discover_sitemaps('https://example.com/post-sitemap.xml', session=session) == [
+        'https://example.com/post-sitemap.xml']
+    assert session.requested == []
+
+
+def test_url_serving_a_sitemap_is_used_as_given():
+    url = 'https://example.com/index.php?option=com_xmap&view=xml'
+    session = FakeSession({url: URLSET})
+    assert discover_sitemaps(url, cache=RobotsCache(), session=session) == [url]
+    assert session.requested == [url]
+
+
+def test_page_url_falls_back_to_discovery():
+    session = FakeSession({
+        'https://example.com/about': b'<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml"></html>',
+        'https://example.com/robots.txt': b'Sitemap: https://example.com/sitemap_index.xml\n',
+        'https://example.com/sitemap.xml': URLSET,
+    })
+    assert discover_sitemaps('https://example.com/about', cache=RobotsCache(), session=session) == [
+        'https://example.com/sitemap_index.xml', 'https://example.com/sitemap.xml']
+
+
+def test_bare_domain_is_not_fetched_as_a_sitemap():
+    session = FakeSession({'https://example.com/sitemap.xml': URLSET})
+    assert discover_sitemaps('example.com', cache=RobotsCache(), session=session) == [
+        'https://example.com/sitemap.xml']
+    assert 'https://example.com' not in session.requested
@@ -0,0 +1,54 @@
+"""Tests for distributed.py: work queue leases."""
+
+import time
+
+import pytest
+
+from budget import CrawlBudget
+from distributed import STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.db'))
+    work_queue.enqueue(['https://a.com/sitemap.xml'])
+    yield work_queue
+    work_queue.close()
+
+
+def take_over(queue):
+    """Let worker A's lease expire and have worker B claim the shard."""
+    shard = queue.claim('A', lease_seconds=0.01)
+    time.sleep(0.02)
+    assert queue.claim('B')['id'] == shard['id']
+    return shard
+
+
+def test_claim_complete(queue):
+    shard = queue.claim('A')
+    assert queue.claim('B') is None
+    assert queue.renew(shard['id'], 'A')
+    assert queue.complete(shard['id'], 'A', 10, 2, 'a.csv')
+    assert queue.shards()[0]['status'] == STATUS_DONE
+
+
+def test_lost_lease_cannot_renew_complete_or_fail(queue):
+    shard = take_over(queue)
+    assert not queue.renew(shard['id'], 'A')
+    assert not queue.complete(shard['id'], 'A', 10, 2, 'a.csv')
+    assert queue.fail(shard['id'], 'A', 'boom') is None
+    row = queue.shards()[0]
+    assert (row['status'], row['worker'], row['urls_found']) == (STATUS_RUNNING, 'B', None)
+    assert queue.complete(shard['id'], 'B', 12, 2, 'a.csv')
+
+
+def test_fail_schedules_a_retry(queue):
+    shard = queue.claim('A')
+    assert queue.fail(shard['id'], 'A', 'boom') == STATUS_FAILED
+    assert queue.fail(shard['id'], 'A', 'again') is None  # no longer running
+
+
+def test_budget_stop_is_sticky():
+    budget = CrawlBudget(max_urls=5)
+    budget.stop('lease lost')
+    assert budget.check(urls_found=10, sitemaps_fetched=1) == 'lease lost'
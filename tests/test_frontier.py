@@ -0,0 +1,99 @@
+import pytest
+
+from frontier import Frontier, FrontierItem, parse_lastmod
+
+
+def urls(items):
+    return [item.url for item in items]
+
+
+def pop_all(frontier, **kwargs):
+    popped = []
+    while True:
+        item = frontier.pop(**kwargs)
+        if item is None:
+            return popped
+        popped.append(item)
+
+
+def test_depth_first_keeps_listing_order():
+    frontier = Frontier('depth-first')
+    for url, depth in [('https://a.com/1', 0), ('https://a.com/2', 1), ('https://b.com/3', 1), ('https://a.com/4', 2)]:
+        frontier.push(FrontierItem(url, depth=depth))
+    assert urls(pop_all(frontier)) == ['https://a.com/4', 'https://a.com/2', 'https://b.com/3', 'https://a.com/1']
+
+
+def test_lastmod_policy_newest_first_missing_last():
+    frontier = Frontier('lastmod')
+    frontier.push(FrontierItem('https://a.com/old', lastmod='2023-01-01'))
+    frontier.push(FrontierItem('https://a.com/none'))
+    frontier.push(FrontierItem('https://b.com/new', lastmod='2024-05'))
+    assert urls(pop_all(frontier)) == ['https://b.com/new', 'https://a.com/old', 'https://a.com/none']
+
+
+def test_held_host_is_skipped_but_stays_queued():
+    frontier = Frontier('breadth-first')
+    for url in ['https://a.com/1', 'https://a.com/2', 'https://b.com/1']:
+        frontier.push(FrontierItem(url))
+    frontier.hold('a.com')
+    assert frontier.pop().url == 'https://b.com/1'
+    assert frontier.pop() is None
+    assert len(frontier) == 2
+
+    frontier.release('a.com')
+    assert urls(pop_all(frontier)) == ['https://a.com/1', 'https://a.com/2']
+    assert not frontier
+
+
+def test_push_to_held_host_and_release_keeps_priority_order():
+    frontier = Frontier('depth-first')
+    frontier.push(FrontierItem('https://a.com/shallow', depth=0))
+    frontier.hold('a.com')
+    frontier.push(FrontierItem('https://a.com/deep', depth=2))
+    frontier.push(FrontierItem('https://b.com/mid', depth=1))
+    assert frontier.pop().url == 'https://b.com/mid'
+    frontier.release('a.com')
+    frontier.release('a.com')  # releasing twice does not duplicate items
+    assert urls(pop_all(frontier)) == ['https://a.com/deep', 'https://a.com/shallow']
+
+
+def test_pop_only_from_requested_lanes():
+    frontier = Frontier('breadth-first', lane=lambda item: 'local' if item.url.startswith('file:') else 'remote')
+    frontier.push(FrontierItem('file:///tmp/a.xml'))
+    frontier.push(FrontierItem('https://a.com/1'))
+    assert frontier.pop(['remote']).url == 'https://a.com/1'
+    assert frontier.pop(['remote']) is None
+    assert frontier.pop([]) is None
+    assert frontier.pop(['local']).url == 'file:///tmp/a.xml'
+
+
+def test_drain_includes_held_hosts_in_priority_order():
+    frontier = Frontier('breadth-first')
+    frontier.push(FrontierItem('https://a.com/1', depth=1))
+    frontier.push(FrontierItem('https://b.com/1', depth=0))
+    frontier.hold('a.com')
+    assert urls(frontier.drain()) == ['https://b.com/1', 'https://a.com/1']
+    assert len(frontier) == 0 and frontier.pop() is None
+
+
+def test_host_interleave_round_robin():
+    frontier = Frontier('host-interleave')
+    for url in ['https://a.com/1', 'https://a.com/2', 'https://b.com/1', 'https://b.com/2']:
+        frontier.push(FrontierItem(url))
+    assert urls(pop_all(frontier)) == ['https://a.com/1', 'https://b.com/1', 'https://a.com/2', 'https://b.com/2']
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Frontier('random')
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-05-01T10:00+02:00', parse_lastmod('2024-05-01T08:00:00Z')),
+    ('2024-05', parse_lastmod('2024-05-01')),
+    ('2024', parse_lastmod('2024-01-01')),
+    ('not a date', float('-inf')),
+    (None, float('-inf')),
+])
+def test_parse_lastmod(value, expected):
+    assert parse_lastmod(value) == expected
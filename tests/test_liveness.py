@@ -0,0 +1,113 @@
+"""Tests for liveness.py: status checks and their error paths."""
+
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import liveness
+from fetcher import FetchTimeouts
+from liveness import check_urls, results_frame
+from retry import RetryPolicy
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _respond(self) -> None:
+        if self.path == '/ok':
+            self.send_response(200)
+        elif self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/ok')
+        elif self.path == '/get-only' and self.command == 'HEAD':
+            self.send_response(405)
+        elif self.path == '/get-only':
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._respond()
+
+    def do_GET(self):
+        self._respond()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_checks(urls):
+    results = {}
+    summary = check_urls(urls, rate=0, timeouts=FetchTimeouts(connect=2, read=2),
+                         retry_policy=RetryPolicy(max_attempts=1),
+                         on_result=lambda result: results.__setitem__(result.url, result))
+    return results, summary
+
+
+def test_statuses_redirects_and_get_fallback(server):
+    results, summary = run_checks([f'{server}/ok', f'{server}/moved', f'{server}/missing', f'{server}/get-only'])
+    assert results[f'{server}/ok'].status == 200
+    assert results[f'{server}/moved'].status == 301
+    assert results[f'{server}/moved'].location == f'{server}/ok'
+    assert results[f'{server}/missing'].status == 404
+    assert (results[f'{server}/get-only'].status, results[f'{server}/get-only'].method) == (200, 'GET')
+    assert summary['checked'] == 4
+
+
+def test_connection_error_is_reported_per_url(server):
+    dead = f'http://127.0.0.1:{unused_port()}/page'
+    results, _ = run_checks([dead, f'{server}/ok'])
+    assert results[dead].status is None and results[dead].error == 'connection error'
+    assert results[f'{server}/ok'].status == 200
+
+
+@pytest.mark.parametrize('bad_url', [
+    'http://[::1/unclosed-ipv6',
+    'http://127.0.0.1:99999/port-out-of-range',
+    'not a url',
+])
+def test_malformed_urls_do_not_abort_the_run(server, bad_url):
+    results, summary = run_checks([bad_url, f'{server}/ok'])
+    assert summary['checked'] == 2
+    assert results[bad_url].status is None and results[bad_url].error
+    assert results[bad_url].status_class == 'error'
+    assert results[f'{server}/ok'].status == 200
+
+
+def test_unexpected_exception_is_recorded(server, monkeypatch):
+    request = liveness._request
+
+    def flaky(url, timeouts):
+        if url.endswith('/boom'):
+            raise UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+        return request(url, timeouts)
+
+    monkeypatch.setattr(liveness, '_request', flaky)
+    results, _ = run_checks([f'{server}/boom', f'{server}/ok'])
+    assert results[f'{server}/boom'].error.startswith('UnicodeDecodeError')
+    assert results[f'{server}/ok'].status == 200
+
+
+def test_results_frame_leaves_unchecked_urls_empty(server):
+    results, _ = run_checks([f'{server}/ok'])
+    frame = results_frame([f'{server}/ok', f'{server}/later'], results)
+    assert frame['Status'].tolist()[0] == 200
+    assert frame['Status'].isna().tolist() == [False, True]
@@ -0,0 +1,106 @@
+"""Tests for sitemap_parser.py: type detection, entries and namespace handling."""
+
+import pytest
+
+from sitemap_parser import SITEMAP_INDEX, URLSET, SitemapParser, parse_sitemap
+
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+IMAGE_NS = 'http://www.google.com/schemas/sitemap-image/1.1'
+VIDEO_NS = 'http://www.google.com/schemas/sitemap-video/1.1'
+
+
+def urlset(body: str, namespaces: str = f'xmlns="{SITEMAP_NS}"') -> bytes:
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset {namespaces}>{body}</urlset>'.encode('utf-8')
+
+
+def test_urlset_entries_and_lastmod():
+    document = parse_sitemap(urlset(
+        '<url><loc> https://a.com/1 </loc><lastmod>2024-01-02</lastmod></url>'
+        '<url><loc>https://a.com/2</loc></url>'
+    ))
+    assert document.root == URLSET and not document.is_index
+    assert document.entries == [('https://a.com/1', '2024-01-02'), ('https://a.com/2', None)]
+
+
+def test_sitemap_index():
+    document = parse_sitemap(
+        f'<sitemapindex xmlns="{SITEMAP_NS}"><sitemap><loc>https://a.com/s1.xml</loc>'
+        f'<lastmod>2024-03</lastmod></sitemap></sitemapindex>'.encode('utf-8'))
+    assert document.is_index
+    assert document.entries == [('https://a.com/s1.xml', '2024-03')]
+
+
+def test_image_loc_before_page_loc_is_ignored():
+    document = parse_sitemap(urlset(
+        '<url><image:image><image:loc>https://cdn.a.com/1.jpg</image:loc></image:image>'
+        '<loc>https://a.com/page</loc></url>',
+        f'xmlns="{SITEMAP_NS}" xmlns:image="{IMAGE_NS}"',
+    ))
+    assert document.entries == [('https://a.com/page', None)]
+
+
+def test_video_loc_directly_in_entry_is_ignored():
+    document = parse_sitemap(urlset(
+        '<url><video:loc>https://cdn.a.com/v.mp4</video:loc><loc>https://a.com/watch</loc></url>',
+        f'xmlns="{SITEMAP_NS}" xmlns:video="{VIDEO_NS}"',
+    ))
+    assert document.entries == [('https://a.com/watch', None)]
+
+
+def test_entry_with_only_an_extension_loc_is_dropped():
+    document = parse_sitemap(urlset(
+        '<url><image:image><image:loc>https://cdn.a.com/1.jpg</image:loc></image:image></url>'
+        '<url><loc>https://a.com/kept</loc></url>',
+        f'xmlns="{SITEMAP_NS}" xmlns:image="{IMAGE_NS}"',
+    ))
+    assert document.entries == [('https://a.com/kept', None)]
+
+
+@pytest.mark.parametrize('namespaces', [
+    '',                                                        # no namespace at all
+    'xmlns="http://www.google.com/schemas/sitemap/0.84"',      # legacy namespace
+])
+def test_other_sitemap_namespaces(namespaces):
+    document = parse_sitemap(urlset('<url><loc>https://a.com/1</loc></url>', namespaces))
+    assert document.entries == [('https://a.com/1', None)]
+
+
+def test_prefixed_sitemap_namespace():
+    document = parse_sitemap(
+        f'<sm:urlset xmlns:sm="{SITEMAP_NS}"><sm:url><sm:loc>https://a.com/1</sm:loc></sm:url></sm:urlset>'
+        .encode('utf-8'))
+    assert document.root == URLSET
+    assert document.entries == [('https://a.com/1', None)]
+
+
+def test_root_type_known_from_first_chunk():
+    parser = SitemapParser()
+    parser.feed(f'<?xml version="1.0"?><sitemapindex xmlns="{SITEMAP_NS}"><sitem'.encode('utf-8'))
+    assert parser.root == SITEMAP_INDEX
+    parser.feed(b'ap><loc>https://a.com/s.xml</loc></sitemap></sitemapindex>')
+    assert parser.close().entries == [('https://a.com/s.xml', None)]
+
+
+def test_byte_at_a_time_feeding():
+    content = urlset(''.join(f'<url><loc>https://a.com/{i}</loc></url>' for i in range(20)))
+    parser = SitemapParser()
+    for i in range(len(content)):
+        parser.feed(content[i:i + 1])
+    assert [loc for loc, _ in parser.close().entries] == [f'https://a.com/{i}' for i in range(20)]
+
+
+def test_truncated_document_keeps_finished_entries():
+    content = urlset('<url><loc>https://a.com/1</loc></url><url><loc>https://a.com/2</loc></url>')
+    document = parse_sitemap(content[:content.index(b'<url><loc>https://a.com/2') + 12])
+    assert document.entries[0] == ('https://a.com/1', None)
+
+
+def test_wrapper_root_with_sitemap_entries_is_an_index():
+    document = parse_sitemap(b'<feed><sitemap><loc>https://a.com/s.xml</loc></sitemap></feed>')
+    assert document.is_index and document.entries == [('https://a.com/s.xml', None)]
+
+
+def test_empty_document():
+    document = parse_sitemap(b'')
+    assert document.root == URLSET and document.entries == []
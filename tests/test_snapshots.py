@@ -0,0 +1,131 @@
+"""Tests for snapshots.py: archiving, retention and streaming diffs."""
+
+import os
+
+import pytest
+
+import snapshots
+from sitemap_extractor import save_and_diff_snapshot
+from snapshots import (CHANGE_ADDED, CHANGE_LASTMOD, CHANGE_REMOVED, DiffSummary, diff_snapshots,
+                       incomplete_reasons, list_snapshots, prune_snapshots, read_snapshot, save_snapshot,
+                       scoped_site, site_key, write_diff)
+
+
+COMPLETE = {'sitemaps_fetched': 3, 'errors': 0, 'skipped_circuit': 0, 'skipped_unresolved': 0, 'truncated': None}
+
+
+def test_save_and_read_round_trip(tmp_path):
+    path = save_snapshot(['https://a.com/1', 'https://a.com/2'], {'https://a.com/2': '2024-01-01'},
+                         'a.com', str(tmp_path))
+    assert list(read_snapshot(path)) == [('https://a.com/1', None), ('https://a.com/2', '2024-01-01')]
+    assert list_snapshots('a.com', str(tmp_path)) == [path]
+
+
+def test_save_rejects_unsorted_urls(tmp_path):
+    with pytest.raises(ValueError):
+        save_snapshot(['https://a.com/2', 'https://a.com/1'], None, 'a.com', str(tmp_path))
+    assert list_snapshots('a.com', str(tmp_path)) == []
+
+
+def test_diff_reports_added_removed_and_lastmod(tmp_path):
+    old = save_snapshot(['https://a.com/1', 'https://a.com/2', 'https://a.com/3'],
+                        {'https://a.com/2': '2024-01-01'}, 'a.com', str(tmp_path))
+    new = save_snapshot(['https://a.com/2', 'https://a.com/3', 'https://a.com/4'],
+                        {'https://a.com/2': '2024-02-01'}, 'a.com', str(tmp_path))
+    summary = DiffSummary()
+    changes = list(diff_snapshots(old, new, summary))
+    assert changes == [
+        (CHANGE_REMOVED, 'https://a.com/1', None, None),
+        (CHANGE_LASTMOD, 'https://a.com/2', '2024-01-01', '2024-02-01'),
+        (CHANGE_ADDED, 'https://a.com/4', None, None),
+    ]
+    assert summary.unchanged == 1
+
+
+def test_diff_of_large_identical_runs(tmp_path, monkeypatch):
+    # Small blocks make the merge cross many block boundaries
+    monkeypatch.setattr(snapshots, 'READ_BUFFER', 64)
+    urls = [f'https://a.com/page/{i:05d}' for i in range(5000)]
+    old = save_snapshot(urls, None, 'a.com', str(tmp_path))
+    new = save_snapshot(urls[:2500] + urls[2501:] + ['https://a.com/zz'], None, 'a.com', str(tmp_path))
+    with open(os.devnull, 'w') as out:
+        summary = write_diff(old, new, out)
+    assert (summary.added, summary.removed, summary.lastmod_changed, summary.unchanged) == (1, 1, 0, 4999)
+
+
+def test_prune_keeps_latest_versions(tmp_path):
+    paths = [save_snapshot([f'https://a.com/{i}'], None, 'a.com', str(tmp_path), keep=0) for i in range(4)]
+    assert prune_snapshots('a.com', str(tmp_path), keep=2) == paths[:2]
+    assert list_snapshots('a.com', str(tmp_path)) == paths[2:]
+
+
+def test_save_applies_retention(tmp_path):
+    for i in range(3):
+        last = save_snapshot([f'https://a.com/{i}'], None, 'a.com', str(tmp_path), keep=2)
+    remaining = list_snapshots('a.com', str(tmp_path))
+    assert len(remaining) == 2 and remaining[-1] == last
+
+
+def test_site_key():
+    assert site_key('https://www.Example.com/sitemap.xml') == 'example.com'
+    assert site_key('example.com') == 'example.com'
+
+
+def test_scoped_site():
+    assert scoped_site('a.com') == 'a.com'
+    assert scoped_site('a.com', {'include': None, 'exclude': [], 'max_depth': None}) == 'a.com'
+    blog = scoped_site('a.com', {'include': ['/blog/']})
+    assert blog.startswith('a.com+') and site_key(blog) == blog
+    assert scoped_site('a.com', {'include': ['/blog/']}) == blog
+    assert scoped_site('a.com', {'include': ['/news/']}) != blog
+    assert scoped_site('a.com', {'normalize': 'off'}) != scoped_site('a.com', {'normalize': 'aggressive'})
+
+
+def test_cli_keeps_filtered_crawls_apart(tmp_path, capsys):
+    diff_output = str(tmp_path / 'diff.csv')
+    save_and_diff_snapshot('https://a.com/sitemap.xml', ['https://a.com/1', 'https://a.com/blog/1'], {},
+                           COMPLETE, 0, str(tmp_path), diff_output)
+    save_and_diff_snapshot('https://a.com/sitemap.xml', ['https://a.com/blog/1'], {}, COMPLETE, 0,
+                           str(tmp_path), diff_output, scope={'include': ['/blog/']})
+    assert 'Changes since' not in capsys.readouterr().out
+    assert len(list_snapshots('a.com', str(tmp_path))) == 1
+    assert len(list_snapshots(scoped_site('a.com', {'include': ['/blog/']}), str(tmp_path))) == 1
+
+
+def test_complete_crawl_has_no_reasons():
+    assert incomplete_reasons(COMPLETE) == []
+
+
+@pytest.mark.parametrize('summary, truncated, expected', [
+    (None, 0, 'did not finish'),
+    ({}, 0, 'did not finish'),
+    (dict(COMPLETE, truncated='time limit'), 0, 'stopped early'),
+    (dict(COMPLETE, errors=2), 0, '2 sitemap(s) failed'),
+    (dict(COMPLETE, skipped_circuit=1), 0, 'failing hosts'),
+    (dict(COMPLETE, skipped_unresolved=1), 0, 'not available locally'),
+    (COMPLETE, 3, '3 sitemap(s) truncated'),
+])
+def test_incomplete_reasons(summary, truncated, expected):
+    reasons = incomplete_reasons(summary, truncated)
+    assert len(reasons) == 1 and expected in reasons[0]
+
+
+def test_cli_does_not_save_incomplete_crawl(tmp_path, capsys):
+    diff_output = str(tmp_path / 'diff.csv')
+    save_and_diff_snapshot('https://a.com/sitemap.xml', ['https://a.com/1'], {}, COMPLETE, 0,
+                           str(tmp_path), diff_output)
+    save_and_diff_snapshot('https://a.com/sitemap.xml', [], {}, dict(COMPLETE, errors=1), 0,
+                           str(tmp_path), diff_output)
+    assert 'Snapshot not saved' in capsys.readouterr().out
+    assert len(list_snapshots('a.com', str(tmp_path))) == 1
+    assert not os.path.exists(diff_output)
+
+
+def test_cli_diffs_before_pruning(tmp_path, capsys):
+    diff_output = str(tmp_path / 'diff.csv')
+    save_and_diff_snapshot('https://a.com/sitemap.xml', ['https://a.com/1'], {}, COMPLETE, 0,
+                           str(tmp_path), diff_output, keep=1)
+    save_and_diff_snapshot('https://a.com/sitemap.xml', ['https://a.com/2'], {}, COMPLETE, 0,
+                           str(tmp_path), diff_output, keep=1)
+    assert '1 added, 1 removed' in capsys.readouterr().out
+    assert len(list_snapshots('a.com', str(tmp_path))) == 1
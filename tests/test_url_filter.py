@@ -0,0 +1,99 @@
+"""Tests for url_filter.py: rule parsing and the compiled include / exclude matcher."""
+
+import pytest
+
+from url_filter import KIND_HOST, KIND_PATH, KIND_PREFIX, KIND_QUERY, KIND_REGEX, KIND_URL, build_filter, parse_rule
+
+
+@pytest.mark.parametrize('rule, kind', [
+    ('/blog/', KIND_PREFIX),
+    ('blog/', KIND_PREFIX),
+    ('path:/blog/*/2024*', KIND_PATH),
+    ('re:/(en|de)/', KIND_REGEX),
+    ('host:example.com', KIND_HOST),
+    ('query:page', KIND_QUERY),
+    ('https://example.com/blog/', KIND_URL),
+    ('path:https://example.com/blog/', KIND_URL),
+])
+def test_parse_rule_kinds(rule, kind):
+    assert parse_rule(rule)[0] == kind
+
+
+def test_path_without_slash_gets_one():
+    assert parse_rule('blog/') == (KIND_PREFIX, '/blog/')
+
+
+@pytest.mark.parametrize('rule', ['', '   ', 'path:', 're:', 're:(unclosed'])
+def test_invalid_rules_raise(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
+
+
+def test_build_filter_without_rules():
+    assert build_filter([], ['', '  ']) is None
+
+
+def test_path_prefix_and_glob():
+    keep = build_filter(['/blog/', 'path:/news/*/2024*'])
+    assert keep('https://a.com/blog/post')
+    assert keep('https://a.com/news/world/2024-01')
+    assert not keep('https://a.com/news/world/2023-01')
+    assert not keep('https://a.com/shop/blog/')
+    # The host is never taken for the path
+    assert not keep('https://blog.a.com/')
+
+
+def test_prefix_trie_keeps_every_prefix():
+    prefixes = [f'/section-{i}/' for i in range(50)] + ['/s']
+    keep = build_filter(prefixes)
+    assert keep('https://a.com/section-49/x')
+    assert keep('https://a.com/shop')
+    assert not keep('https://a.com/other')
+
+
+def test_host_rules():
+    keep = build_filter(['host:*.example.com'])
+    assert keep('https://example.com/a')
+    assert keep('https://Shop.Example.com:8443/a')
+    assert not keep('https://example.com.evil.net/a')
+    assert not keep('https://notexample.com/a')
+
+
+def test_query_and_regex_excludes():
+    keep = build_filter(exclude=['query:page', r're:\.amp$'])
+    assert keep('https://a.com/list?sort=new')
+    assert not keep('https://a.com/list?page=2')
+    assert not keep('https://a.com/list?sort=new&page')
+    assert keep('https://a.com/list?pages=2')
+    assert not keep('https://a.com/post.amp')
+
+
+def test_full_url_rule_matches_the_whole_url():
+    keep = build_filter(['https://Example.com/blog/'])
+    assert keep('https://example.com/blog/post')
+    assert keep('HTTPS://EXAMPLE.COM/blog/post')
+    assert not keep('http://example.com/blog/post')
+    assert not keep('https://other.com/blog/post')
+    assert not keep('https://example.com/Blog/post')
+
+
+def test_full_url_rule_without_path_stops_at_the_host():
+    keep = build_filter(['https://example.com'])
+    assert keep('https://example.com')
+    assert keep('https://example.com:8080/a')
+    assert not keep('https://example.com.evil.net/a')
+
+
+def test_full_url_glob():
+    drop = build_filter(exclude=['https://*.example.com/tag/*'])
+    assert not drop('https://www.example.com/tag/python')
+    assert not drop('https://www.example.com/tag/python?page=2')
+    assert drop('https://www.example.com/blog/python')
+
+
+def test_include_and_exclude_combined():
+    url_filter = build_filter(['/blog/'], ['query:page'])
+    assert url_filter('https://a.com/blog/x')
+    assert not url_filter('https://a.com/blog/x?page=2')
+    assert not url_filter('https://a.com/shop/x')
+    assert url_filter.describe() == 'include /blog/; exclude query:page'
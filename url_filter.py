@@ -0,0 +1,220 @@
+"""
+URL Include / Exclude Filters
+
+Lets a crawl keep only the slice of a site that is needed ("only /blog/",
+"no ?page= URLs") instead of post-processing the CSV. Rules are applied by
+the engine while each URL set is extracted, so filtered URLs are never
+canonicalized, stored or counted.
+
+Rule syntax (the kind prefix is optional for paths):
+
+    /blog/              path prefix: /blog/ and everything below it
+    path:/blog/*/2024*  path glob; * matches any characters
+    re:^https://[^/]+/(en|de)/     regular expression searched in the full URL
+    https://example.com/blog/      full URL prefix (scheme and host case-insensitive);
+                                   * works as in path globs
+    host:example.com    that host (port ignored, case-insensitive)
+    host:*.example.com  example.com and any subdomain of it
+    query:page          URLs with a "page" query parameter
+
+A URL is kept if it matches at least one include rule (or there are none)
+and no exclude rule. The rules on each side are compiled into at most two
+regular expressions (path, full-URL and host rules anchored at the start of
+the URL, plain path prefixes merged into a prefix trie; query and regex
+rules searched anywhere), so the cost per URL barely grows with the number
+of rules.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Rule kinds
+KIND_PATH = 'path'
+KIND_REGEX = 're'
+KIND_HOST = 'host'
+KIND_QUERY = 'query'
+RULE_KINDS = (KIND_PATH, KIND_REGEX, KIND_HOST, KIND_QUERY)
+KIND_PREFIX = 'prefix'  # internal: a path rule without wildcards
+KIND_URL = 'url'        # internal: a path rule given as a full URL
+
+# Scheme and optional user info of an absolute URL
+_AUTHORITY = r'[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?'
+_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://')
+
+
+def _glob(pattern: str, star: str) -> str:
+    """Translate a glob with * wildcards into a regex fragment."""
+    return star.join(re.escape(part) for part in pattern.split('*'))
+
+
+def parse_rule(rule: str) -> Tuple[str, str]:
+    """
+    Translate one rule into (kind, regex fragment). Path fragments match
+    from the start of the path, KIND_URL fragments (rules written as a full
+    URL) from the start of the URL, host fragments the host, query fragments
+    a parameter name and regex fragments anywhere in the URL. Plain path
+    prefixes come back as KIND_PREFIX with the literal prefix.
+
+    Raises:
+        ValueError: When the rule is empty or an invalid regex
+    """
+    rule = rule.strip()
+    kind, separator, value = rule.partition(':')
+    if not separator or kind not in RULE_KINDS:
+        kind, value = KIND_PATH, rule
+    value = value.strip()
+    if not value:
+        raise ValueError(f"Empty URL filter rule: {rule!r}")
+
+    if kind == KIND_REGEX:
+        try:
+            re.compile(value)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression in URL filter {rule!r}: {e}") from None
+        return kind, value
+    if kind == KIND_HOST:
+        host = value.lower()
+        if host.startswith('*.'):
+            return kind, r'(?:[^/?#:]+\.)?' + re.escape(host[2:])
+        return kind, _glob(host, r'[^/?#:]*')
+    if kind == KIND_QUERY:
+        return kind, re.escape(value)
+
+    # Full URL: scheme and host compared case-insensitively, the rest like a path
+    scheme = _SCHEME.match(value)
+    if scheme:
+        rest_at = re.search(r'[/?#]|$', value[scheme.end():]).start() + scheme.end()
+        origin = '(?i:' + _glob(value[:rest_at].lower(), r'[^/?#]*') + ')'
+        rest = value[rest_at:]
+        if not rest:
+            return KIND_URL, origin + r'(?::\d+)?(?:[/?#]|$)'
+        if '*' in rest:
+            return KIND_URL, origin + _glob(rest, r'[^?#]*') + r'(?:[?#]|$)'
+        return KIND_URL, origin + re.escape(rest)
+
+    # Path: a glob with * is matched against the whole path, a plain path as a prefix
+    if not value.startswith('/'):
+        value = '/' + value
+    if '*' in value:
+        return kind, _glob(value, r'[^?#]*') + r'(?:[?#]|$)'
+    return KIND_PREFIX, value
+
+
+def _trie_pattern(prefixes: Iterable[str]) -> str:
+    """
+    Regex matching any of the literal prefixes, with shared leading
+    characters factored out (a prefix trie), so the regex engine walks each
+    character once instead of trying every prefix in turn.
+    """
+    trie: Dict = {}
+    for prefix in prefixes:
+        node = trie
+        for char in prefix:
+            if node.get('') is True:
+                break  # a shorter prefix already matches everything below
+            node = node.setdefault(char, {})
+        else:
+            node.clear()
+            node[''] = True
+
+    def emit(node: Dict) -> str:
+        if node.get('') is True:
+            return ''
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return emit(trie)
+
+
+def _either(parts: List[str]) -> str:
+    return '|'.join(f'(?:{part})' for part in parts)
+
+
+def compile_rules(rules: Iterable[str]) -> Tuple[Optional['re.Pattern'], Optional['re.Pattern']]:
+    """
+    Combine rules into at most two regular expressions: one anchored at the
+    start of the URL for path, full-URL and host rules (run with match())
+    and one for query and regex rules, which can match anywhere (run with
+    search()).
+    Plain path prefixes are merged into a prefix trie, and the scheme and
+    host are scanned once however many path or host rules there are.
+
+    Returns:
+        (anchored pattern or None, search pattern or None)
+
+    Raises:
+        ValueError: When a rule is invalid
+    """
+    fragments: Dict[str, List[str]] = {kind: [] for kind in RULE_KINDS + (KIND_PREFIX, KIND_URL)}
+    for rule in rules:
+        if rule.strip():
+            kind, fragment = parse_rule(rule)
+            fragments[kind].append(fragment)
+
+    anchored = []
+    paths = fragments[KIND_PATH] + ([_trie_pattern(fragments[KIND_PREFIX])] if fragments[KIND_PREFIX] else [])
+    if paths:
+        anchored.append(_AUTHORITY + r'[^/?#]*(?:' + _either(paths) + ')')
+    anchored.extend(fragments[KIND_URL])
+    if fragments[KIND_HOST]:
+        anchored.append(_AUTHORITY + '(?i:' + _either(fragments[KIND_HOST]) + r')(?::\d+)?(?:[/?#]|$)')
+
+    anywhere = list(fragments[KIND_REGEX])
+    if fragments[KIND_QUERY]:
+        anywhere.append(r'\?(?:[^#]*&)?(?:' + _either(fragments[KIND_QUERY]) + r')(?:[=&#]|$)')
+
+    return (re.compile(_either(anchored)) if anchored else None,
+            re.compile(_either(anywhere)) if anywhere else None)
+
+
+class UrlFilter:
+    """
+    Compiled include / exclude rules. Call it with a URL to decide whether
+    the URL is kept.
+
+    Attributes:
+        include: Include rules as given
+        exclude: Exclude rules as given
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include: List[str] = [rule.strip() for rule in include if rule.strip()]
+        self.exclude: List[str] = [rule.strip() for rule in exclude if rule.strip()]
+        self._include = compile_rules(self.include)
+        self._exclude = compile_rules(self.exclude)
+        self._has_include = any(self._include)
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    @staticmethod
+    def _matches(patterns: Tuple, url: str) -> bool:
+        anchored, anywhere = patterns
+        return ((anchored is not None and anchored.match(url) is not None)
+                or (anywhere is not None and anywhere.search(url) is not None))
+
+    def __call__(self, url: str) -> bool:
+        if self._has_include and not self._matches(self._include, url):
+            return False
+        return not self._matches(self._exclude, url)
+
+    def describe(self) -> str:
+        """One-line summary of the rules for logs."""
+        parts = []
+        if self.include:
+            parts.append("include " + ", ".join(self.include))
+        if self.exclude:
+            parts.append("exclude " + ", ".join(self.exclude))
+        return "; ".join(parts) or "no rules"
+
+
+def build_filter(include: Iterable[str] = (), exclude: Iterable[str] = ()) -> Optional[UrlFilter]:
+    """
+    UrlFilter for the given rules, or None if there are none.
+
+    Raises:
+        ValueError: When a rule is invalid
+    """
+    url_filter = UrlFilter(include, exclude)
+    return url_filter if url_filter else None
@@ -0,0 +1,186 @@
+"""
+URL Canonicalization
+
+Fast, memoized URL normalization used to deduplicate the crawl frontier
+(sitemaps already visited) and the result set (page URLs). Rules are
+configurable; the scheme/host part of a URL is normalized once per distinct
+prefix and cached, so millions of URLs on a handful of hosts cost little more
+than a string split each.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, FrozenSet, Optional, Tuple
+from urllib.parse import unquote_plus
+
+
+# Query parameters that never change the page content
+TRACKING_PARAM_PREFIXES: Tuple[str, ...] = ('utm_',)
+TRACKING_PARAMS: FrozenSet[str] = frozenset({
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'igshid', 'ref_src',
+})
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Upper bound on memoized full URLs per canonicalizer
+MEMO_SIZE = 100_000
+
+
+@dataclass(frozen=True)
+class NormalizationRules:
+    """
+    Switches for URL canonicalization.
+
+    Attributes:
+        lowercase_host: Lower-case the host name ("Example.COM" -> "example.com")
+        strip_default_port: Drop ":80" on http and ":443" on https
+        force_scheme: Rewrite http/https to this scheme (e.g. 'https'), or None
+        strip_trailing_slash: "/blog/" -> "/blog" (the root path "/" is kept)
+        strip_fragment: Drop "#section" fragments
+        drop_tracking_params: Drop utm_* and click-id query parameters
+        sort_query: Sort the remaining query parameters
+        enabled: When False, URLs are only stripped of surrounding whitespace
+    """
+    lowercase_host: bool = True
+    strip_default_port: bool = True
+    force_scheme: Optional[str] = None
+    strip_trailing_slash: bool = False
+    strip_fragment: bool = True
+    drop_tracking_params: bool = True
+    sort_query: bool = False
+    enabled: bool = True
+
+
+# Presets. Results keep the URL as published apart from safe fixes; the
+# frontier additionally treats http/https and trailing slashes as the same
+# sitemap so it is never fetched twice.
+RULES_OFF = NormalizationRules(enabled=False)
+RULES_STANDARD = NormalizationRules()
+RULES_AGGRESSIVE = replace(
+    RULES_STANDARD, force_scheme='https', strip_trailing_slash=True, sort_query=True,
+)
+FRONTIER_RULES = RULES_AGGRESSIVE
+
+PRESETS: Dict[str, NormalizationRules] = {
+    'off': RULES_OFF,
+    'standard': RULES_STANDARD,
+    'aggressive': RULES_AGGRESSIVE,
+}
+
+
+def is_tracking_param(name: str) -> bool:
+    """Check if a query parameter name is a known tracking parameter."""
+    lowered = name.lower()
+    return lowered in TRACKING_PARAMS or lowered.startswith(TRACKING_PARAM_PREFIXES)
+
+
+class UrlCanonicalizer:
+    """
+    Memoizing URL normalizer for one set of NormalizationRules.
+
+    Call the instance with a URL to get its canonical form:
+
+        canonicalize = UrlCanonicalizer(RULES_STANDARD)
+        canonicalize('HTTP://Example.com:80/a?utm_source=x#top')  # 'http://example.com/a'
+    """
+
+    def __init__(self, rules: NormalizationRules = RULES_STANDARD, memo_size: int = MEMO_SIZE):
+        self.rules = rules
+        self.memo_size = memo_size
+        self._memo: Dict[str, str] = {}
+        self._prefixes: Dict[str, str] = {}
+
+    def __call__(self, url: str) -> str:
+        cached = self._memo.get(url)
+        if cached is not None:
+            return cached
+
+        canonical = self._canonicalize(url)
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[url] = canonical
+        return canonical
+
+    def _normalize_prefix(self, prefix: str) -> str:
+        """Normalize a raw "scheme://netloc" prefix once per distinct value."""
+        cached = self._prefixes.get(prefix)
+        if cached is not None:
+            return cached
+
+        rules = self.rules
+        scheme, _, netloc = prefix.partition('://')
+        scheme = scheme.lower()
+        new_scheme = scheme
+        if rules.force_scheme and new_scheme in DEFAULT_PORTS:
+            new_scheme = rules.force_scheme
+
+        userinfo, _, hostport = netloc.rpartition('@')
+        if rules.lowercase_host:
+            hostport = hostport.lower()
+        if rules.strip_default_port and ':' in hostport and not hostport.endswith(']'):
+            host, _, port = hostport.rpartition(':')
+            if port in ('', DEFAULT_PORTS.get(scheme), DEFAULT_PORTS.get(new_scheme)):
+                hostport = host
+        new_netloc = f"{userinfo}@{hostport}" if userinfo else hostport
+
+        normalized = f"{new_scheme}://{new_netloc}"
+        self._prefixes[prefix] = normalized
+        return normalized
+
+    def _canonicalize(self, url: str) -> str:
+        url = url.strip()
+        rules = self.rules
+        if not rules.enabled:
+            return url
+
+        # Split "scheme://netloc" from the rest by hand (much faster than urlsplit)
+        scheme_end = url.find('://')
+        if scheme_end <= 0:
+            return url
+        path_start = len(url)
+        for delimiter in '/?#':
+            index = url.find(delimiter, scheme_end + 3)
+            if index != -1 and index < path_start:
+                path_start = index
+        if path_start == scheme_end + 3:
+            return url
+
+        prefix = self._normalize_prefix(url[:path_start])
+        rest = url[path_start:]
+
+        path, _, fragment = rest.partition('#')
+        path, _, query = path.partition('?')
+
+        if not path:
+            path = '/'
+        elif rules.strip_trailing_slash and len(path) > 1 and path.endswith('/'):
+            path = path.rstrip('/') or '/'
+
+        if query and (rules.drop_tracking_params or rules.sort_query):
+            # Work on raw "name=value" segments so kept parameters keep their encoding
+            segments = [segment for segment in query.split('&') if segment]
+            if rules.drop_tracking_params:
+                segments = [
+                    segment for segment in segments
+                    if not is_tracking_param(unquote_plus(segment.partition('=')[0]))
+                ]
+            if rules.sort_query:
+                segments.sort()
+            query = '&'.join(segments)
+
+        canonical = prefix + path
+        if query:
+            canonical += '?' + query
+        if fragment and not rules.strip_fragment:
+            canonical += '#' + fragment
+        return canonical
+
+
+def get_canonicalizer(preset: str) -> UrlCanonicalizer:
+    """
+    Create a canonicalizer from a preset name ('off', 'standard', 'aggressive').
+    """
+    try:
+        return UrlCanonicalizer(PRESETS[preset])
+    except KeyError:
+        raise ValueError(f"Unknown normalization preset: {preset!r} (choose from {', '.join(PRESETS)})")
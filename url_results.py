@@ -0,0 +1,388 @@
+"""
+Columnar Extraction Results
+
+Extraction results as one Arrow table instead of a set of strings that is
+sorted into a list and turned into a new DataFrame on every page render:
+
+    url      canonical page URL
+    sitemap  sitemap the URL was first found in (dictionary-encoded)
+    depth    index nesting level of that sitemap (root is 0)
+    lastmod  <lastmod> of the URL in that sitemap, if any
+    host     host (and port) of the URL (dictionary-encoded)
+    segment  first path segment as /segment/, or "Other" (dictionary-encoded)
+
+The crawl fills a ResultsCollector as URL sets are parsed (crawl(results=...));
+build() turns it into UrlResults. The site structure is an Arrow group-by
+and exports are written straight from the columns.
+
+Rows stay in the order the crawl found them. Pages and exports can follow
+one of the ORDERS instead; an order is a row permutation computed from Arrow
+ranks and NumPy integer keys the first time it is used, and shared by every
+view of the same table, so results show up without waiting for a sort and
+the discovery order never sorts at all.
+
+search() narrows a view to the rows whose URL contains a query, through a
+UrlIndex (url_search.py) built the first time a table is searched; pages,
+counts and exports of the view cover the matching rows only.
+"""
+
+import io
+from array import array
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from frontier import parse_lastmod
+from url_search import UrlIndex
+
+
+# Columns
+COLUMNS = ['url', 'sitemap', 'depth', 'lastmod', 'host', 'segment']
+EXPORT_NAMES = {'url': 'URL', 'sitemap': 'Sitemap', 'depth': 'Depth', 'lastmod': 'Lastmod',
+                'host': 'Host', 'segment': 'Segment'}
+DETAIL_COLUMNS = ['sitemap', 'depth', 'lastmod']  # optional export columns besides the URL
+SEGMENT_OTHER = 'Other'  # structure bucket for root URLs
+
+# Row orders
+ORDER_URL = 'url'              # lexicographic by URL
+ORDER_HOST = 'host'            # by host, then path (URL)
+ORDER_LASTMOD = 'lastmod'      # newest <lastmod> first (by timestamp), URLs without a valid one last, ties by URL
+ORDER_DISCOVERY = 'discovery'  # as found by the crawl, no sorting
+ORDERS = (ORDER_URL, ORDER_HOST, ORDER_LASTMOD, ORDER_DISCOVERY)
+DEFAULT_ORDER = ORDER_URL
+
+EXPORT_BATCH_ROWS = 65_536  # rows gathered per CSV write when exporting in a sorted order
+
+# Host and first path segment of a URL, for the few URLs the fast split cannot handle
+_URL_PARTS = r'^[^:/?#]*:?/*(?P<host>[^/?#]*)/*(?P<segment>[^/?#]*)'
+
+
+def _replace_rows(column: pa.DictionaryArray, rows: pa.BooleanArray, values: pa.Array) -> pa.DictionaryArray:
+    """Set the values of the masked rows, rewriting only indices and keeping the dictionary unique."""
+    size = len(column.dictionary)
+    combined = pa.concat_arrays([column.dictionary, values])
+    indices = pc.replace_with_mask(column.indices, rows, pa.array(np.arange(size, size + len(values), dtype=np.int32)))
+    unique = combined.dictionary_encode()
+    return pa.DictionaryArray.from_arrays(unique.indices.take(indices), unique.dictionary)
+
+
+def _derive_host_segment(urls: pa.Array) -> Tuple[pa.DictionaryArray, pa.DictionaryArray]:
+    """
+    Host and structure segment columns for a URL column.
+
+    URLs are split on "/" in one vectorized pass and dictionary-encoded, so
+    the clean-up work runs on the few distinct hosts and segments rather
+    than on every row. Only URLs with a query or fragment right after the
+    host, or an empty first segment, go through the slower regex.
+    """
+    parts = pc.split_pattern(pc.binary_join_element_wise(urls, '/', ''), '/', max_splits=4)
+    host = pc.list_element(parts, 2).dictionary_encode()
+    segment = pc.list_element(parts, 3).dictionary_encode()
+
+    odd_hosts = pc.match_substring_regex(host.dictionary, '[?#]')
+    odd_segments = pc.or_(pc.equal(segment.dictionary, ''), pc.match_substring_regex(segment.dictionary, '[?#]'))
+    if pc.any(odd_hosts).as_py() or pc.any(odd_segments).as_py():
+        odd_rows = pc.or_(odd_hosts.take(host.indices), odd_segments.take(segment.indices))
+        fixed = pc.extract_regex(urls.filter(odd_rows), _URL_PARTS)
+        host = _replace_rows(host, odd_rows, fixed.field('host'))
+        segment = _replace_rows(segment, odd_rows, fixed.field('segment'))
+
+    labels = pc.if_else(pc.equal(segment.dictionary, ''), SEGMENT_OTHER,
+                        pc.binary_join_element_wise('/', segment.dictionary, '/', ''))
+    return host, pa.DictionaryArray.from_arrays(segment.indices, labels)
+
+
+def _plain_schema(schema: pa.Schema) -> pa.Schema:
+    """Schema with dictionary columns replaced by their value type (the CSV writer only takes plain columns)."""
+    return pa.schema([
+        pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+        for field in schema
+    ])
+
+
+def _needs_quotes(column: pa.ChunkedArray) -> bool:
+    """Whether any string value of a column contains a quote, comma or line break."""
+    values = column.combine_chunks()
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary
+    if not pa.types.is_string(values.type):
+        return False
+    return bool(pc.any(pc.match_substring_regex(values, '[",\r\n]')).as_py())
+
+
+class UrlResults:
+    """
+    Immutable, columnar extraction result (see COLUMNS) viewed in one of the
+    ORDERS, optionally narrowed to the rows matching a search query.
+
+    Attributes:
+        table: The underlying Arrow table, in discovery order (all rows)
+        order: Order of the rows in pages, urls() and exports
+        query: Search query the rows are narrowed to ('' for all rows)
+    """
+
+    def __init__(self, table: pa.Table, order: str = DEFAULT_ORDER, _shared: Optional[Dict] = None,
+                 query: str = '', _selection: Optional[np.ndarray] = None):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown result order {order!r} (expected one of {', '.join(ORDERS)})")
+        self.table = table
+        self.order = order
+        self.query = query
+        # URL ranks, row permutations and the search index, shared by all views of this table
+        self._shared: Dict = _shared if _shared is not None else {}
+        # Matching rows in discovery order (None for all rows)
+        self._selection = _selection
+        self._view_rows: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_columns(cls, urls: pa.Array, sitemap: Optional[pa.Array] = None, depth: Optional[pa.Array] = None,
+                     lastmod: Optional[pa.Array] = None, order: str = DEFAULT_ORDER) -> 'UrlResults':
+        """Build a result from URL (and optionally source) columns; host and segment are derived."""
+        size = len(urls)
+        host, segment = _derive_host_segment(urls)
+        table = pa.table({
+            'url': urls,
+            'sitemap': sitemap if sitemap is not None else pa.nulls(size, pa.dictionary(pa.int32(), pa.string())),
+            'depth': depth if depth is not None else pa.nulls(size, pa.int16()),
+            'lastmod': lastmod if lastmod is not None else pa.nulls(size, pa.string()),
+            'host': host,
+            'segment': segment,
+        })
+        return cls(table, order)
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str], lastmods: Optional[Dict[str, str]] = None,
+                  order: str = DEFAULT_ORDER) -> 'UrlResults':
+        """Build a result from plain URLs (no source sitemap), e.g. a merged or loaded URL list."""
+        urls = list(urls)
+        lastmod = pa.array([lastmods.get(url) for url in urls], pa.string()) if lastmods else None
+        return cls.from_columns(pa.array(urls, pa.string()), lastmod=lastmod, order=order)
+
+    def __len__(self) -> int:
+        return self.table.num_rows if self._selection is None else len(self._selection)
+
+    @property
+    def total(self) -> int:
+        """Rows of the whole result, whatever the search."""
+        return self.table.num_rows
+
+    def ordered(self, order: str) -> 'UrlResults':
+        """
+        The same rows in another order. Views share their sorts, so each
+        order is computed at most once per table.
+
+        Raises:
+            ValueError: When the order is not one of ORDERS
+        """
+        if order == self.order:
+            return self
+        return UrlResults(self.table, order, self._shared, self.query, self._selection)
+
+    def search(self, query: str) -> 'UrlResults':
+        """
+        The rows of the whole result whose URL matches a query (substring,
+        ^prefix or suffix$, case-insensitive; see url_search.py), in this
+        view's order. The index is built on the first search of a table and
+        shared by all its views; an empty query returns all rows.
+        """
+        if query.strip() == self.query.strip():
+            return self
+        if 'index' not in self._shared:
+            self._shared['index'] = UrlIndex(self.table.column('url'))
+        selection = self._shared['index'].search(query)
+        return UrlResults(self.table, self.order, self._shared, query if selection is not None else '', selection)
+
+    def _url_ranks(self) -> np.ndarray:
+        """0-based position of every row's URL in URL order (URLs are unique)."""
+        if 'url_ranks' not in self._shared:
+            ranks = pc.rank(self.table.column('url'), tiebreaker='first').to_numpy()
+            self._shared['url_ranks'] = ranks.astype(np.int64) - 1
+        return self._shared['url_ranks']
+
+    def _rows(self) -> Optional[np.ndarray]:
+        """Rows of this view in its order (None for all rows in discovery order)."""
+        if self.order == ORDER_DISCOVERY:
+            return self._selection
+        rows = self._permutation()
+        if self._selection is None:
+            return rows
+        if self._view_rows is None:
+            # Keep the matching rows of the full permutation, which stays cached for the next query
+            selected = np.zeros(self.table.num_rows, dtype=bool)
+            selected[self._selection] = True
+            self._view_rows = rows[selected[rows]]
+        return self._view_rows
+
+    def _permutation(self) -> np.ndarray:
+        """Row permutation of this order over all rows (not the discovery order)."""
+        if self.order in self._shared:
+            return self._shared[self.order]
+
+        ranks = self._url_ranks()
+        size = len(ranks)
+        if self.order == ORDER_URL:
+            # Ranks turn into a permutation with one scatter, no comparison sort
+            rows = np.empty(size, dtype=np.int64)
+            rows[ranks] = np.arange(size)
+        else:
+            # Dense rank of the primary key, with the URL rank as tie-breaker, in one integer key
+            # (hosts and lastmods repeat a lot, so only the distinct values are ranked)
+            if self.order == ORDER_HOST:
+                values = self.table.column('host').combine_chunks()
+                value_ranks = pc.rank(values.dictionary, tiebreaker='dense')
+            else:
+                # By timestamp, not text: sitemaps mix date precisions and timezone offsets
+                values = self.table.column('lastmod').combine_chunks().dictionary_encode()
+                timestamps = np.array([parse_lastmod(value) for value in values.dictionary.to_pylist()],
+                                      dtype=np.float64)
+                # Newest first; unparseable dates (-inf) after every real one
+                value_ranks = pa.array(np.unique(-timestamps, return_inverse=True)[1] + 1)
+            # Rows without a value sort last
+            primary = pc.fill_null(value_ranks.take(values.indices), len(value_ranks) + 1).to_numpy()
+            rows = np.argsort((primary.astype(np.int64) - 1) * size + ranks)
+        self._shared[self.order] = rows
+        return rows
+
+    def _selected(self) -> pa.Table:
+        """The rows of this view, in discovery order."""
+        return self.table if self._selection is None else self.table.take(self._selection)
+
+    def slice(self, start: int, stop: int) -> pa.Table:
+        """Rows [start, stop) in this order (zero-copy in discovery order, otherwise only these rows are gathered)."""
+        start = min(start, len(self))
+        length = max(0, min(stop, len(self)) - start)
+        rows = self._rows()
+        if rows is None:
+            return self.table.slice(start, length)
+        return self.table.take(rows[start:start + length])
+
+    def urls(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """URLs of rows [start, stop) as Python strings."""
+        stop = len(self) if stop is None else stop
+        return self.slice(start, stop).column('url').to_pylist()
+
+    def lastmods(self) -> Dict[str, str]:
+        """URL -> <lastmod> for the URLs that have one."""
+        table = self._selected()
+        dated = table.filter(pc.is_valid(table.column('lastmod')))
+        return dict(zip(dated.column('url').to_pylist(), dated.column('lastmod').to_pylist()))
+
+    def group_counts(self, column: str) -> List[Tuple[str, int]]:
+        """(value, rows) for every value of a column, most frequent first (ties by value)."""
+        counts = self._selected().group_by(column).aggregate([(column, 'count', pc.CountOptions(mode='all'))])
+        # One row per distinct value, so the ordering is cheap in Python
+        rows = zip(counts.column(column).to_pylist(), counts.column(f'{column}_count').to_pylist())
+        return sorted(rows, key=lambda row: (-row[1], str(row[0])))
+
+    def structure(self) -> List[Tuple[str, int, float]]:
+        """(segment, pages, percentage) rows of the site structure, largest first."""
+        total = len(self)
+        if not total:
+            return []
+        return [(segment, count, round(100.0 * count / total, 1)) for segment, count in self.group_counts('segment')]
+
+    def merge(self, other: 'UrlResults') -> 'UrlResults':
+        """
+        This result plus the rows of `other` whose URL is not in it yet
+        (appended in discovery order). Both are taken whole, whatever their
+        search; the merged result is not narrowed to a search.
+        """
+        urls = self.table.column('url')
+        added = other.table.filter(pc.invert(pc.is_in(other.table.column('url'), value_set=urls.combine_chunks())))
+        if not added.num_rows:
+            return self if self._selection is None else UrlResults(self.table, self.order, self._shared)
+        return UrlResults(pa.concat_tables([self.table, added]).unify_dictionaries(), self.order)
+
+    def export_table(self, columns: Sequence[str] = ('url',), start: int = 0, stop: Optional[int] = None) -> pa.Table:
+        """Rows [start, stop) of the given columns, named for export (EXPORT_NAMES)."""
+        stop = len(self) if stop is None else stop
+        table = self.slice(start, stop).select(list(columns))
+        return table.rename_columns([EXPORT_NAMES[name] for name in columns])
+
+    def page_frame(self, start: int, stop: int, columns: Sequence[str] = ('url',)) -> pd.DataFrame:
+        """DataFrame of rows [start, stop) for display (converts only that page)."""
+        return self.export_table(columns, start, stop).to_pandas()
+
+    def write_csv(self, destination: Union[str, io.IOBase, pa.NativeFile], columns: Sequence[str] = ('url',)) -> None:
+        """
+        Write the given columns as CSV (header names from EXPORT_NAMES) straight
+        from the columns, EXPORT_BATCH_ROWS rows at a time.
+        """
+        if isinstance(destination, str):
+            with open(destination, 'wb') as f:
+                self.write_csv(f, columns)
+            return
+        schema = _plain_schema(self.export_table(columns, 0, 0).schema)
+        # Arrow quotes every string when asked to quote; like pandas, only quote when a value needs it
+        needs_quotes = any(_needs_quotes(self.table.column(name)) for name in columns)
+        options = pa_csv.WriteOptions(include_header=False, quoting_style='needed' if needs_quotes else 'none')
+        destination.write((','.join(schema.names) + '\n').encode('utf-8'))
+        for start in range(0, len(self), EXPORT_BATCH_ROWS):
+            batch = self.export_table(columns, start, start + EXPORT_BATCH_ROWS).cast(schema)
+            pa_csv.write_csv(batch, destination, options)
+
+    def to_csv_bytes(self, columns: Sequence[str] = ('url',)) -> bytes:
+        """CSV export as bytes (for download buttons)."""
+        sink = pa.BufferOutputStream()
+        self.write_csv(sink, columns)
+        return sink.getvalue().to_pybytes()
+
+
+class ResultsCollector:
+    """
+    Row builder fed by the crawl: crawl(results=collector) adds the new page
+    URLs of each URL set with their source sitemap, depth and lastmod.
+    URLs and lastmods are kept as Python lists, sitemap ids as a compact
+    int array; the Arrow columns are built once, in build().
+    """
+
+    def __init__(self):
+        self._urls: List[str] = []
+        self._lastmods: List[Optional[str]] = []
+        self._sitemap_ids = array('i')
+        self._sitemaps: List[str] = []
+        self._depths: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def add(self, sitemap: str, depth: int, urls: Sequence[str], lastmods: Optional[Sequence[Optional[str]]],
+            new_urls: Set[str]) -> None:
+        """
+        Record the URLs of one URL set that were not in the results yet.
+
+        Args:
+            sitemap: URL set the URLs come from
+            depth: Its index nesting level
+            urls: Canonical page URLs in document order
+            lastmods: <lastmod> per entry of `urls` (or None)
+            new_urls: The subset of `urls` that is new to the crawl
+        """
+        if not new_urls:
+            return
+        pending = set(new_urls)
+        before = len(self._urls)
+        for url, lastmod in zip(urls, lastmods or repeat(None)):
+            if url in pending:
+                pending.discard(url)
+                self._urls.append(url)
+                self._lastmods.append(lastmod)
+        self._sitemap_ids.extend(repeat(len(self._sitemaps), len(self._urls) - before))
+        self._sitemaps.append(sitemap)
+        self._depths.append(depth)
+
+    def build(self, order: str = DEFAULT_ORDER) -> UrlResults:
+        """The collected rows (in discovery order) as a UrlResults viewed in `order`."""
+        sitemap_ids = pa.array(np.frombuffer(self._sitemap_ids, dtype=np.int32) if self._sitemap_ids else [], pa.int32())
+        return UrlResults.from_columns(
+            pa.array(self._urls, pa.string()),
+            sitemap=pa.DictionaryArray.from_arrays(sitemap_ids, pa.array(self._sitemaps, pa.string())),
+            depth=pa.array(self._depths, pa.int16()).take(sitemap_ids),
+            lastmod=pa.array(self._lastmods, pa.string()),
+            order=order,
+        )
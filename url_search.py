@@ -0,0 +1,261 @@
+"""
+URL Search Index
+
+Search-as-you-type over extraction results without scanning every URL on
+each keystroke. The index is built once per result and answers
+case-insensitive queries in milliseconds, also over millions of URLs:
+
+- Every URL is split into its origin (scheme://host[:port]) and the rest.
+  Origins repeat across many URLs, so a query is compared with each
+  distinct origin once and a hit selects all of its URLs.
+- The rest (path and query string) gets a trigram index: the lowercased
+  bytes starting at every second position, with the positions they occur
+  at. Any match of two or more bytes covers a sampled position, so the
+  postings of the query's rarest trigram give a few candidate positions,
+  which are then compared with the query byte by byte in NumPy.
+- Candidates are compared eight bytes at a time through overlapping 64-bit
+  windows of the text.
+- Single-character queries use a 128-bit set of the ASCII bytes in each URL.
+
+Query syntax:
+
+    blog                         URLs containing "blog" (case-insensitive)
+    ^https://example.com/en/     URLs starting with the text
+    .pdf$                        URLs ending with the text
+"""
+
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Configuration
+SEARCH_BUILD_ROWS = 65_536  # URLs indexed per step (bounds the temporary memory of the build)
+
+_ROW_END = b'\n\n'  # appended to every URL, so no indexed trigram spans two URLs
+_SAMPLE = 2        # a trigram is indexed at every _SAMPLE-th byte
+
+
+def parse_query(query: str) -> Tuple[bytes, bool, bool]:
+    """
+    Split a search query into its lowercased UTF-8 text and anchors.
+
+    Returns:
+        (text, anchored at the start, anchored at the end)
+    """
+    query = query.strip().replace('\n', '')
+    at_start = query.startswith('^')
+    if at_start:
+        query = query[1:]
+    at_end = query.endswith('$')
+    if at_end:
+        query = query[:-1]
+    # Lowercase exactly like the indexed text
+    text = pc.utf8_lower(pa.scalar(query, pa.string())).as_py()
+    return text.encode('utf-8'), at_start, at_end
+
+
+class UrlIndex:
+    """
+    Substring index over a URL column (see the module docstring).
+
+    Attributes:
+        nbytes: Memory held by the index, in bytes
+    """
+
+    def __init__(self, urls: Union[pa.Array, pa.ChunkedArray]):
+        if isinstance(urls, pa.ChunkedArray):
+            urls = urls.combine_chunks()
+        text = pc.utf8_lower(pc.binary_join_element_wise(urls, _ROW_END.decode(), ''))
+        self._rows = len(text)
+        self._offsets = np.frombuffer(text.buffers()[1], dtype=np.int32)[text.offset:text.offset + self._rows + 1]
+        self._size = int(self._offsets[-1]) if self._rows else 0
+        # The text plus padding, viewed as a 64-bit window starting at every byte
+        self._text = np.zeros(self._size + 8, dtype=np.uint8)
+        if self._size:
+            self._text[:self._size] = np.frombuffer(text.buffers()[2], dtype=np.uint8)[:self._size]
+        self._windows = np.ndarray((self._size + 1,), dtype='<u8', buffer=self._text, strides=(1,))
+        self._row_end = self._offsets[1:] - len(_ROW_END)
+
+        # Origin: everything before the third "/" (the whole URL if there is no path)
+        origins = pc.binary_join(pc.list_slice(pc.split_pattern(text, '/', max_splits=3), 0, 3), '/')
+        origins = origins.dictionary_encode()
+        origin_ids = origins.indices.to_numpy()
+        self._origins: List[bytes] = [origin.encode('utf-8') for origin in origins.dictionary.to_pylist()]
+        self._path_start = self._offsets[:-1] + pc.binary_length(origins.dictionary).to_numpy()[origin_ids]
+        self._origin_rows = np.argsort(origin_ids, kind='stable').astype(np.int32)
+        self._origin_bounds = np.concatenate(([0], np.cumsum(np.bincount(origin_ids, minlength=len(self._origins)))))
+        # Paths starting at an odd position have no sampled position right before them
+        self._odd_path_starts = self._path_start[self._path_start % _SAMPLE == 1]
+
+        self._build_trigrams()
+        self._build_signatures()
+        self.nbytes = sum(array.nbytes for array in (
+            self._text, self._offsets, self._path_start, self._origin_rows, self._origin_bounds,
+            self._odd_path_starts, self._trigrams, self._bounds, self._postings, self._signatures))
+
+    def _build_trigrams(self) -> None:
+        """Postings of the trigrams at every sampled position of the URL paths, grouped by trigram."""
+        positions, codes = [], []
+        for first_row in range(0, self._rows, SEARCH_BUILD_ROWS):
+            last_row = min(first_row + SEARCH_BUILD_ROWS, self._rows)
+            low, high = int(self._offsets[first_row]), int(self._offsets[last_row])
+            # Trigram starts from the path start up to the last one that stays inside the URL and its terminator
+            starts = self._path_start[first_row:last_row] - low
+            limits = self._offsets[first_row + 1:last_row + 1] - 2 - low
+            indexed = starts < limits
+            boundaries = np.zeros(high - low + 1, dtype=np.int8)
+            boundaries[starts[indexed]] += 1
+            boundaries[limits[indexed]] -= 1
+            first = -low % _SAMPLE  # sample even positions of the whole text
+            inside = np.cumsum(boundaries[:-1], dtype=np.int8)[first::_SAMPLE].view(bool)
+            sampled = (np.flatnonzero(inside) * _SAMPLE + first + low).astype(np.int32)
+            positions.append(sampled)
+            codes.append((self._text[sampled].astype(np.uint32) << 16)
+                         | (self._text[sampled + 1].astype(np.uint32) << 8) | self._text[sampled + 2])
+        positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int32)
+        codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.uint32)
+
+        # Dense trigram ids in code order, so all trigrams with a common prefix are adjacent
+        present = np.zeros(1 << 24, dtype=bool)
+        present[codes] = True
+        self._trigrams = np.flatnonzero(present).astype(np.uint32)
+        ids = (np.cumsum(present, dtype=np.int32) - 1)[codes]
+        del present
+        if len(self._trigrams) <= 1 << 16:
+            ids = ids.astype(np.uint16)  # stable argsort is a radix sort for 16-bit keys
+        order = np.argsort(ids, kind='stable')
+        self._postings = positions[order]
+        self._bounds = np.concatenate(([0], np.cumsum(np.bincount(ids, minlength=len(self._trigrams)))))
+
+    def _build_signatures(self) -> None:
+        """Per URL, the set of ASCII bytes it contains, as two 64-bit masks (for one-byte queries)."""
+        bits = np.zeros((256, 2), dtype=np.uint64)
+        for byte in range(128):
+            bits[byte, byte >> 6] = 1 << (byte & 63)
+        self._signatures = np.zeros((self._rows, 2), dtype=np.uint64)
+        for first_row in range(0, self._rows, SEARCH_BUILD_ROWS):
+            last_row = min(first_row + SEARCH_BUILD_ROWS, self._rows)
+            low, high = int(self._offsets[first_row]), int(self._offsets[last_row])
+            # Every URL has at least its terminator, so no reduceat segment is empty
+            self._signatures[first_row:last_row] = np.bitwise_or.reduceat(
+                bits[self._text[low:high]], self._offsets[first_row:last_row] - low, axis=0)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _postings_with_prefix(self, prefix: bytes) -> np.ndarray:
+        """Sampled positions of the trigrams starting with `prefix` (1 to 3 bytes)."""
+        shift = 8 * (3 - len(prefix))
+        code = int.from_bytes(prefix, 'big') << shift
+        low, high = np.searchsorted(self._trigrams, [code, code + (1 << shift)])
+        return self._postings[self._bounds[low]:self._bounds[high]]
+
+    def _postings_with_suffix(self, suffix: bytes) -> np.ndarray:
+        """Sampled positions of the trigrams ending with `suffix` (2 bytes)."""
+        ids = np.flatnonzero(self._trigrams & 0xFFFF == int.from_bytes(suffix, 'big'))
+        return np.concatenate([self._postings[self._bounds[i]:self._bounds[i + 1]] for i in ids] or [[]])
+
+    def _verify(self, starts: np.ndarray, text: bytes, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The candidate start positions where `text` really occurs, compared
+        eight bytes at a time; with `rows`, the rows of those candidates instead.
+        """
+        valid = (starts >= 0) & (starts + len(text) <= self._size)
+        starts = starts[valid]
+        rows = rows[valid] if rows is not None else None
+        for offset in range(0, len(text), 8):
+            if not len(starts):
+                break
+            piece = text[offset:offset + 8]
+            mask = np.uint64((1 << 8 * len(piece)) - 1)
+            matched = self._windows[starts + offset] & mask == np.uint64(int.from_bytes(piece, 'little'))
+            starts = starts[matched]
+            rows = rows[matched] if rows is not None else None
+        return starts if rows is None else rows
+
+    def _path_matches(self, text: bytes) -> np.ndarray:
+        """Start positions of `text` (2+ bytes) in the URL paths, found through the trigram postings."""
+        found = []
+        for residue in range(_SAMPLE):
+            # Matches starting at `residue` bytes before a sampled position: use the rarest trigram of the
+            # query at such an offset, or all trigrams starting with the query's tail if it is too short
+            offset, candidates = residue, None
+            for start in range(residue, len(text) - 2, _SAMPLE):
+                postings = self._postings_with_prefix(text[start:start + 3])
+                if candidates is None or len(postings) < len(candidates):
+                    offset, candidates = start, postings
+            if candidates is None:
+                candidates = self._postings_with_prefix(text[residue:residue + 2])
+                if residue:
+                    # Or the trigrams ending with the first two bytes, sampled right before the match
+                    before = self._postings_with_suffix(text[:2])
+                    if len(before) < len(candidates):
+                        offset, candidates = -1, before
+                        found.append(self._verify(self._odd_path_starts.astype(np.int64), text))
+            found.append(self._verify(candidates.astype(np.int64) - offset, text))
+        return np.concatenate(found)
+
+    def _origin_matches(self, text: bytes, at_start: bool, at_end: bool) -> List[np.ndarray]:
+        """Rows whose match starts in the origin: inside the origin, or running on into the path."""
+        found = []
+        for origin_id, origin in enumerate(self._origins):
+            rows = self._origin_rows[self._origin_bounds[origin_id]:self._origin_bounds[origin_id + 1]]
+            if at_end:
+                inside = origin == text + _ROW_END if at_start else origin.endswith(text + _ROW_END)
+            else:
+                inside = origin.startswith(text) if at_start else text in origin
+            if inside:
+                found.append(rows)
+                continue
+            # The first `split` bytes of the query end the origin, the rest starts the path
+            for split in range(1, min(len(text) - 1, len(origin)) + 1):
+                if not (origin == text[:split] if at_start else origin.endswith(text[:split])):
+                    continue
+                rest = text[split:]
+                candidates = rows
+                if at_end:
+                    candidates = rows[self._row_end[rows] - self._path_start[rows] == len(rest)]
+                # Text past the end of a path is its terminator, which never matches
+                found.append(self._verify(self._path_start[candidates].astype(np.int64), rest, candidates))
+        return found
+
+    def search(self, query: str) -> Optional[np.ndarray]:
+        """
+        Rows matching a query (see the module docstring).
+
+        Returns:
+            Sorted row numbers, or None for an empty query (no filter)
+        """
+        text, at_start, at_end = parse_query(query)
+        if not text:
+            return None
+        matched = np.zeros(self._rows, dtype=bool)
+
+        if len(text) == 1:
+            lengths = self._row_end - self._offsets[:-1]
+            if at_start or at_end:
+                matched = lengths >= 1
+                if at_start:
+                    matched &= self._text[self._offsets[:-1]] == text[0]
+                if at_end:
+                    matched &= self._text[self._row_end - 1] == text[0]
+                if at_start and at_end:
+                    matched &= lengths == 1
+            else:
+                # A one-byte UTF-8 character is ASCII
+                word, bit = divmod(text[0], 64)
+                matched = self._signatures[:, word] & np.uint64(1 << bit) != 0
+            return np.flatnonzero(matched)
+
+        for rows in self._origin_matches(text, at_start, at_end):
+            matched[rows] = True
+        if not at_start:
+            starts = self._path_matches(text)
+            rows = np.searchsorted(self._offsets, starts, side='right') - 1
+            if at_end:
+                rows = rows[starts + len(text) == self._row_end[rows]]
+            matched[rows] = True
+        return np.flatnonzero(matched)